@@ -1,21 +1,16 @@
 import os
-import shutil
-import tempfile
+import sys
 import subprocess
-from google.cloud import storage
 
 # Fetch required environment variables
 BENCH_HOME = os.getenv("BENCH_HOME")
-project_id = os.getenv("GCP_PROJECT")
-bucket_name = os.getenv("GCP_BUCKET")
 
-if not BENCH_HOME or not project_id or not bucket_name:
-    raise EnvironmentError("Required environment variables (BENCH_HOME, GCP_PROJECT, GCP_BUCKET) are not set.")
+if not BENCH_HOME:
+    raise EnvironmentError("Required environment variable (BENCH_HOME) is not set.")
+
+sys.path.append(BENCH_HOME)
+from billibench import archive, procs, scratch, storage, trace
 
-def initialize_storage(project_id, bucket_name):
-    """Initialize Google Cloud Storage client and bucket."""
-    storage_client = storage.Client(project=project_id)
-    return storage_client.get_bucket(bucket_name)
 
 def handler(events):
     """
@@ -23,30 +18,25 @@ def handler(events):
     Returns: int 0 on success, raises exception on failure.
     """
     try:
-        # Initialize Google Cloud Storage
-        bucket = initialize_storage(project_id, bucket_name)
+        # Initialize storage backend
+        bucket = storage.initialize_storage()
 
         # Temporary directory for processing
-        with tempfile.TemporaryDirectory(dir=BENCH_HOME) as tmp_dir:
-            payload_path = os.path.join(tmp_dir, f"payload_{events['size']}.zip")
+        with scratch.directory() as tmp_dir:
             result_path = os.path.join(tmp_dir, "output.o")
 
-            # Download payload from GCP bucket
-            blob = bucket.blob(f"Func0_compile/payload_{events['size']}.zip")
-            blob.chunk_size = 1 << 30  # 1GB chunks
-            blob.download_to_filename(payload_path)
-
-            # Unzip payload
-            shutil.unpack_archive(payload_path, tmp_dir, "zip")
+            # Download and unzip payload from the bucket
+            with trace.phase("download_unpack"):
+                archive.fetch_and_unpack(bucket, f"Func0_compile/payload_{events['size']}.zip", tmp_dir, chunk_size=1 << 30)
 
             # Compile source code
             build_dir = tmp_dir
-            if subprocess.run(["make"], cwd=build_dir, capture_output=True).returncode != 0:
-                raise RuntimeError("Make command failed")
+            with trace.phase("make"):
+                procs.run(["make"], cwd=build_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
             # Upload the compiled output to the bucket
-            result_blob = bucket.blob(f"Func0_compile/output.o")
-            result_blob.upload_from_filename(result_path)
+            with trace.phase("upload"):
+                bucket.put(f"Func0_compile/output.o", result_path)
 
             return 0
 
@@ -4,9 +4,9 @@ Script to generate payload for Func0_compile: clone Linux kernel, extract necess
 """
 
 import os
+import sys
 import shutil
 from git import Repo
-from google.cloud import storage
 
 # Function Configuration
 APP_NAME = "App0_softwareCompile"
@@ -14,9 +14,10 @@ FUNC_NAME = "Func0_compile"
 REPO_URL = "https://github.com/torvalds/linux.git"
 TAG_NAME = "v6.13"
 
-# GCP configuration
-storage_client = storage.Client(project=os.getenv("GCP_PROJECT"))
-bucket = storage_client.get_bucket(os.getenv("GCP_BUCKET"))
+# Storage configuration
+sys.path.append(os.getenv("BENCH_HOME"))
+from billibench import storage
+bucket = storage.initialize_storage()
 
 # Directory paths
 CLONE_PARENT_DIR = os.path.join(os.getenv("BENCH_HOME"), "Dataset", APP_NAME, FUNC_NAME)
@@ -234,9 +235,8 @@ def generate_makefile():
             f.write("all:\n\t$(CC) $(CFLAGS) $(INCLUDES) -o $(OUT) $(SRC)\n")
 
 def upload_to_gcp(zip_file):
-    """Upload zip file to gcp."""
-    blob = bucket.blob(os.path.join(FUNC_NAME, os.path.basename(zip_file)))
-    blob.upload_from_filename(zip_file)
+    """Upload zip file to the bucket."""
+    bucket.put(os.path.join(FUNC_NAME, os.path.basename(zip_file)), zip_file)
 
 def main():
     """Main execution function."""
@@ -1,20 +1,18 @@
 import os
-import shutil
-import tempfile
-from google.cloud import storage
+import sys
 
 # Fetch required environment variables
 BENCH_HOME = os.getenv("BENCH_HOME")
-project_id = os.getenv("GCP_PROJECT")
-bucket_name = os.getenv("GCP_BUCKET")
 
-if not BENCH_HOME or not project_id or not bucket_name:
-    raise EnvironmentError("Required environment variables (BENCH_HOME, GCP_PROJECT, GCP_BUCKET) are not set.")
+if not BENCH_HOME:
+    raise EnvironmentError("Required environment variable (BENCH_HOME) is not set.")
+
+sys.path.append(BENCH_HOME)
+from billibench import archive, procs, scratch, storage, trace
+
+# Object files added to the archive per ar call
+AR_BATCH = 1000
 
-def initialize_storage(project_id, bucket_name):
-    """Initialize Google Cloud Storage client and bucket."""
-    storage_client = storage.Client(project=project_id)
-    return storage_client.get_bucket(bucket_name)
 
 def handler(events):
     """
@@ -22,29 +20,27 @@ def handler(events):
     Returns: int 0 on success, raises exception on failure.
     """
     try:
-        # Initialize Google Cloud Storage
-        bucket = initialize_storage(project_id, bucket_name)
+        # Initialize storage backend
+        bucket = storage.initialize_storage()
 
         # Temporary directory for processing
-        with tempfile.TemporaryDirectory(dir=BENCH_HOME) as tmp_dir:
-            payload_path = os.path.join(tmp_dir, f"payload_{events['size']}.zip")
+        with scratch.directory() as tmp_dir:
             result_path = os.path.join(tmp_dir, "output.a")
 
-            # Download payload from GCP bucket
-            blob = bucket.blob(f"Func1_ar/payload_{events['size']}.zip")
-            blob.chunk_size = 1 << 30  # 1GB chunks
-            blob.download_to_filename(payload_path)
-
-            # Unzip payload
-            shutil.unpack_archive(payload_path, tmp_dir, "zip")
+            # Download and unzip payload from the bucket
+            with trace.phase("download_unpack"):
+                archive.fetch_and_unpack(bucket, f"Func1_ar/payload_{events['size']}.zip", tmp_dir, chunk_size=1 << 30)
 
-            # Run ar command
-            args = f"find {tmp_dir} -name \"*.o\" | xargs ar rcs {result_path}"
-            os.system(args)
+            # Run ar command, in batches like xargs
+            object_files = sorted(os.path.join(root, name) for root, _, files in os.walk(tmp_dir)
+                                  for name in files if name.endswith(".o"))
+            with trace.phase("ar"):
+                for i in range(0, len(object_files), AR_BATCH):
+                    procs.run(["ar", "rcs", result_path] + object_files[i:i + AR_BATCH])
 
             # Upload the compiled output to the bucket
-            result_blob = bucket.blob(f"Func1_ar/output.a")
-            result_blob.upload_from_filename(result_path)
+            with trace.phase("upload"):
+                bucket.put(f"Func1_ar/output.a", result_path)
 
         return 0
 
@@ -4,10 +4,10 @@ Script to generate payload for Func1_ar: clone Linux kernel, make Linux kernel,
 """
 
 import os
+import sys
 import shutil
 import random
 from git import Repo
-from google.cloud import storage
 
 # Function Configuration
 APP_NAME = "App0_softwareCompile"
@@ -15,13 +15,10 @@ FUNC_NAME = "Func1_ar"
 REPO_URL = "https://github.com/torvalds/linux.git"
 TAG_NAME = "v6.13"
 
-# raise error if Environment variables are not set
-if os.getenv("GCP_PROJECT") is None or os.getenv("GCP_BUCKET") is None:
-    raise ValueError("GCP_PROJECT and GCP_BUCKET must be set")
-
-# GCP configuration
-storage_client = storage.Client(project=os.getenv("GCP_PROJECT"))
-bucket = storage_client.get_bucket(os.getenv("GCP_BUCKET"))
+# Storage configuration
+sys.path.append(os.getenv("BENCH_HOME"))
+from billibench import manifest, storage
+bucket = storage.initialize_storage()
 
 # Directory paths
 CLONE_PARENT_DIR = os.path.join(os.getenv("BENCH_HOME"), "Dataset", APP_NAME, FUNC_NAME)
@@ -65,11 +62,14 @@ def setup_payload_directory():
     o_files = collect_object_files()
 
     """Setup payload directory with a subset of .o files."""
+    # sort first, os.walk order depends on the file system
+    o_files = sorted(o_files)
     for size, payload_dir in PAYLOAD_dirs.items():
         os.makedirs(payload_dir, exist_ok=True)
 
-        # Randomly select a subset of .o files
-        subset_o_files = random.sample(o_files, size_dict[size])
+        # Randomly select a subset of .o files, with a seed of its own per size
+        rng = random.Random(manifest.size_seed(manifest.seed(), size))
+        subset_o_files = rng.sample(o_files, size_dict[size])
         # Copy .o files
         for o_file in subset_o_files:
             rel_path = os.path.relpath(o_file, CLONE_DIR)
@@ -77,9 +77,8 @@ def setup_payload_directory():
             shutil.copy(o_file, dest_path)
 
 def upload_to_gcp(zip_file):
-    """Upload zip file to gcp."""
-    blob = bucket.blob(os.path.join(FUNC_NAME, os.path.basename(zip_file)))
-    blob.upload_from_filename(zip_file)
+    """Upload zip file to the bucket."""
+    bucket.put(os.path.join(FUNC_NAME, os.path.basename(zip_file)), zip_file)
 
 def main():
     """Main execution function."""
@@ -93,11 +92,18 @@ def main():
         setup_payload_directory()
 
         # zip each payload directory
+        sizes = {}
         for size, payload_dir in PAYLOAD_dirs.items():
             shutil.make_archive(payload_dir, "zip", payload_dir)
 
             zip_file = os.path.join(CLONE_PARENT_DIR, f"payload_{size}.zip")
             upload_to_gcp(zip_file)
+            sizes[size] = {"seed": manifest.size_seed(manifest.seed(), size), "base_seed": manifest.seed(),
+                           "params": {"tag": TAG_NAME, "objects": size_dict[size]},
+                           "artifacts": [manifest.describe(os.path.join(FUNC_NAME, os.path.basename(zip_file)), zip_file)]}
+
+        # record the seed and checksums of the payloads
+        manifest.update(bucket, FUNC_NAME, sizes)
 
     except Exception as e:
         print(f"Error: {e}")
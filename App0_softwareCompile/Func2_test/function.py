@@ -1,22 +1,16 @@
 import os
-import shutil
-import tempfile
+import sys
 import subprocess
-from google.cloud import storage
 
 # Fetch required environment variables
 BENCH_HOME = os.getenv("BENCH_HOME")
-project_id = os.getenv("GCP_PROJECT")
-bucket_name = os.getenv("GCP_BUCKET")
 
-if not BENCH_HOME or not project_id or not bucket_name:
-    raise EnvironmentError("Required environment variables (BENCH_HOME, GCP_PROJECT, GCP_BUCKET) are not set.")
+if not BENCH_HOME:
+    raise EnvironmentError("Required environment variable (BENCH_HOME) is not set.")
 
+sys.path.append(BENCH_HOME)
+from billibench import archive, procs, scratch, storage, trace
 
-def initialize_storage(project_id, bucket_name):
-    """Initialize Google Cloud Storage client and bucket."""
-    storage_client = storage.Client(project=project_id)
-    return storage_client.get_bucket(bucket_name)
 
 def handler(events):
     """
@@ -24,41 +18,40 @@ def handler(events):
     Returns: int 0 on success, raises exception on failure.
     """
     try:
-        # Initialize Google Cloud Storage
-        bucket = initialize_storage(project_id, bucket_name)
+        # Initialize storage backend
+        bucket = storage.initialize_storage()
 
         # Temporary directory for processing
-        with tempfile.TemporaryDirectory(dir=BENCH_HOME) as tmp_dir:
+        with scratch.directory() as tmp_dir:
             # define the paths
-            payload_path = os.path.join(tmp_dir, f"payload_{events['size']}.zip")
             gtest_parallel_py_path = os.path.join(tmp_dir, "gtest_parallel.py")
             gtest_parallel_path = os.path.join(tmp_dir, "gtest-parallel")
             test_binary_path = os.path.join(tmp_dir, f"{events['size']}_test_binary")
             result_path = os.path.join(tmp_dir, "output.txt")
 
-            # Download payload from GCP bucket
-            bucket.blob(f"Func2_test/payload_{events['size']}.zip").download_to_filename(payload_path)
-            bucket.blob(f"Func2_test/gtest_parallel.py").download_to_filename(gtest_parallel_py_path)
-            bucket.blob(f"Func2_test/gtest-parallel").download_to_filename(gtest_parallel_path)
+            # Download and unzip payload from the bucket
+            with trace.phase("download_unpack"):
+                archive.fetch_and_unpack(bucket, f"Func2_test/payload_{events['size']}.zip", tmp_dir)
+                bucket.get(f"Func2_test/gtest_parallel.py", gtest_parallel_py_path)
+                bucket.get(f"Func2_test/gtest-parallel", gtest_parallel_path)
 
-            # unzip the payload and prepare the test binary
-            shutil.unpack_archive(payload_path, tmp_dir, "zip")
-            os.system(f"chmod +x {test_binary_path}")
-            os.system(f"chmod +x {gtest_parallel_path}")
+            # prepare the test binary
+            with trace.phase("prepare"):
+                procs.make_executable(test_binary_path)
+                procs.make_executable(gtest_parallel_path)
 
             # Run the test binary
-            os.chdir(tmp_dir)
-            test_cmds = ["./gtest-parallel", 
-                         test_binary_path, 
-                         "--gtest_filter=" + events['gtest_filter'], 
-                         "--workers=" + str(events['workers_num']),
-                         "> " + result_path]
+            test_cmds = [gtest_parallel_path,
+                         test_binary_path,
+                         "--gtest_filter=" + events['gtest_filter'],
+                         "--workers=" + str(events['workers_num'])]
 
-            os.system(" ".join(test_cmds))
+            with trace.phase("test"):
+                procs.run(test_cmds, cwd=tmp_dir, stdout=result_path)
 
-            # Upload the result to GCP bucket
-            result_blob = bucket.blob(f"Func2_test/output_{events['size']}.txt")
-            result_blob.upload_from_filename(result_path)
+            # Upload the result to the bucket
+            with trace.phase("upload"):
+                bucket.put(f"Func2_test/output_{events['size']}.txt", result_path)
 
         return 0
 
@@ -1,13 +1,13 @@
 #! /usr/bin/env python3
 """
-Script to generate payload for Func2_test: clone libvpx, build libvpx, upload test binaries to GCP bucket.
+Script to generate payload for Func2_test: clone libvpx, build libvpx, upload test binaries to the bucket.
 """
 
 import os
+import sys
 import shutil
 import subprocess
 from git import Repo
-from google.cloud import storage
 
 # Function Configuration
 APP_NAME = "App0_softwareCompile"
@@ -17,13 +17,10 @@ TAG_NAME = "v1.15.0"
 REPO_URL_GTEST_PARALLEL = "https://github.com/google/gtest-parallel.git"
 
 
-# raise error if Environment variables are not set
-if os.getenv("GCP_PROJECT") is None or os.getenv("GCP_BUCKET") is None:
-    raise ValueError("GCP_PROJECT and GCP_BUCKET must be set")
-
-# GCP configuration
-storage_client = storage.Client(project=os.getenv("GCP_PROJECT"))
-bucket = storage_client.get_bucket(os.getenv("GCP_BUCKET"))
+# Storage configuration
+sys.path.append(os.getenv("BENCH_HOME"))
+from billibench import storage
+bucket = storage.initialize_storage()
 
 # Directory paths
 CLONE_PARENT_DIR = os.path.join(os.getenv("BENCH_HOME"), "Dataset", APP_NAME, FUNC_NAME)
@@ -147,9 +144,8 @@ def setup_payload_directory():
 
 
 def upload_to_gcp(test_binary_file):
-    """Upload zip file to gcp."""
-    blob = bucket.blob(os.path.join(FUNC_NAME, os.path.basename(test_binary_file)))
-    blob.upload_from_filename(test_binary_file)
+    """Upload zip file to the bucket."""
+    bucket.put(os.path.join(FUNC_NAME, os.path.basename(test_binary_file)), test_binary_file)
 
 def upload_gtest_parallel():
     """Clone gtest parallel repository."""
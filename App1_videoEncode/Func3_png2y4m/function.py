@@ -1,20 +1,16 @@
 import os
-import shutil
-import tempfile
-from google.cloud import storage
+import sys
+import subprocess
 
 # Fetch required environment variables
 BENCH_HOME = os.getenv("BENCH_HOME")
-project_id = os.getenv("GCP_PROJECT")
-bucket_name = os.getenv("GCP_BUCKET")
 
-if not BENCH_HOME or not project_id or not bucket_name:
-    raise EnvironmentError("Required environment variables (BENCH_HOME, GCP_PROJECT, GCP_BUCKET) are not set.")
+if not BENCH_HOME:
+    raise EnvironmentError("Required environment variable (BENCH_HOME) is not set.")
+
+sys.path.append(BENCH_HOME)
+from billibench import archive, procs, scratch, storage, trace
 
-def initialize_storage(project_id, bucket_name):
-    """Initialize Google Cloud Storage client and bucket."""
-    storage_client = storage.Client(project=project_id)
-    return storage_client.get_bucket(bucket_name)
 
 def handler(events):
     """
@@ -22,28 +18,30 @@ def handler(events):
     Returns: int 0 on success, raises exception on failure.
     """
     try:
-        # Initialize Google Cloud Storage
-        bucket = initialize_storage(project_id, bucket_name)
+        # Initialize storage backend
+        bucket = storage.initialize_storage()
 
         # Temporary directory for processing
-        with tempfile.TemporaryDirectory(dir=BENCH_HOME) as tmp_dir:
-            payload_path = os.path.join(tmp_dir, f"payload_{events['size']}.zip")
+        with scratch.directory() as tmp_dir:
             result_path = os.path.join(tmp_dir, f"{events['size']}.y4m")
             binary_path = os.path.join(tmp_dir, "png2y4m")
             frame_path = os.path.join(tmp_dir, "%08d.png")
 
-            # Download payload from GCP bucket
-            bucket.blob(f"Func3_png2y4m/payload_{events['size']}.zip").download_to_filename(payload_path)
+            # Download and unzip payload from the bucket
+            with trace.phase("download_unpack"):
+                archive.fetch_and_unpack(bucket, f"Func3_png2y4m/payload_{events['size']}.zip", tmp_dir)
 
-            # Unzip payload
-            shutil.unpack_archive(payload_path, tmp_dir, "zip")
-            os.system(f"chmod +x {binary_path}")
+            # Prepare the binaries
+            with trace.phase("prepare"):
+                procs.make_executable(binary_path)
 
             # Run png2y4m
-            os.system(f"{binary_path} -o {result_path} {frame_path} > /dev/null 2>&1")
+            with trace.phase("png2y4m"):
+                procs.run([binary_path, "-o", result_path, frame_path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
-            # Upload the result to GCP bucket
-            bucket.blob(f"Func3_png2y4m/{events['size']}.y4m").upload_from_filename(result_path)
+            # Upload the result to the bucket
+            with trace.phase("upload"):
+                bucket.put(f"Func3_png2y4m/{events['size']}.y4m", result_path)
 
             return 0
 
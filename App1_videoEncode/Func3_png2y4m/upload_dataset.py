@@ -1,23 +1,24 @@
 #!/usr/bin/env python3
 """
 Script to generate payload for Func3_png2y4m: 
-download png2y4m tool from daala_tools repo, download video frames, and upload it to GCP bucket    .
+download png2y4m tool from daala_tools repo, download video frames, and upload it to the bucket    .
 """
 
 import os
+import sys
 import shutil
 import requests
 from git import Repo
-from google.cloud import storage
 
 # Function Configuration
 APP_NAME = "App1_videoEncode"
 FUNC_NAME = "Func3_png2y4m"
 DAALA_REPO_URL = "https://github.com/Tingjia980311/daala_tools.git"
 
-# GCP configuration
-storage_client = storage.Client(project=os.getenv("GCP_PROJECT"))
-bucket = storage_client.get_bucket(os.getenv("GCP_BUCKET"))
+# Storage configuration
+sys.path.append(os.getenv("BENCH_HOME"))
+from billibench import storage
+bucket = storage.initialize_storage()
 
 # Directory paths
 CLONE_PARENT_DIR = os.path.join(os.getenv("BENCH_HOME"), "Dataset", APP_NAME, FUNC_NAME)
@@ -69,9 +70,8 @@ def setup_payload_directory():
         shutil.copy(os.path.join(CLONE_DIR, "png2y4m"), os.path.join(payload_dir, "png2y4m"))   
 
 def upload_to_gcp(zip_file):
-    """Upload zip file to gcp."""
-    blob = bucket.blob(os.path.join(FUNC_NAME, os.path.basename(zip_file)))
-    blob.upload_from_filename(zip_file)
+    """Upload zip file to the bucket."""
+    bucket.put(os.path.join(FUNC_NAME, os.path.basename(zip_file)), zip_file)
 
 def main():
     """Main execution function."""
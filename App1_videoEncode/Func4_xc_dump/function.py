@@ -1,59 +1,65 @@
 import os
-import shutil
-import tempfile
-from google.cloud import storage
+import sys
 
 # Fetch required environment variables
 BENCH_HOME = os.getenv("BENCH_HOME")
-project_id = os.getenv("GCP_PROJECT")
-bucket_name = os.getenv("GCP_BUCKET")
 
-if not BENCH_HOME or not project_id or not bucket_name: 
-    raise EnvironmentError("Required environment variables (BENCH_HOME, GCP_PROJECT, GCP_BUCKET) are not set.")
+if not BENCH_HOME:
+    raise EnvironmentError("Required environment variable (BENCH_HOME) is not set.")
+
+sys.path.append(BENCH_HOME)
+from billibench import archive, procs, scratch, storage, trace
 
-def initialize_storage(project_id, bucket_name):
-    """Initialize Google Cloud Storage client and bucket."""
-    storage_client = storage.Client(project=project_id)
-    return storage_client.get_bucket(bucket_name)   
 
 def handler(events):
     """
-    Args: events (dict) including 'size' parameter, 'quality' parameter, 'thread_number' parameter.
+    Args: events (dict) including 'size' parameter, 'quality' parameter, 'thread_number' parameter;
+          optional 'y4m_key' parameter (bucket key of the input y4m, e.g. the output of Func3_png2y4m).
     Returns: int 0 on success, raises exception on failure.
     """
     try:
-        # Initialize Google Cloud Storage
-        bucket = initialize_storage(project_id, bucket_name)
+        # Initialize storage backend
+        bucket = storage.initialize_storage()
 
         # Temporary directory for processing
-        with tempfile.TemporaryDirectory(dir=BENCH_HOME) as tmp_dir:
-            payload_path = os.path.join(tmp_dir, f"payload_{events['size']}.zip")
+        with scratch.directory() as tmp_dir:
             output_state_path = os.path.join(tmp_dir, f"{events['size']}.state")
             output_ivf_path = os.path.join(tmp_dir, f"{events['size']}.ivf")
             input_y4m_path = os.path.join(tmp_dir, f"output.y4m")
             xc_dump_path = os.path.join(tmp_dir, "xc-dump")
             vpxenc_path = os.path.join(tmp_dir, "vpxenc")
 
-            # Download payload from GCP bucket
-            bucket.blob(f"Func4_xc_dump/payload_{events['size']}.zip").download_to_filename(payload_path)
+            if "y4m_key" in events:
+                # Only the tools are needed with the y4m produced upstream, not the payload's own y4m
+                with trace.phase("download_unpack"):
+                    archive.fetch_and_unpack(bucket, "Func4_xc_dump/tools.zip", tmp_dir)
+                with trace.phase("download"):
+                    bucket.get(events["y4m_key"], input_y4m_path)
+            else:
+                # Download and unzip payload from the bucket
+                with trace.phase("download_unpack"):
+                    archive.fetch_and_unpack(bucket, f"Func4_xc_dump/payload_{events['size']}.zip", tmp_dir)
 
-            # Unzip payload
-            shutil.unpack_archive(payload_path, tmp_dir, "zip")
-            os.system(f"chmod +x {xc_dump_path}")
-            os.system(f"chmod +x {vpxenc_path}")
+            # Prepare the binaries
+            with trace.phase("prepare"):
+                procs.make_executable(xc_dump_path)
+                procs.make_executable(vpxenc_path)
             
             # Run vpxenc
             vpxenc_cmd = [vpxenc_path, "--ivf", "-q", "--codec=vp8", "--" + events['quality'], 
                           "--threads=" + str(events['thread_number']), "-o", output_ivf_path, input_y4m_path]
-            os.system(" ".join(vpxenc_cmd))
+            with trace.phase("vpxenc"):
+                procs.run(vpxenc_cmd)
 
             # Run xc-dump
             xc_dump_cmd = [xc_dump_path, output_ivf_path, output_state_path]    
-            os.system(" ".join(xc_dump_cmd))
+            with trace.phase("xc-dump"):
+                procs.run(xc_dump_cmd)
 
-            # Upload the result to GCP bucket  
-            bucket.blob(f"Func4_xc_dump/{events['size']}.state").upload_from_filename(output_state_path)
-            bucket.blob(f"Func4_xc_dump/{events['size']}.ivf").upload_from_filename(output_ivf_path)
+            # Upload the result to the bucket  
+            with trace.phase("upload"):
+                bucket.put(f"Func4_xc_dump/{events['size']}.state", output_state_path)
+                bucket.put(f"Func4_xc_dump/{events['size']}.ivf", output_ivf_path)
 
         return 0
 
@@ -1,14 +1,14 @@
 #!/usr/bin/env python3
 """
 Script to generate payload for Func4_xc_dump: 
-download xc-dump tool from alfalfa repo, download vpxenc tool from libvpx repo, download video frames and transfer to y4m format, and upload it to GCP bucket    .
+download xc-dump tool from alfalfa repo, download vpxenc tool from libvpx repo, download video frames and transfer to y4m format, and upload it to the bucket    .
 """
 
 import os
+import sys
 import shutil
 import requests
 from git import Repo
-from google.cloud import storage
 
 # Function Configuration
 APP_NAME = "App1_videoEncode"
@@ -17,9 +17,10 @@ ALFALFA_REPO_URL = "https://github.com/Tingjia980311/alfalfa.git"
 LIBVPX_REPO_URL = "https://github.com/webmproject/libvpx.git"
 DAALA_REPO_URL = "https://github.com/Tingjia980311/daala_tools.git"
 
-# GCP configuration
-storage_client = storage.Client(project=os.getenv("GCP_PROJECT"))
-bucket = storage_client.get_bucket(os.getenv("GCP_BUCKET"))
+# Storage configuration
+sys.path.append(os.getenv("BENCH_HOME"))
+from billibench import storage
+bucket = storage.initialize_storage()
 
 # Directory paths
 CLONE_PARENT_DIR = os.path.join(os.getenv("BENCH_HOME"), "Dataset", APP_NAME, FUNC_NAME)
@@ -28,6 +29,8 @@ LIBVPX_DIR = os.path.join(CLONE_PARENT_DIR, "libvpx")
 DAALA_DIR = os.path.join(CLONE_PARENT_DIR, "daala_tools")
 FRAME_DIR = os.path.join(CLONE_PARENT_DIR, "frames")
 
+TOOLS_DIR = os.path.join(CLONE_PARENT_DIR, "tools")
+
 PAYLOAD_DIRS = {
     "small": os.path.join(CLONE_PARENT_DIR, "payload_small"),
     "medium": os.path.join(CLONE_PARENT_DIR, "payload_medium"),
@@ -115,11 +118,15 @@ def setup_payload_directory():
         # Copy xc-dump executable
         shutil.copy(os.path.join(ALFALFA_DIR, "src", "frontend", "xc-dump"), os.path.join(payload_dir, "xc-dump"))
 
+def setup_tools_directory():
+    """Setup the tools-only payload used when the y4m comes from Func3_png2y4m."""
+    os.makedirs(TOOLS_DIR)
+    shutil.copy(os.path.join(LIBVPX_DIR, "build", "vpxenc"), os.path.join(TOOLS_DIR, "vpxenc"))
+    shutil.copy(os.path.join(ALFALFA_DIR, "src", "frontend", "xc-dump"), os.path.join(TOOLS_DIR, "xc-dump"))
 
 def upload_to_gcp(zip_file):
-    """Upload zip file to gcp."""
-    blob = bucket.blob(os.path.join(FUNC_NAME, os.path.basename(zip_file)))
-    blob.upload_from_filename(zip_file)
+    """Upload zip file to the bucket."""
+    bucket.put(os.path.join(FUNC_NAME, os.path.basename(zip_file)), zip_file)
 
 def main():
     """Main execution function."""
@@ -135,6 +142,11 @@ def main():
         clone_daala_repo()
         download_video_frames()
         setup_payload_directory()   
+        setup_tools_directory()
+
+        # zip the tools directory
+        shutil.make_archive(TOOLS_DIR, 'zip', TOOLS_DIR)
+        upload_to_gcp(os.path.join(CLONE_PARENT_DIR, "tools.zip"))
         
         # zip each payload directory
         for size, payload_dir in PAYLOAD_DIRS.items():
@@ -1,51 +1,60 @@
 import os
-import shutil
-import tempfile
-from google.cloud import storage
+import sys
 
 # Fetch required environment variables
 BENCH_HOME = os.getenv("BENCH_HOME")
-project_id = os.getenv("GCP_PROJECT")
-bucket_name = os.getenv("GCP_BUCKET")
 
-if not BENCH_HOME or not project_id or not bucket_name: 
-    raise EnvironmentError("Required environment variables (BENCH_HOME, GCP_PROJECT, GCP_BUCKET) are not set.")
+if not BENCH_HOME:
+    raise EnvironmentError("Required environment variable (BENCH_HOME) is not set.")
+
+sys.path.append(BENCH_HOME)
+from billibench import archive, procs, scratch, storage, trace
 
-def initialize_storage(project_id, bucket_name):
-    """Initialize Google Cloud Storage client and bucket."""
-    storage_client = storage.Client(project=project_id)
-    return storage_client.get_bucket(bucket_name)   
 
 def handler(events):
     """
-    Args: events (dict) including 'size' parameter.
+    Args: events (dict) including 'size' parameter;
+          optional 'ivf_key' and 'state_key' parameters (bucket keys of the inputs, e.g. the outputs of Func4_xc_dump).
     Returns: int 0 on success, raises exception on failure.
     """
     try:
-        # Initialize Google Cloud Storage
-        bucket = initialize_storage(project_id, bucket_name)
+        # Initialize storage backend
+        bucket = storage.initialize_storage()
 
         # Temporary directory for processing
-        with tempfile.TemporaryDirectory(dir=BENCH_HOME) as tmp_dir:    
-            payload_path = os.path.join(tmp_dir, f"payload_{events['size']}.zip")
+        with scratch.directory() as tmp_dir:    
             input_ivf_path = os.path.join(tmp_dir, f"{events['size']}.ivf")
             input_state_path = os.path.join(tmp_dir, f"{events['size']}.state")
             output_ivf_path = os.path.join(tmp_dir, f"output.ivf")
             xc_enc_path = os.path.join(tmp_dir, "xc-enc")
             
-            # Download payload from GCP bucket
-            bucket.blob(f"Func5_xc_enc/payload_{events['size']}.zip").download_to_filename(payload_path)
+            # Only the tools are needed when both inputs are produced upstream
+            with trace.phase("download_unpack"):
+                if "ivf_key" in events and "state_key" in events:
+                    archive.fetch_and_unpack(bucket, "Func5_xc_enc/tools.zip", tmp_dir)
+                else:
+                    archive.fetch_and_unpack(bucket, f"Func5_xc_enc/payload_{events['size']}.zip", tmp_dir)
+
+            # Replace the payload's inputs with the ones produced upstream
+            if "ivf_key" in events or "state_key" in events:
+                with trace.phase("download"):
+                    if "ivf_key" in events:
+                        bucket.get(events["ivf_key"], input_ivf_path)
+                    if "state_key" in events:
+                        bucket.get(events["state_key"], input_state_path)
             
-            # Unzip payload
-            shutil.unpack_archive(payload_path, tmp_dir, "zip")
-            os.system(f"chmod +x {xc_enc_path}")
+            # Prepare the binaries
+            with trace.phase("prepare"):
+                procs.make_executable(xc_enc_path)
 
             # Run xc-enc
             xc_enc_cmd = [xc_enc_path, "-o", output_ivf_path, "-I", input_state_path, input_ivf_path]
-            os.system(" ".join(xc_enc_cmd))
+            with trace.phase("xc-enc"):
+                procs.run(xc_enc_cmd)
 
-            # Upload the result to GCP bucket
-            bucket.blob(f"Func5_xc_enc/output.ivf").upload_from_filename(output_ivf_path)
+            # Upload the result to the bucket
+            with trace.phase("upload"):
+                bucket.put(f"Func5_xc_enc/output.ivf", output_ivf_path)
 
         return 0
 
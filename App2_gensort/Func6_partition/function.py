@@ -1,18 +1,17 @@
-
 import os
-import tempfile
-from google.cloud import storage
+import sys
 import numpy as np
 import numexpr as ne
 import concurrent.futures
 
 # Fetch required environment variables
 BENCH_HOME = os.getenv("BENCH_HOME")
-project_id = os.getenv("GCP_PROJECT")
-bucket_name = os.getenv("GCP_BUCKET")
 
-if not BENCH_HOME or not project_id or not bucket_name: 
-    raise EnvironmentError("Required environment variables (BENCH_HOME, GCP_PROJECT, GCP_BUCKET) are not set.") 
+if not BENCH_HOME:
+    raise EnvironmentError("Required environment variable (BENCH_HOME) is not set.")
+
+sys.path.append(BENCH_HOME)
+from billibench import manifest, scratch, storage, trace
 
 matrix_sizes = {
     "small": 1024*1024*25,
@@ -20,21 +19,19 @@ matrix_sizes = {
     "large": 1024*1024*256*10,
 }
 
-def initialize_storage(project_id, bucket_name):
-    """Initialize Google Cloud Storage client and bucket."""
-    storage_client = storage.Client(project=project_id)
-    return storage_client.get_bucket(bucket_name)
 
-def partition_array_segment(a, i, mapper_dir, gcp_bucket, size):
+def partition_array_segment(a, i, mapper_dir, bucket, size):
     min_limit = i * 50000
     max_limit = min(50000 * (i + 1), 5000000)
-    pos = ne.evaluate("(a < " + str(max_limit) + ") & (a > " + str(min_limit) + ")")
-    part = a[pos]
+    with trace.phase("filter", segment=i):
+        pos = ne.evaluate("(a < " + str(max_limit) + ") & (a > " + str(min_limit) + ")")
+        part = a[pos]
 
-    np.save(os.path.join(mapper_dir, str(i) + ".npy"), part)
+        np.save(os.path.join(mapper_dir, str(i) + ".npy"), part)
 
-    # upload the result to GCP bucket
-    gcp_bucket.blob(os.path.join("Func6_partition", size, str(i) + ".npy")).upload_from_filename(os.path.join(mapper_dir, str(i) + ".npy"))
+    # upload the result to the bucket
+    with trace.phase("upload", segment=i):
+        bucket.put(os.path.join("Func6_partition", size, str(i) + ".npy"), os.path.join(mapper_dir, str(i) + ".npy"))
     
 def wrapper_function(args):
     partition_array_segment(*args)
@@ -42,34 +39,34 @@ def wrapper_function(args):
 
 def handler(events):
     """
-    Args: events (dict) including 'size' parameter.
+    Args: events (dict) including 'size' parameter; optional 'workers_num' parameter (default 40).
     Returns: int 0 on success, raises exception on failure.
     """
     try:
-        # Initialize Google Cloud Storage
-        bucket = initialize_storage(project_id, bucket_name)
+        # Initialize storage backend
+        bucket = storage.initialize_storage()
 
         # Temporary directory for processing
-        with tempfile.TemporaryDirectory(dir=BENCH_HOME) as tmp_dir:
+        with scratch.directory() as tmp_dir:
             dat_path = os.path.join(tmp_dir, f"{events['size']}.dat")
             mapper_dir = os.path.join(tmp_dir, "mapper")
             os.makedirs(mapper_dir, exist_ok=True)
 
-            # Download payload from GCP bucket
-            blob = bucket.blob(os.path.join("Func6_partition", os.path.basename(dat_path)))
-            blob.chunk_size = 1<<30
-            blob.download_to_filename(dat_path)
+            # Download payload from the bucket
+            with trace.phase("download"):
+                manifest.get(bucket, os.path.join("Func6_partition", os.path.basename(dat_path)), dat_path, chunk_size=1 << 30)
 
             # Load the matrix
             matrix = np.memmap(dat_path, dtype='uint32', mode='r', shape=(matrix_sizes[events['size']],))
 
             # Partition the matrix
-            with concurrent.futures.ThreadPoolExecutor(max_workers=40) as executor:
+            with trace.phase("partition"), concurrent.futures.ThreadPoolExecutor(max_workers=events.get('workers_num', 40)) as executor:
                 futures = []
                 for i in range(100):
                     futures.append(executor.submit(wrapper_function, (matrix, i, mapper_dir, bucket, events['size'])))
+                # re-raise the first failed segment, so a failed upload fails the invocation
                 for future in concurrent.futures.as_completed(futures):
-                    pass
+                    future.result()
 
         return 0
 
@@ -1,22 +1,22 @@
 #! /usr/bin/env python3
 """
 Script to generate payload for Func6_partition: 
-Generate matrix with different size, and upload them to GCP bucket.
+Generate matrix with different size, and upload them to the bucket.
 """
 
 import os
+import sys
 import shutil
 import requests
 import numpy as np
-from google.cloud import storage
 
 # Function Configuration
 APP_NAME = "App2_gensort"
 FUNC_NAME = "Func6_partition"
 
-# GCP configuration
-storage_client = storage.Client(project=os.getenv("GCP_PROJECT"))
-bucket = storage_client.get_bucket(os.getenv("GCP_BUCKET"))
+# Storage configuration
+sys.path.append(os.getenv("BENCH_HOME"))
+from billibench import datagen
 
 # Directory paths
 PARENT_DIR = os.path.join(os.getenv("BENCH_HOME"), "Dataset", APP_NAME, FUNC_NAME)
@@ -33,7 +33,7 @@ matrix_sizes = {
     "large": 1024*1024*256*10,
 }
 
-def generate_matrix(size):
+def generate_matrix(size, seed):
     """Generate matrix with different size."""
     # generate payload directory
     os.makedirs(PAYLOAD_DIRS[size], exist_ok=True)
@@ -41,17 +41,24 @@ def generate_matrix(size):
     # generate matrix
     dat_path = os.path.join(PAYLOAD_DIRS[size], f"{size}.dat")
     matrix = np.memmap(dat_path, dtype='uint32', mode='w+', shape=(matrix_sizes[size],))
-    matrix[:] = np.random.randint(5000000, size=(matrix_sizes[size],), dtype=np.uint32)
+    rs = np.random.RandomState(seed)
+    matrix[:] = rs.randint(5000000, size=(matrix_sizes[size],), dtype=np.uint32)
     matrix.flush()
-    
-    # upload matrix to GCP bucket
-    blob = bucket.blob(os.path.join(FUNC_NAME, os.path.basename(dat_path)))
-    blob.upload_from_filename(dat_path)
+
+    # files to upload to the bucket
+    return [(os.path.join(FUNC_NAME, os.path.basename(dat_path)), dat_path,
+             {"shape": [matrix_sizes[size]], "dtype": "<u4"})]
+
+def estimate_memory(size):
+    """Estimated peak memory of generate_matrix(size) in bytes."""
+    # random array plus the dirty pages of the memory map
+    return 2 * 4 * matrix_sizes[size]
 
 def main():
     """Main function."""
-    for size in matrix_sizes:
-        generate_matrix(size)
+    datagen.run(generate_matrix, matrix_sizes, FUNC_NAME,
+                memory={size: estimate_memory(size) for size in matrix_sizes},
+                params={size: {"length": matrix_sizes[size], "high": 5000000} for size in matrix_sizes})
 
 if __name__ == "__main__":
     main()
@@ -1,16 +1,16 @@
 import os
-import tempfile
-from google.cloud import storage
+import sys
 import numpy as np
 import random
 
 # Fetch required environment variables
 BENCH_HOME = os.getenv("BENCH_HOME")
-project_id = os.getenv("GCP_PROJECT")
-bucket_name = os.getenv("GCP_BUCKET")
 
-if not BENCH_HOME or not project_id or not bucket_name: 
-    raise EnvironmentError("Required environment variables (BENCH_HOME, GCP_PROJECT, GCP_BUCKET) are not set.") 
+if not BENCH_HOME:
+    raise EnvironmentError("Required environment variable (BENCH_HOME) is not set.")
+
+sys.path.append(BENCH_HOME)
+from billibench import manifest, scratch, storage, trace
 
 matrix_sizes = {
     "small": 1024*1024*25,
@@ -18,11 +18,6 @@ matrix_sizes = {
     "large": 1024*1024*256*10,
 }
 
-def initialize_storage(project_id, bucket_name):
-    """Initialize Google Cloud Storage client and bucket."""
-    storage_client = storage.Client(project=project_id)
-    return storage_client.get_bucket(bucket_name)
-
 
 def handler(events):
     """
@@ -30,25 +25,26 @@ def handler(events):
     Returns: int 0 on success, raises exception on failure.
     """
     try:
-        # Initialize Google Cloud Storage
-        bucket = initialize_storage(project_id, bucket_name)
+        # Initialize storage backend
+        bucket = storage.initialize_storage()
 
         # Temporary directory for processing
-        with tempfile.TemporaryDirectory(dir=BENCH_HOME) as tmp_dir:
+        with scratch.directory() as tmp_dir:
             dat_path = os.path.join(tmp_dir, f"{events['size']}.dat")
 
-            # Download payload from GCP bucket
-            blob = bucket.blob(os.path.join("Func7_sample", os.path.basename(dat_path)))
-            blob.chunk_size = 1<<30
-            blob.download_to_filename(dat_path)
+            # Download payload from the bucket
+            with trace.phase("download"):
+                manifest.get(bucket, os.path.join("Func7_sample", os.path.basename(dat_path)), dat_path, chunk_size=1 << 30)
 
-            matrix = np.memmap(dat_path, dtype='uint32', mode='r', shape=(matrix_sizes[events['size']],))
-            results = []
-            for _ in range(1024*128):
-                results.append(str(matrix[random.randint(0, matrix_sizes[events['size']]-1)]))
+            with trace.phase("sample"):
+                matrix = np.memmap(dat_path, dtype='uint32', mode='r', shape=(matrix_sizes[events['size']],))
+                results = []
+                for _ in range(1024*128):
+                    results.append(str(matrix[random.randint(0, matrix_sizes[events['size']]-1)]))
 
-            # upload the result to GCP bucket
-            bucket.blob(os.path.join("Func7_sample", f"{events['size']}_result.txt")).upload_from_string("\n".join(results))
+            # upload the result to the bucket
+            with trace.phase("upload"):
+                bucket.put_bytes(os.path.join("Func7_sample", f"{events['size']}_result.txt"), "\n".join(results))
 
         return 0
 
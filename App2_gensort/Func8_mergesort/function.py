@@ -1,50 +1,55 @@
 import os
-import tempfile
+import sys
 import numpy as np
-from google.cloud import storage
 import parallel_sort
 
 # Fetch required environment variables
 BENCH_HOME = os.getenv("BENCH_HOME")
-project_id = os.getenv("GCP_PROJECT")
-bucket_name = os.getenv("GCP_BUCKET")
 
-if not BENCH_HOME or not project_id or not bucket_name: 
-    raise EnvironmentError("Required environment variables (BENCH_HOME, GCP_PROJECT, GCP_BUCKET) are not set.") 
+if not BENCH_HOME:
+    raise EnvironmentError("Required environment variable (BENCH_HOME) is not set.")
+
+sys.path.append(BENCH_HOME)
+from billibench import manifest, scratch, storage, trace
 
-def initialize_storage(project_id, bucket_name):
-    """Initialize Google Cloud Storage client and bucket."""
-    storage_client = storage.Client(project=project_id)
-    return storage_client.get_bucket(bucket_name)
 
 def handler(events):
     """
-    Args: events (dict) including 'size' parameter.
+    Args: events (dict) including 'size' parameter;
+          optional 'input_key' and 'output_key' parameters (bucket keys of the partition to sort, e.g. an
+          output of Func6_partition, and of the sorted result).
     Returns: int 0 on success, raises exception on failure.
     """
     try:
-        # Initialize Google Cloud Storage
-        bucket = initialize_storage(project_id, bucket_name)
+        # Initialize storage backend
+        bucket = storage.initialize_storage()
 
         # Temporary directory for processing
-        with tempfile.TemporaryDirectory(dir=BENCH_HOME) as tmp_dir:
+        with scratch.directory() as tmp_dir:
             input_path = os.path.join(tmp_dir, f"{events['size']}.npy")
             output_path = os.path.join(tmp_dir, f"{events['size']}_sorted.npy")
 
-            # Download payload from GCP bucket
-            blob = bucket.blob(os.path.join("Func8_mergesort", events['size'], os.path.basename(input_path)))
-            blob.chunk_size = 1<<30
-            blob.download_to_filename(input_path)
+            # Download payload from the bucket
+            with trace.phase("download"):
+                if "input_key" in events:
+                    bucket.get(events["input_key"], input_path, chunk_size=1 << 30)
+                else:
+                    manifest.get(bucket, os.path.join("Func8_mergesort", events['size'], os.path.basename(input_path)), input_path, chunk_size=1 << 30)
 
             # Load the partition array
-            partition_array = np.load(input_path)
+            with trace.phase("load"):
+                partition_array = np.load(input_path)
 
             # Sort the partition array
-            partition_array_sorted = parallel_sort.sort(partition_array)
+            with trace.phase("sort"):
+                partition_array_sorted = parallel_sort.sort(partition_array)
 
-            # save and upload the sorted partition array to GCP bucket
-            np.save(output_path, partition_array_sorted)
-            bucket.blob(os.path.join("Func8_mergesort", events['size'], os.path.basename(output_path))).upload_from_filename(output_path)
+            # save and upload the sorted partition array to the bucket
+            with trace.phase("save"):
+                np.save(output_path, partition_array_sorted)
+            with trace.phase("upload"):
+                output_key = events.get("output_key", os.path.join("Func8_mergesort", events['size'], os.path.basename(output_path)))
+                bucket.put(output_key, output_path)
 
             return 0
 
@@ -1,20 +1,17 @@
 import os
+import sys
 from datetime import datetime                                   
 from jinja2 import Template
-from google.cloud import storage
 
 # Fetch required environment variables
 BENCH_HOME = os.getenv("BENCH_HOME")
-project_id = os.getenv("GCP_PROJECT")
-bucket_name = os.getenv("GCP_BUCKET")
 
-if not BENCH_HOME or not project_id or not bucket_name:
-    raise EnvironmentError("Required environment variables (BENCH_HOME, GCP_PROJECT, GCP_BUCKET) are not set.")
+if not BENCH_HOME:
+    raise EnvironmentError("Required environment variable (BENCH_HOME) is not set.")
+
+sys.path.append(BENCH_HOME)
+from billibench import storage, trace
 
-def initialize_storage(project_id, bucket_name):
-    """Initialize Google Cloud Storage client and bucket."""
-    storage_client = storage.Client(project=project_id)
-    return storage_client.get_bucket(bucket_name)
 
 def handler(events):
     """
@@ -22,25 +19,25 @@ def handler(events):
     Returns: int 0 on success, raises exception on failure.
     """
     try:
-        # Initialize Google Cloud Storage
-        bucket = initialize_storage(project_id, bucket_name)  
+        # Initialize storage backend
+        bucket = storage.initialize_storage()  
 
-        # download the string from the bucket Func10_dynamicHtml/{size}
-        blob = bucket.blob(os.path.join('Func10_dynamicHtml', f"{events['size']}"))
-        review = blob.download_as_string()
+        with trace.phase("download"):
+            # download the string from the bucket Func10_dynamicHtml/{size}
+            review = bucket.get_bytes(os.path.join('Func10_dynamicHtml', f"{events['size']}"))
 
-        # download the html template from the bucket Func10_dynamicHtml/template.html
-        blob = bucket.blob(os.path.join('Func10_dynamicHtml', 'html_template'))
-        template_html = blob.download_as_string().decode('utf-8')
+            # download the html template from the bucket Func10_dynamicHtml/template.html
+            template_html = bucket.get_bytes(os.path.join('Func10_dynamicHtml', 'html_template')).decode('utf-8')
 
         # render the template with the content
-        template = Template(template_html)
-        html = template.render(username = 'harper', cur_time = datetime.now(), random_numbers = review)
+        with trace.phase("render"):
+            template = Template(template_html)
+            html = template.render(username = 'harper', cur_time = datetime.now(), random_numbers = review)
 
 
         # upload the html to the bucket Func10_dynamicHtml/output.html
-        blob = bucket.blob(os.path.join('Func10_dynamicHtml', f"output_{events['size']}.html"))
-        blob.upload_from_string(html)
+        with trace.phase("upload"):
+            bucket.put_bytes(os.path.join('Func10_dynamicHtml', f"output_{events['size']}.html"), html)
 
         return 0
     
@@ -1,19 +1,15 @@
 import os
-import tempfile
-from google.cloud import storage
+import sys
 
 # Fetch required environment variables
 BENCH_HOME = os.getenv("BENCH_HOME")
-project_id = os.getenv("GCP_PROJECT")
-bucket_name = os.getenv("GCP_BUCKET")
 
-if not BENCH_HOME or not project_id or not bucket_name:
-    raise EnvironmentError("Required environment variables (BENCH_HOME, GCP_PROJECT, GCP_BUCKET) are not set.")
+if not BENCH_HOME:
+    raise EnvironmentError("Required environment variable (BENCH_HOME) is not set.")
+
+sys.path.append(BENCH_HOME)
+from billibench import scratch, storage, trace
 
-def initialize_storage(project_id, bucket_name):
-    """Initialize Google Cloud Storage client and bucket."""
-    storage_client = storage.Client(project=project_id)
-    return storage_client.get_bucket(bucket_name)
 
 def handler(events):
     """
@@ -21,16 +17,16 @@ def handler(events):
     Returns: int 0 on success, raises exception on failure.
     """
     try:
-        # Initialize Google Cloud Storage
-        bucket = initialize_storage(project_id, bucket_name)  
+        # Initialize storage backend
+        bucket = storage.initialize_storage()  
 
         # download the string from the bucket Func11_get/{size}
-        blob = bucket.blob(os.path.join('Func11_get', f"{events['size']}"))
-        review = blob.download_as_string().decode('utf-8')
+        with trace.phase("download"):
+            review = bucket.get_bytes(os.path.join('Func11_get', f"{events['size']}")).decode('utf-8')
         print(len(review))
         
         # save to a tmp file
-        with tempfile.TemporaryDirectory(dir=BENCH_HOME) as tmp_dir:   
+        with trace.phase("write"), scratch.directory() as tmp_dir:   
             tmp_file_path = os.path.join(tmp_dir, f"output_{events['size']}.txt")
             with open(tmp_file_path, 'w') as f:
                 f.write(review)
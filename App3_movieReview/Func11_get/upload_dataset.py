@@ -4,22 +4,19 @@ Script to generate payload for Func10_dynamicHtml: generate a dynamic html page.
 """
 
 import os
+import sys
 import shutil
 import random
 from git import Repo
-from google.cloud import storage
 
 # Function Configuration
 APP_NAME = "App3_movieReview"
 FUNC_NAME = "Func11_get"
 
-# raise error if Environment variables are not set
-if os.getenv("GCP_PROJECT") is None or os.getenv("GCP_BUCKET") is None:
-    raise ValueError("GCP_PROJECT and GCP_BUCKET must be set")
-
-# GCP configuration
-storage_client = storage.Client(project=os.getenv("GCP_PROJECT"))
-bucket = storage_client.get_bucket(os.getenv("GCP_BUCKET"))
+# Storage configuration
+sys.path.append(os.getenv("BENCH_HOME"))
+from billibench import storage
+bucket = storage.initialize_storage()
 
 # Directory paths
 PARENT_DIR = os.path.join(os.getenv("BENCH_HOME"), "Dataset", APP_NAME, FUNC_NAME)
@@ -35,8 +32,7 @@ def upload_contents():
     """Upload the contents to the bucket."""
     for size, content_length in size_dict.items():
         content = "0" * content_length
-        blob = bucket.blob(os.path.join(FUNC_NAME, f"{size}"))
-        blob.upload_from_string(content)
+        bucket.put_bytes(os.path.join(FUNC_NAME, f"{size}"), content)
 
 
 if __name__ == "__main__":
@@ -1,22 +1,13 @@
-import os, shutil, tempfile, json
-import torch
-from torchvision import transforms
-from PIL import Image
-from PIL import ImageFile
-from google.cloud import storage
+import os, sys, shutil, json
 
 # Fetch required environment variables
 BENCH_HOME = os.getenv("BENCH_HOME")
-project_id = os.getenv("GCP_PROJECT")
-bucket_name = os.getenv("GCP_BUCKET")
 
-if not BENCH_HOME or not project_id or not bucket_name:
-    raise EnvironmentError("Required environment variables (BENCH_HOME, GCP_PROJECT, GCP_BUCKET) are not set.") 
+if not BENCH_HOME:
+    raise EnvironmentError("Required environment variable (BENCH_HOME) is not set.")
 
-def initialize_storage(project_id, bucket_name):
-    """Initialize Google Cloud Storage client and bucket."""
-    storage_client = storage.Client(project=project_id)
-    return storage_client.get_bucket(bucket_name)
+sys.path.append(BENCH_HOME)
+from billibench import scratch, storage, trace
 
 
 def handler(events):
@@ -28,24 +19,29 @@ def handler(events):
     resize_sizes = {'small': 256, 'medium': 256, 'large': 299}
     crop_sizes = {'small': 224, 'medium': 224, 'large': 299}
     try:
-        # Initialize Google Cloud Storage
-        bucket = initialize_storage(project_id, bucket_name)
+        # Import heavy libraries on first use
+        with trace.phase("import"):
+            import torch
+            from torchvision import transforms
+            from PIL import Image
+
+        # Initialize storage backend
+        bucket = storage.initialize_storage()
 
         # Temporary directory for processing
-        with tempfile.TemporaryDirectory(dir=BENCH_HOME) as tmp_dir:
-            # download input image from GCP bucket
-            blob = bucket.blob(f"Func12_labelImage/512px-Cacatua_moluccensis_-Cincinnati_Zoo-8a.jpg")
-            blob.chunk_size = 1<<30
-            blob.download_to_filename(os.path.join(tmp_dir, "input.jpg"))
+        with scratch.directory() as tmp_dir:
+            with trace.phase("download"):
+                # download input image from the bucket
+                bucket.get(f"Func12_labelImage/512px-Cacatua_moluccensis_-Cincinnati_Zoo-8a.jpg", os.path.join(tmp_dir, "input.jpg"), chunk_size=1 << 30)
 
-            # download imagenet_class_index.json from GCP bucket
-            blob = bucket.blob(f"Func12_labelImage/imagenet_class_index.json")
-            blob.download_to_filename(os.path.join(tmp_dir, "imagenet_class_index.json"))
+                # download imagenet_class_index.json from the bucket
+                bucket.get(f"Func12_labelImage/imagenet_class_index.json", os.path.join(tmp_dir, "imagenet_class_index.json"))
 
             # load the image and label
-            input_image = Image.open(os.path.join(tmp_dir, "input.jpg"))
-            label_index = json.load(open(os.path.join(tmp_dir, "imagenet_class_index.json"), 'r'))
-            idx2label = [label_index[str(k)][1] for k in range(len(label_index))]
+            with trace.phase("load"):
+                input_image = Image.open(os.path.join(tmp_dir, "input.jpg"))
+                label_index = json.load(open(os.path.join(tmp_dir, "imagenet_class_index.json"), 'r'))
+                idx2label = [label_index[str(k)][1] for k in range(len(label_index))]
 
             preprocess = transforms.Compose([
                 transforms.Resize(resize_sizes[events['size']]),
@@ -54,16 +50,18 @@ def handler(events):
                 transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
             ])
 
-            model = torch.hub.load('pytorch/vision:v0.10.0', models[events['size']], pretrained=True)
-            model.eval()
+            with trace.phase("load_model"):
+                model = torch.hub.load('pytorch/vision:v0.10.0', models[events['size']], pretrained=True)
+                model.eval()
 
-            input_tensor = preprocess(input_image)
-            input_batch = input_tensor.unsqueeze(0) 
-            output = model(input_batch)
+            with trace.phase("inference"):
+                input_tensor = preprocess(input_image)
+                input_batch = input_tensor.unsqueeze(0) 
+                output = model(input_batch)
 
 
-            _, index = torch.max(output, 1)
-            ret = idx2label[index]
+                _, index = torch.max(output, 1)
+                ret = idx2label[index]
 
             return {'idx': index.item(), 'class': ret}
     except Exception as e:
@@ -4,53 +4,48 @@ Script to generate payload for Func12_labelImage: download image and label from
 """
 
 import os
+import sys
 import shutil
 import random
 from git import Repo
-from google.cloud import storage
 import urllib.request
 # Function Configuration
 APP_NAME = "App4_MLInference"
 FUNC_NAME = "Func12_labelImage"
 
-# raise error if Environment variables are not set
-if os.getenv("GCP_PROJECT") is None or os.getenv("GCP_BUCKET") is None:
-    raise ValueError("GCP_PROJECT and GCP_BUCKET must be set")
-
-# GCP configuration
-storage_client = storage.Client(project=os.getenv("GCP_PROJECT"))
-bucket = storage_client.get_bucket(os.getenv("GCP_BUCKET"))
+# Storage configuration
+sys.path.append(os.getenv("BENCH_HOME"))
+from billibench import storage
+bucket = storage.initialize_storage()
 
 # Directory paths
 DATASET_DIR = os.path.join(os.getenv("BENCH_HOME"), "Dataset", APP_NAME, FUNC_NAME)
 
 def upload_image_to_gcp(image_url, image_name):
     """
-    Upload image to GCP bucket.
+    Upload image to the bucket.
     """
     # download image from url   
     image_path = os.path.join(DATASET_DIR, image_name)
     urllib.request.urlretrieve(image_url, image_path)
 
-    # upload image to GCP bucket
-    blob = bucket.blob(f"{FUNC_NAME}/{image_name}")
-    blob.upload_from_filename(image_path)
+    # upload image to the bucket
+    bucket.put(f"{FUNC_NAME}/{image_name}", image_path)
 
 def upload_label_to_gcp(label_url, label_name):
     """
-    Upload label to GCP bucket.
+    Upload label to the bucket.
     """
     # download label from url
     label_path = os.path.join(DATASET_DIR, label_name)
     urllib.request.urlretrieve(label_url, label_path)
 
-    # upload label to GCP bucket
-    blob = bucket.blob(f"{FUNC_NAME}/{label_name}")
-    blob.upload_from_filename(label_path)
+    # upload label to the bucket
+    bucket.put(f"{FUNC_NAME}/{label_name}", label_path)
 
 def main():
     """
-    Main function to upload dataset to GCP bucket.
+    Main function to upload dataset to the bucket.
     """
     image_url = "https://raw.githubusercontent.com/spcl/serverless-benchmarks-data/refs/heads/master/400.inference/411.image-recognition/fake-resnet/512px-Cacatua_moluccensis_-Cincinnati_Zoo-8a.jpg"
     label_url = "https://raw.githubusercontent.com/raghakot/keras-vis/master/resources/imagenet_class_index.json"
@@ -61,7 +56,7 @@ def main():
             shutil.rmtree(DATASET_DIR)
         os.makedirs(DATASET_DIR, exist_ok=True)
 
-        # upload image and label to GCP bucket
+        # upload image and label to the bucket
         upload_image_to_gcp(image_url, "512px-Cacatua_moluccensis_-Cincinnati_Zoo-8a.jpg")
         upload_label_to_gcp(label_url, "imagenet_class_index.json")
     except Exception as e:
@@ -1,27 +1,37 @@
-from google.cloud import storage
-from transformers import pipeline
 import os
+import sys
 
 # Fetch required environment variables
 BENCH_HOME = os.getenv("BENCH_HOME")
-project_id = os.getenv("GCP_PROJECT")
-bucket_name = os.getenv("GCP_BUCKET")
 
-if not BENCH_HOME or not project_id or not bucket_name:
-    raise EnvironmentError("Required environment variables (BENCH_HOME, GCP_PROJECT, GCP_BUCKET) are not set.")
+if not BENCH_HOME:
+    raise EnvironmentError("Required environment variable (BENCH_HOME) is not set.")
+
+sys.path.append(BENCH_HOME)
+from billibench import trace
+
+# pipeline task and model per size
+model_configs = {
+    'small': ("question-answering", 'distilbert-base-uncased-distilled-squad'),
+    'medium': ("question-answering", 'bert-large-uncased-whole-word-masking-finetuned-squad'),
+    'large': ("text-generation", 'gpt2-large'),
+}
 
 models = {}
 
+def load_model(size):
+    """Import transformers and load the pipeline for one size on first use."""
+    if size not in models:
+        from transformers import pipeline
+        task, model = model_configs[size]
+        models[size] = pipeline(task, model=model)
+    return models[size]
+
 def load_models():
-    models['small'] = pipeline("question-answering", model='distilbert-base-uncased-distilled-squad')
-    models['medium'] = pipeline("question-answering", model='bert-large-uncased-whole-word-masking-finetuned-squad')
-    models['large'] = pipeline("text-generation", model='gpt2-large')
+    for size in model_configs:
+        load_model(size)
     
 
-def initialize_storage(project_id, bucket_name):
-    """Initialize Google Cloud Storage client and bucket."""
-    storage_client = storage.Client(project=project_id)
-    return storage_client.get_bucket(bucket_name)
 
 def handler(events):
     """
@@ -29,14 +39,18 @@ def handler(events):
     Returns: int 0 on success, raises exception on failure.
     """
     try:
-        if events['task_type'] == 'qa':
-            result = models[events['size']](events['question'], events['context'])['answer']
+        with trace.phase("load_model"):
+            model = load_model(events['size'])
+
+        with trace.phase("inference"):
+            if events['task_type'] == 'qa':
+                result = model(events['question'], events['context'])['answer']
 
-        elif events['task_type'] == 'text_gen':
-            result = models[events['size']](events['prompt'], max_length=200)[0]
+            elif events['task_type'] == 'text_gen':
+                result = model(events['prompt'], max_length=200)[0]
 
-        else:
-            raise ValueError(f"Invalid task type: {events['task_type']}")
+            else:
+                raise ValueError(f"Invalid task type: {events['task_type']}")
             
         return result
 
@@ -1,11 +1,11 @@
 #!/usr/bin/env python3
 """
-Script to generate payload for Func14_knn: generate dataset for KNN and upload to GCP bucket.
+Script to generate payload for Func14_knn: generate dataset for KNN and upload to the bucket.
 """
 
 import os
+import sys
 import shutil
-from google.cloud import storage
 from sklearn.datasets import make_classification
 import numpy as np
 
@@ -13,13 +13,9 @@ import numpy as np
 APP_NAME = "App5_MlTraining"
 FUNC_NAME = "Func14_knn"
 
-# raise error if Environment variables are not set
-if os.getenv("GCP_PROJECT") is None or os.getenv("GCP_BUCKET") is None:
-    raise ValueError("GCP_PROJECT and GCP_BUCKET must be set")
-
-# GCP configuration
-storage_client = storage.Client(project=os.getenv("GCP_PROJECT"))
-bucket = storage_client.get_bucket(os.getenv("GCP_BUCKET"))
+# Storage configuration
+sys.path.append(os.getenv("BENCH_HOME"))
+from billibench import datagen
 
 DATASET_DIR = os.path.join(os.getenv("BENCH_HOME"), "Dataset", APP_NAME, FUNC_NAME)
 
@@ -47,10 +43,12 @@ n_classes_dict = {
     "large": 150,
 }
 
-def generate_dataset(size):
+def generate_dataset(size, seed):
     """
     Generate dataset for KNN.
     """
+    os.makedirs(DATASET_DIR, exist_ok=True)
+
     n_samples = n_samples_dict[size]
     n_features = n_features_dict[size]
     n_informative = n_informative_dict[size]
@@ -62,30 +60,42 @@ def generate_dataset(size):
                                n_repeated=0,
                                n_redundant=0,
                                n_classes=n_classes,
-                               random_state=777)
+                               random_state=seed)
 
     np.save(os.path.join(DATASET_DIR, f"{size}_x.npy"), X)
     np.save(os.path.join(DATASET_DIR, f"{size}_y.npy"), y)
 
-    blob = bucket.blob(f"{FUNC_NAME}/{size}_x.npy")
-    blob.chunk_size = 1<<30
-    blob.upload_from_filename(os.path.join(DATASET_DIR, f"{size}_x.npy"))
+    # files to upload to the bucket
+    return [(f"{FUNC_NAME}/{size}_x.npy", os.path.join(DATASET_DIR, f"{size}_x.npy")),
+            (f"{FUNC_NAME}/{size}_y.npy", os.path.join(DATASET_DIR, f"{size}_y.npy"))]
+
+def estimate_memory(size):
+    """Estimated peak memory of generate_dataset(size) in bytes."""
+    # float64 features plus the generator's temporary copies
+    return 3 * 8 * n_samples_dict[size] * n_features_dict[size]
 
-    blob = bucket.blob(f"{FUNC_NAME}/{size}_y.npy")
-    blob.chunk_size = 1<<30
-    blob.upload_from_filename(os.path.join(DATASET_DIR, f"{size}_y.npy"))
+def parameters(size):
+    """Generator parameters of a size, recorded in the manifest."""
+    return {
+        "n_samples": n_samples_dict[size],
+        "n_features": n_features_dict[size],
+        "n_informative": n_informative_dict[size],
+        "n_classes": n_classes_dict[size],
+    }
 
 def main():
     """
-    Main function to generate dataset and upload to GCP bucket.
+    Main function to generate dataset and upload to the bucket.
     """
     # clean up DATASET_DIR
     if os.path.exists(DATASET_DIR):
         shutil.rmtree(DATASET_DIR)
     os.makedirs(DATASET_DIR, exist_ok=True)
 
-    for size in ["small", "medium", "large"]:
-        generate_dataset(size)
+    sizes = ["small", "medium", "large"]
+    datagen.run(generate_dataset, sizes, FUNC_NAME,
+                memory={size: estimate_memory(size) for size in sizes},
+                params={size: parameters(size) for size in sizes})
 
 if __name__ == "__main__":
     main()
@@ -1,23 +1,17 @@
-from sklearn.linear_model import LogisticRegression
 import numpy as np
 import os
-import tempfile
+import sys
 import pickle
-from google.cloud import storage
 
 # Fetch required environment variables
 BENCH_HOME = os.getenv("BENCH_HOME")
-project_id = os.getenv("GCP_PROJECT")
-bucket_name = os.getenv("GCP_BUCKET")
 
-if not BENCH_HOME or not project_id or not bucket_name:
-    raise EnvironmentError("Required environment variables (BENCH_HOME, GCP_PROJECT, GCP_BUCKET) are not set.")
+if not BENCH_HOME:
+    raise EnvironmentError("Required environment variable (BENCH_HOME) is not set.")
 
+sys.path.append(BENCH_HOME)
+from billibench import manifest, scratch, storage, trace
 
-def initialize_storage(project_id, bucket_name):
-    """Initialize Google Cloud Storage client and bucket."""
-    storage_client = storage.Client(project=project_id)
-    return storage_client.get_bucket(bucket_name)
 
 def handler(events):
     """
@@ -25,38 +19,47 @@ def handler(events):
     Returns: int 0 on success, raises exception on failure.
     """
     try:
-        # Initialize Google Cloud Storage
-        bucket = initialize_storage(project_id, bucket_name)
+        # Import heavy libraries on first use
+        with trace.phase("import"):
+            from sklearn.linear_model import LogisticRegression
+
+        # Initialize storage backend
+        bucket = storage.initialize_storage()
 
         # Temporary directory for processing
-        with tempfile.TemporaryDirectory(dir=BENCH_HOME) as tmp_dir:
+        with scratch.directory() as tmp_dir:
             # define the paths
             X_path = os.path.join(tmp_dir, f"{events['size']}_x.npy")
             y_path = os.path.join(tmp_dir, f"{events['size']}_y.npy")
 
-            # download the dataset from GCP bucket
-            bucket.blob(f"Func16_logisticReg/{events['size']}_x.npy").download_to_filename(X_path)
-            bucket.blob(f"Func16_logisticReg/{events['size']}_y.npy").download_to_filename(y_path)
+            # download the dataset from the bucket
+            with trace.phase("download"):
+                manifest.get(bucket, f"Func16_logisticReg/{events['size']}_x.npy", X_path)
+                manifest.get(bucket, f"Func16_logisticReg/{events['size']}_y.npy", y_path)
 
             # load the dataset
-            X = np.load(X_path)
-            y = np.load(y_path)
+            with trace.phase("load"):
+                X = np.load(X_path)
+                y = np.load(y_path)
 
             # train the Logistic Regression classifier
-            log_reg = LogisticRegression(penalty='l2', C=1.0,
-                                          fit_intercept=True,
-                                          verbose=False,
-                                          tol=1e-10, max_iter=100,
-                                          solver="lbfgs", multi_class='auto')
-            alg = log_reg.fit(X, y)
+            with trace.phase("train"):
+                log_reg = LogisticRegression(penalty='l2', C=1.0,
+                                              fit_intercept=True,
+                                              verbose=False,
+                                              tol=1e-10, max_iter=100,
+                                              solver="lbfgs", multi_class='auto')
+                alg = log_reg.fit(X, y)
 
             # save the model
-            model_path = os.path.join(tmp_dir, f"{events['size']}_logisticReg_model.pkl")
-            with open(model_path, 'wb') as f:
-                pickle.dump(alg, f)
+            with trace.phase("save"):
+                model_path = os.path.join(tmp_dir, f"{events['size']}_logisticReg_model.pkl")
+                with open(model_path, 'wb') as f:
+                    pickle.dump(alg, f)
 
-            # upload the model to GCP bucket
-            bucket.blob(f"Func16_logisticReg/{events['size']}_logisticReg_model.pkl").upload_from_filename(model_path)
+            # upload the model to the bucket
+            with trace.phase("upload"):
+                bucket.put(f"Func16_logisticReg/{events['size']}_logisticReg_model.pkl", model_path)
 
             return 0
 
@@ -1,14 +1,10 @@
-import sklearn.cluster
 import numpy as np
 import os
-import tempfile
+import sys
 import pickle
-from google.cloud import storage
 
 # Fetch required environment variables
 BENCH_HOME = os.getenv("BENCH_HOME")
-project_id = os.getenv("GCP_PROJECT")
-bucket_name = os.getenv("GCP_BUCKET")
 
 # number of centers for different sizes
 n_centers_dict = {
@@ -17,13 +13,12 @@ n_centers_dict = {
     "large": 100,
 }
 
-if not BENCH_HOME or not project_id or not bucket_name:
-    raise EnvironmentError("Required environment variables (BENCH_HOME, GCP_PROJECT, GCP_BUCKET) are not set.")
+if not BENCH_HOME:
+    raise EnvironmentError("Required environment variable (BENCH_HOME) is not set.")
+
+sys.path.append(BENCH_HOME)
+from billibench import manifest, scratch, storage, trace
 
-def initialize_storage(project_id, bucket_name):
-    """Initialize Google Cloud Storage client and bucket."""
-    storage_client = storage.Client(project=project_id)
-    return storage_client.get_bucket(bucket_name)
 
 def handler(events):
     """
@@ -31,30 +26,39 @@ def handler(events):
     Returns: int 0 on success, raises exception on failure.
     """
     try:
-        # Initialize Google Cloud Storage
-        bucket = initialize_storage(project_id, bucket_name)
+        # Import heavy libraries on first use
+        with trace.phase("import"):
+            import sklearn.cluster
+
+        # Initialize storage backend
+        bucket = storage.initialize_storage()
 
         # Temporary directory for processing
-        with tempfile.TemporaryDirectory(dir=BENCH_HOME) as tmp_dir:
+        with scratch.directory() as tmp_dir:
             # define the paths
             X_path = os.path.join(tmp_dir, f"{events['size']}_x.npy")
 
-            # download the dataset from GCP bucket
-            bucket.blob(f"Func18_kmeans/{events['size']}_x.npy").download_to_filename(X_path)
+            # download the dataset from the bucket
+            with trace.phase("download"):
+                manifest.get(bucket, f"Func18_kmeans/{events['size']}_x.npy", X_path)
 
             # load the dataset
-            X = np.load(X_path)
+            with trace.phase("load"):
+                X = np.load(X_path)
 
             # train the KMeans classifier
-            kmeans = sklearn.cluster.KMeans(n_clusters=n_centers_dict[events['size']], max_iter=50).fit(X)
+            with trace.phase("train"):
+                kmeans = sklearn.cluster.KMeans(n_clusters=n_centers_dict[events['size']], max_iter=50).fit(X)
 
             # save the model
-            model_path = os.path.join(tmp_dir, f"{events['size']}_kmeans_model.pkl")
-            with open(model_path, 'wb') as f:
-                pickle.dump(kmeans, f)
+            with trace.phase("save"):
+                model_path = os.path.join(tmp_dir, f"{events['size']}_kmeans_model.pkl")
+                with open(model_path, 'wb') as f:
+                    pickle.dump(kmeans, f)
 
-            # upload the model to GCP bucket
-            bucket.blob(f"Func18_kmeans/{events['size']}_kmeans_model.pkl").upload_from_filename(model_path)
+            # upload the model to the bucket
+            with trace.phase("upload"):
+                bucket.put(f"Func18_kmeans/{events['size']}_kmeans_model.pkl", model_path)
 
             return 0
 
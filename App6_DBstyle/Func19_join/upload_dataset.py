@@ -1,11 +1,11 @@
 #!/usr/bin/env python3
 """
-Script to generate payload for Func19_join: generate dataset for Join and upload to GCP bucket.
+Script to generate payload for Func19_join: generate dataset for Join and upload to the bucket.
 """
 
 import os
+import sys
 import shutil
-from google.cloud import storage
 import numpy as np
 import pandas as pd
 
@@ -13,13 +13,9 @@ import pandas as pd
 APP_NAME = "App6_DBstyle"
 FUNC_NAME = "Func19_join"
 
-# raise error if Environment variables are not set
-if os.getenv("GCP_PROJECT") is None or os.getenv("GCP_BUCKET") is None:
-    raise ValueError("GCP_PROJECT and GCP_BUCKET must be set")
-
-# GCP configuration
-storage_client = storage.Client(project=os.getenv("GCP_PROJECT"))
-bucket = storage_client.get_bucket(os.getenv("GCP_BUCKET"))
+# Storage configuration
+sys.path.append(os.getenv("BENCH_HOME"))
+from billibench import datagen
 
 DATASET_DIR = os.path.join(os.getenv("BENCH_HOME"), "Dataset", APP_NAME, FUNC_NAME)
 
@@ -35,68 +31,77 @@ K_dict = {
     "large": 40000,
 }
 
-def generate_dataset(size):
+def generate_dataset(size, seed):
+    os.makedirs(DATASET_DIR, exist_ok=True)
     N = N_dict[size]
     K = K_dict[size]
+    rs = np.random.RandomState(seed)
 
     # generate join1
     DT = {}
     DT["id0"] = np.arange(N)
-    DT["id1"] = np.random.randint(N/K, size=N)  
-    DT["id2"] = np.random.randint(K, size=N)
-    DT["id3"] = np.random.randint(N/K, size=N)                 
-    DT["id4"] = np.random.randint(K, size=N)  
-    DT["id5"] = np.random.randint(K, size=N)
-    DT["id6"] = np.random.randint(N/K, size=N)   
-    DT["id7"] = np.random.randint(K, size=N)  
-    DT["id8"] = np.random.randint(K, size=N)
-    DT["id9"] = np.random.randint(N/K, size=N) 
-    DT["id10"] = np.random.randint(K, size=N)  
-    DT["id11"] = np.random.randint(N/K, size=N)  
-    DT["id12"] = np.random.randint(K, size=N)
-    DT["id13"] = np.random.randint(N/K, size=N)                 
-    DT["id14"] = np.random.randint(K, size=N)  
-    DT["id15"] = np.random.randint(K, size=N)
-    DT["id16"] = np.random.randint(N/K, size=N)   
-    DT["id17"] = np.random.randint(K, size=N)  
-    DT["id18"] = np.random.randint(K, size=N)
-    DT["id19"] = np.random.randint(N/K, size=N)  
-
-    DT["v1"] =  np.random.randint(N, size=N)   
-    DT["v2"] =  np.random.randint(N, size=N)   
-    DT["v3"] =  np.random.randint(100, size=N)   
-    DT["v4"] =  np.random.randint(N, size=N)   
-    DT["v5"] =  np.random.randint(N, size=N)
+    DT["id1"] = rs.randint(N/K, size=N)  
+    DT["id2"] = rs.randint(K, size=N)
+    DT["id3"] = rs.randint(N/K, size=N)                 
+    DT["id4"] = rs.randint(K, size=N)  
+    DT["id5"] = rs.randint(K, size=N)
+    DT["id6"] = rs.randint(N/K, size=N)   
+    DT["id7"] = rs.randint(K, size=N)  
+    DT["id8"] = rs.randint(K, size=N)
+    DT["id9"] = rs.randint(N/K, size=N) 
+    DT["id10"] = rs.randint(K, size=N)  
+    DT["id11"] = rs.randint(N/K, size=N)  
+    DT["id12"] = rs.randint(K, size=N)
+    DT["id13"] = rs.randint(N/K, size=N)                 
+    DT["id14"] = rs.randint(K, size=N)  
+    DT["id15"] = rs.randint(K, size=N)
+    DT["id16"] = rs.randint(N/K, size=N)   
+    DT["id17"] = rs.randint(K, size=N)  
+    DT["id18"] = rs.randint(K, size=N)
+    DT["id19"] = rs.randint(N/K, size=N)  
+
+    DT["v1"] =  rs.randint(N, size=N)   
+    DT["v2"] =  rs.randint(N, size=N)   
+    DT["v3"] =  rs.randint(100, size=N)   
+    DT["v4"] =  rs.randint(N, size=N)   
+    DT["v5"] =  rs.randint(N, size=N)
 
     df = pd.DataFrame(data = DT)
     df.to_csv(os.path.join(DATASET_DIR, f"{size}_join1.csv"), index=False)
 
-    blob = bucket.blob(f"{FUNC_NAME}/{size}_join1.csv")
-    blob.chunk_size = 1<<30
-    blob.upload_from_filename(os.path.join(DATASET_DIR, f"{size}_join1.csv"))
-
     # generate join2
     DT = {}
     DT["id0"] = np.arange(N)
-    DT["v6"] =  np.random.randint(N, size=N)   
+    DT["v6"] =  rs.randint(N, size=N)   
     df = pd.DataFrame(data = DT)
     df.to_csv(os.path.join(DATASET_DIR, f"{size}_join2.csv"), index=False)
 
-    blob = bucket.blob(f"{FUNC_NAME}/{size}_join2.csv")
-    blob.chunk_size = 1<<30
-    blob.upload_from_filename(os.path.join(DATASET_DIR, f"{size}_join2.csv"))
+    # files to upload to the bucket
+    return [(f"{FUNC_NAME}/{size}_join1.csv", os.path.join(DATASET_DIR, f"{size}_join1.csv")),
+            (f"{FUNC_NAME}/{size}_join2.csv", os.path.join(DATASET_DIR, f"{size}_join2.csv"))]
+
+def estimate_memory(size):
+    """Estimated peak memory of generate_dataset(size) in bytes."""
+    # 25 int64 columns, copied once more when the DataFrame is built
+    return 2 * 25 * 8 * N_dict[size]
+
+def parameters(size):
+    """Generator parameters of a size, recorded in the manifest."""
+    return {"N": N_dict[size], "K": K_dict[size]}
 
 def main():
     """
-    Main function to generate dataset and upload to GCP bucket.
+    Main function to generate dataset and upload to the bucket.
     """
     # clean up DATASET_DIR
     if os.path.exists(DATASET_DIR):
         shutil.rmtree(DATASET_DIR)
     os.makedirs(DATASET_DIR, exist_ok=True)
 
-    for size in ["small"]:
-        generate_dataset(size)
+    sizes = ["small"]
+    datagen.run(generate_dataset, sizes, FUNC_NAME,
+                memory={size: estimate_memory(size) for size in sizes},
+                params={size: parameters(size) for size in sizes})
 
 if __name__ == "__main__":
     main()
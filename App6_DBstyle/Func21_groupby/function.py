@@ -1,20 +1,15 @@
-import dask.dataframe as dd
 import os
-import tempfile
-from google.cloud import storage
+import sys
 
 # Fetch required environment variables
 BENCH_HOME = os.getenv("BENCH_HOME")
-project_id = os.getenv("GCP_PROJECT")
-bucket_name = os.getenv("GCP_BUCKET")
 
-if not BENCH_HOME or not project_id or not bucket_name:
-    raise EnvironmentError("Required environment variables (BENCH_HOME, GCP_PROJECT, GCP_BUCKET) are not set.")
+if not BENCH_HOME:
+    raise EnvironmentError("Required environment variable (BENCH_HOME) is not set.")
+
+sys.path.append(BENCH_HOME)
+from billibench import manifest, scratch, storage, trace
 
-def initialize_storage(project_id, bucket_name):
-    """Initialize Google Cloud Storage client and bucket."""
-    storage_client = storage.Client(project=project_id)
-    return storage_client.get_bucket(bucket_name)
 
 blocksize_dict = {
     "small": "250MB",
@@ -28,34 +23,38 @@ def handler(events):
     Returns: int 0 on success, raises exception on failure.
     """
     try:
-        # Initialize Google Cloud Storage
-        bucket = initialize_storage(project_id, bucket_name)
+        # Import heavy libraries on first use
+        with trace.phase("import"):
+            import dask.dataframe as dd
+
+        # Initialize storage backend
+        bucket = storage.initialize_storage()
 
         # Temporary directory for processing
-        with tempfile.TemporaryDirectory(dir=BENCH_HOME) as tmp_dir:
+        with scratch.directory() as tmp_dir:
             # define the paths
             x_path = os.path.join(tmp_dir, f"{events['size']}.csv")
             output_path = os.path.join(tmp_dir, f"{events['size']}_groupby_result.csv")
 
-            # download the dataset from GCP bucket
-            blob = bucket.blob(f"Func21_groupby/{events['size']}.csv")
-            blob.chunk_size = 1<<30
-            blob.download_to_filename(x_path)
+            # download the dataset from the bucket
+            with trace.phase("download"):
+                manifest.get(bucket, f"Func21_groupby/{events['size']}.csv", x_path, chunk_size=1 << 30)
             
-            # load the dataset
-            x = dd.read_csv(x_path, blocksize=blocksize_dict[events["size"]])
+            with trace.phase("groupby"):
+                # load the dataset
+                x = dd.read_csv(x_path, blocksize=blocksize_dict[events["size"]])
             
-            # perform the join
-            ans = x.groupby('id1', dropna=False, observed=True).agg({'v1':'sum'}).compute()
-            ans.reset_index(inplace=True)
+                # perform the join
+                ans = x.groupby('id1', dropna=False, observed=True).agg({'v1':'sum'}).compute()
+                ans.reset_index(inplace=True)
 
             # save the result
-            ans.to_csv(output_path)
+            with trace.phase("save"):
+                ans.to_csv(output_path)
 
-            # upload the result to GCP bucket
-            blob = bucket.blob(f"Func21_groupby/{events['size']}_groupby_result.csv")
-            blob.chunk_size = 1<<30
-            blob.upload_from_filename(output_path)
+            # upload the result to the bucket
+            with trace.phase("upload"):
+                bucket.put(f"Func21_groupby/{events['size']}_groupby_result.csv", output_path, chunk_size=1 << 30)
 
             return 0
 
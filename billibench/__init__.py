@@ -0,0 +1,3 @@
+"""
+Shared harness for running and measuring the BilliBench function suite.
+"""
@@ -0,0 +1,247 @@
+"""
+Streaming payload extraction.
+
+fetch_and_unpack() extracts a zip payload while it is still downloading: a background thread reads
+the object stream from the bucket, and the entries are parsed from their local file headers and
+written to the destination directory as their bytes arrive. Download and decompression overlap and
+the archive itself is never written to disk.
+
+Stored, deflated and bzip2 entries (with or without data descriptors, including zip64) are
+supported. Archives that cannot be streamed (encryption, other compression methods, stored entries
+of unknown size) fall back to downloading the archive and unpacking it with shutil, as do all
+archives when BENCH_STREAM_UNZIP=0 or when the payload cache is enabled (the cached copy is local).
+"""
+
+import os
+import bz2
+import zlib
+import queue
+import shutil
+import struct
+import threading
+
+from billibench import cache, trace
+
+LOCAL_HEADER = b"PK\x03\x04"
+CENTRAL_HEADER = b"PK\x01\x02"
+END_OF_CENTRAL_DIRECTORY = b"PK\x05\x06"
+ZIP64_END_OF_CENTRAL_DIRECTORY = b"PK\x06\x06"
+DATA_DESCRIPTOR = b"PK\x07\x08"
+
+STORED = 0
+DEFLATED = 8
+BZIP2 = 12
+
+READ_SIZE = 8 << 20
+DESCRIPTOR_READ_SIZE = 64 << 10
+PREFETCH_DEPTH = 4
+
+
+class StreamingError(Exception):
+    """The archive cannot be extracted from a stream."""
+
+
+def streaming_enabled():
+    """Return True unless streaming extraction is switched off with BENCH_STREAM_UNZIP=0."""
+    return os.getenv("BENCH_STREAM_UNZIP", "1") != "0"
+
+
+class PrefetchReader:
+    """Read a stream ahead of the consumer from a background thread."""
+
+    def __init__(self, stream, read_size=READ_SIZE, depth=PREFETCH_DEPTH):
+        self.stream = stream
+        self.read_size = read_size
+        self.bytes_read = 0
+        self._chunks = queue.Queue(depth)
+        self._buffer = b""
+        self._pos = 0
+        self._eof = False
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="billibench-prefetch", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._closed.is_set():
+                chunk = self.stream.read(self.read_size)
+                self._chunks.put(chunk)
+                if not chunk:
+                    return
+        except Exception as e:
+            self._chunks.put(e)
+
+    def _fill(self):
+        if self._eof:
+            return False
+        chunk = self._chunks.get()
+        if isinstance(chunk, Exception):
+            raise chunk
+        if not chunk:
+            self._eof = True
+            return False
+        self.bytes_read += len(chunk)
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def read_some(self, n):
+        """Return between 1 and n bytes from the current chunk, or b"" at the end of the stream."""
+        if self._pos == len(self._buffer):
+            self._fill()
+        data = self._buffer[self._pos:self._pos + n]
+        self._pos += len(data)
+        return data
+
+    def read_exact(self, n):
+        """Return exactly n bytes."""
+        while len(self._buffer) - self._pos < n:
+            if not self._fill():
+                raise StreamingError("Unexpected end of archive")
+        data = self._buffer[self._pos:self._pos + n]
+        self._pos += n
+        return data
+
+    def unread(self, n):
+        """Give back the last n bytes returned by the previous read."""
+        self._pos -= n
+
+    def close(self):
+        """Stop prefetching and close the stream."""
+        self._closed.set()
+        while self._thread.is_alive():
+            try:
+                self._chunks.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        self.stream.close()
+
+
+def _target(dest, name):
+    """Return the path to extract name to, or None for unsafe names (same rule as shutil)."""
+    if name.startswith("/") or ".." in name.split("/"):
+        return None
+    return os.path.join(dest, *name.split("/"))
+
+
+def _zip64_sizes(extra, usize, csize):
+    """Read the 64-bit sizes from a zip64 extended information extra field."""
+    i = 0
+    while i + 4 <= len(extra):
+        header_id, size = struct.unpack("<HH", extra[i:i + 4])
+        if header_id == 0x0001:
+            values = extra[i + 4:i + 4 + size]
+            j = 0
+            if usize == 0xFFFFFFFF:
+                usize = struct.unpack("<Q", values[j:j + 8])[0]
+                j += 8
+            if csize == 0xFFFFFFFF:
+                csize = struct.unpack("<Q", values[j:j + 8])[0]
+            return usize, csize, True
+        i += 4 + size
+    return usize, csize, False
+
+
+def _decompressor(method):
+    if method == DEFLATED:
+        return zlib.decompressobj(-15)
+    if method == BZIP2:
+        return bz2.BZ2Decompressor()
+    raise StreamingError(f"Unsupported compression method {method}")
+
+
+def _extract_entry(reader, dest):
+    """Extract the entry following a local file header signature."""
+    (_, flags, method, _, _, crc, csize, usize, name_length,
+     extra_length) = struct.unpack("<HHHHHIIIHH", reader.read_exact(26))
+    name = reader.read_exact(name_length).decode("utf-8" if flags & 0x800 else "cp437")
+    usize, csize, zip64 = _zip64_sizes(reader.read_exact(extra_length), usize, csize)
+    descriptor = flags & 0x08
+
+    if flags & 0x01:
+        raise StreamingError(f"Encrypted entry: {name}")
+    if descriptor and method == STORED:
+        raise StreamingError(f"Stored entry of unknown size: {name}")
+
+    path = _target(dest, name)
+    if path and name.endswith("/"):
+        os.makedirs(path, exist_ok=True)
+        path = None
+    elif path:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    out = open(path, "wb") if path else None
+    checksum = 0
+    try:
+        if method == STORED or (csize == 0 and not descriptor):
+            remaining = csize
+            while remaining:
+                data = reader.read_exact(min(remaining, READ_SIZE))
+                remaining -= len(data)
+                checksum = zlib.crc32(data, checksum)
+                if out:
+                    out.write(data)
+        else:
+            decompressor = _decompressor(method)
+            remaining = None if descriptor else csize
+            while not decompressor.eof:
+                if remaining == 0:
+                    raise StreamingError(f"Truncated entry: {name}")
+                # without a known size feed small pieces, so little is handed back at the end
+                data = reader.read_some(DESCRIPTOR_READ_SIZE if remaining is None else min(remaining, READ_SIZE))
+                if not data:
+                    raise StreamingError(f"Unexpected end of archive in {name}")
+                if remaining is not None:
+                    remaining -= len(data)
+                data = decompressor.decompress(data)
+                checksum = zlib.crc32(data, checksum)
+                if out:
+                    out.write(data)
+            unused = len(decompressor.unused_data)
+            reader.unread(unused)
+            if remaining is not None and remaining + unused:
+                # skip anything between the end of the compressed stream and the next header
+                reader.read_exact(remaining + unused)
+    finally:
+        if out:
+            out.close()
+
+    if descriptor:
+        signature = reader.read_exact(4)
+        if signature != DATA_DESCRIPTOR:
+            reader.unread(len(signature))
+        crc = struct.unpack("<I", reader.read_exact(4))[0]
+        reader.read_exact(16 if zip64 else 8)
+    if checksum != crc:
+        raise StreamingError(f"Bad CRC-32 for {name}")
+
+
+def extract_stream(stream, dest):
+    """Extract a zip archive read sequentially from a binary stream into dest. Returns bytes read."""
+    reader = PrefetchReader(stream)
+    try:
+        while True:
+            signature = reader.read_exact(4)
+            if signature == LOCAL_HEADER:
+                _extract_entry(reader, dest)
+            elif signature in (CENTRAL_HEADER, END_OF_CENTRAL_DIRECTORY, ZIP64_END_OF_CENTRAL_DIRECTORY):
+                break
+            else:
+                raise StreamingError("Not a zip archive")
+    finally:
+        reader.close()
+    return reader.bytes_read
+
+
+def fetch_and_unpack(bucket, key, dest, chunk_size=None):
+    """Download the zip archive at key and extract it into dest."""
+    if streaming_enabled() and not isinstance(bucket, cache.CachingBackend):
+        try:
+            trace.add_bytes(extract_stream(bucket.open(key), dest))
+            return
+        except StreamingError as e:
+            print(f"Streaming extraction of {key} failed ({e}), downloading the archive instead")
+
+    payload_path = os.path.join(dest, os.path.basename(key))
+    bucket.get(key, payload_path, chunk_size=chunk_size)
+    shutil.unpack_archive(payload_path, dest, "zip")
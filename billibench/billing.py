@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Billing model calculator for recorded resource traces.
+
+Prices every invocation in a runner results file (recorded with --sample-interval) under several
+billing schemes and reports, per function and size, how much of the allocated CPU and memory was
+actually used:
+
+    python -m billibench.billing results.jsonl --memory-mb 2048 --vcpus 1
+    python -m billibench.billing results.jsonl --allocation allocation.json --output billing.json
+
+Schemes with "usage": False bill the allocation (memory_gb * memory_price + vcpus * cpu_price) for
+the wall time rounded up to the scheme granularity. Schemes with "usage": True bill the CPU seconds
+and the memory GB-seconds (integral of RSS over time) that the process tree actually consumed.
+"""
+
+import sys
+import json
+import argparse
+
+import numpy as np
+
+GB = 1 << 30
+
+# Prices in USD per GB-second and per vCPU-second
+SCHEMES = {
+    # Memory-only pricing with CPU proportional to memory, 1 ms rounding (AWS Lambda style)
+    "gb_s_1ms": {"memory_price": 0.0000166667, "cpu_price": 0.0, "granularity": 0.001, "usage": False},
+    # Memory-only pricing, 100 ms rounding (older AWS Lambda)
+    "gb_s_100ms": {"memory_price": 0.0000166667, "cpu_price": 0.0, "granularity": 0.1, "usage": False},
+    # Separate GB-second and vCPU-second prices, 100 ms rounding (Google Cloud Functions style)
+    "gb_vcpu_s_100ms": {"memory_price": 0.0000025, "cpu_price": 0.000024, "granularity": 0.1, "usage": False},
+    # Separate GB-second and vCPU-second prices, 1 ms rounding
+    "gb_vcpu_s_1ms": {"memory_price": 0.0000025, "cpu_price": 0.000024, "granularity": 0.001, "usage": False},
+    # Bill the CPU seconds and memory GB-seconds actually consumed
+    "pay_for_use": {"memory_price": 0.0000025, "cpu_price": 0.000024, "granularity": 0.0, "usage": True},
+}
+
+DEFAULT_MEMORY_MB = 2048
+DEFAULT_VCPUS = 1
+
+
+class Traces:
+    """Resource traces of many invocations, concatenated into flat numpy arrays."""
+
+    def __init__(self, records):
+        self.records = [record for record in records if record.get("resources", {}).get("samples", {}).get("t")]
+        lengths = np.array([len(record["resources"]["samples"]["t"]) for record in self.records], dtype=np.int64)
+        self.starts = np.cumsum(lengths) - lengths
+        self.ends = self.starts + lengths - 1
+
+        def column(name):
+            if not self.records:
+                return np.zeros(0)
+            return np.concatenate([np.asarray(record["resources"]["samples"][name], dtype=np.float64)
+                                   for record in self.records])
+
+        self.t = column("t")
+        self.cpu_time = column("cpu_time")
+        self.rss = column("rss")
+
+    def __len__(self):
+        return len(self.records)
+
+    def wall_time(self):
+        """Return the handler wall time, falling back to the sampled duration."""
+        sampled = self.t[self.ends] - self.t[self.starts]
+        recorded = np.array([record.get("wall_time") or np.nan for record in self.records], dtype=np.float64)
+        return np.where(np.isnan(recorded), sampled, recorded)
+
+    def cpu_used(self):
+        """Return the CPU seconds consumed by each invocation."""
+        # the series is cumulative; older traces can dip where a child's time briefly dropped out of
+        # the tree, so take the peak rather than the last sample
+        peak = np.maximum.reduceat(self.cpu_time, self.starts) if len(self) else np.zeros(0)
+        return peak - self.cpu_time[self.starts]
+
+    def memory_used(self):
+        """Return the memory GB-seconds consumed by each invocation (trapezoidal integral of RSS)."""
+        if len(self.t) < 2:
+            return np.zeros(len(self))
+        areas = (self.rss[1:] + self.rss[:-1]) / 2 * np.diff(self.t)
+        # drop the areas that span two traces
+        areas[self.ends[:-1]] = 0.0
+        areas = np.append(areas, 0.0)
+        return np.add.reduceat(areas, self.starts) / GB
+
+    def peak_memory(self):
+        """Return the peak RSS of each invocation in GB."""
+        return np.maximum.reduceat(self.rss, self.starts) / GB if len(self) else np.zeros(0)
+
+
+def allocations(records, allocation=None, memory_mb=DEFAULT_MEMORY_MB, vcpus=DEFAULT_VCPUS):
+    """Return (memory_gb, vcpus) arrays, using per-function values from allocation when given."""
+    allocation = allocation or {}
+    memory = np.empty(len(records))
+    cpus = np.empty(len(records))
+    for i, record in enumerate(records):
+        config = allocation.get(record["function"], {})
+        config = config.get(record["size"], config)
+        memory[i] = config.get("memory_mb", memory_mb) / 1024
+        cpus[i] = config.get("vcpus", vcpus)
+    return memory, cpus
+
+
+def billed_duration(wall_time, granularity):
+    """Round durations up to the billing granularity."""
+    if not granularity:
+        return wall_time
+    return np.ceil(np.round(wall_time / granularity, 9)) * granularity
+
+
+def price(traces, memory_gb, vcpus, schemes=SCHEMES):
+    """Return a dict of per-invocation arrays: usage, allocation ratios and the charge under each scheme."""
+    wall_time = traces.wall_time()
+    cpu_used = traces.cpu_used()
+    memory_used = traces.memory_used()
+    result = {
+        "wall_time": wall_time,
+        "cpu_used": cpu_used,
+        "memory_used": memory_used,
+        "peak_memory": traces.peak_memory(),
+        "memory_gb": memory_gb,
+        "vcpus": vcpus,
+    }
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result["cpu_overcharge"] = np.where(cpu_used > 0, vcpus * wall_time / cpu_used, np.nan)
+        result["memory_overcharge"] = np.where(memory_used > 0, memory_gb * wall_time / memory_used, np.nan)
+
+    for name, scheme in schemes.items():
+        if scheme["usage"]:
+            charge = memory_used * scheme["memory_price"] + cpu_used * scheme["cpu_price"]
+        else:
+            billed = billed_duration(wall_time, scheme["granularity"])
+            charge = billed * (memory_gb * scheme["memory_price"] + vcpus * scheme["cpu_price"])
+            result[f"{name}_billed_time"] = billed
+        result[name] = charge
+
+    usage_schemes = [name for name, scheme in schemes.items() if scheme["usage"]]
+    if usage_schemes:
+        base = result[usage_schemes[0]]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for name, scheme in schemes.items():
+                if not scheme["usage"]:
+                    result[f"{name}_overcharge"] = np.where(base > 0, result[name] / base, np.nan)
+    return result
+
+
+def group(records, priced):
+    """Average the priced arrays per (function, size)."""
+    index = {}
+    inverse = np.array([index.setdefault((record["function"], record["size"]), len(index)) for record in records],
+                       dtype=np.int64)
+    unique = list(index)
+    counts = np.bincount(inverse, minlength=len(unique))
+    groups = []
+    for i, (func_name, size) in enumerate(unique):
+        groups.append({"function": func_name, "size": size, "invocations": int(counts[i])})
+    for field, values in priced.items():
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        sums = np.bincount(inverse[valid], weights=values[valid], minlength=len(unique))
+        n = np.bincount(inverse[valid], minlength=len(unique))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = sums / n
+        for i, entry in enumerate(groups):
+            entry[field] = None if n[i] == 0 else float(means[i])
+    return groups
+
+
+def load_records(path):
+    """Read a runner results file."""
+    with open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def report(groups, schemes):
+    """Print a table of charges and over-charge ratios per function and size."""
+    header = ["function", "size", "n", "wall_s", "cpu_x", "mem_x"] + list(schemes)
+    print("  ".join(f"{column:>16}" for column in header))
+    for entry in groups:
+        row = [entry["function"], entry["size"], entry["invocations"], entry["wall_time"],
+               entry["cpu_overcharge"], entry["memory_overcharge"]] + [entry[name] for name in schemes]
+        print("  ".join(f"{value:>16.4g}" if isinstance(value, float) else f"{str(value):>16}" for value in row))
+
+
+def main(argv=None):
+    """Price a results file under every billing scheme."""
+    parser = argparse.ArgumentParser(description="Price recorded resource traces under several billing models.")
+    parser.add_argument("results", help="JSON lines results file written by billibench.runner --sample-interval")
+    parser.add_argument("--memory-mb", type=float, default=DEFAULT_MEMORY_MB, help="allocated memory per instance")
+    parser.add_argument("--vcpus", type=float, default=DEFAULT_VCPUS, help="allocated vCPUs per instance")
+    parser.add_argument("--allocation", help="JSON file with per-function (and per-size) memory_mb and vcpus")
+    parser.add_argument("--schemes", help="JSON file with billing schemes (default: built-in schemes)")
+    parser.add_argument("--output", help="write the per function and size summary as JSON")
+    args = parser.parse_args(argv)
+
+    schemes = SCHEMES
+    if args.schemes:
+        with open(args.schemes, "r") as f:
+            schemes = json.load(f)
+    allocation = None
+    if args.allocation:
+        with open(args.allocation, "r") as f:
+            allocation = json.load(f)
+
+    records = load_records(args.results)
+    # failed and invalid invocations would skew the charges
+    ok = [record for record in records if record.get("status", "ok") == "ok"]
+    if len(ok) < len(records):
+        print(f"Skipped {len(records) - len(ok)} failed or invalid invocations")
+    records = ok
+    traces = Traces(records)
+    skipped = len(records) - len(traces)
+    if skipped:
+        print(f"Skipped {skipped} records without resource samples (run with --sample-interval)")
+    if not len(traces):
+        return 1
+
+    memory_gb, vcpus = allocations(traces.records, allocation, args.memory_mb, args.vcpus)
+    groups = group(traces.records, price(traces, memory_gb, vcpus, schemes))
+    report(groups, schemes)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(groups, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""
+Content-addressed on-host cache for downloaded payloads.
+
+Handlers download the same immutable inputs on every invocation. With BENCH_CACHE=1 the storage
+backend is wrapped in a CachingBackend that looks every get()/get_bytes() up in a local cache
+first, as a warm container that kept its files between invocations would. Entries are addressed by
+the hash of the storage location, the key and the object version (GCS generation and etag, or size
+and mtime for the local backend), so a rewritten object is never served stale.
+
+Looking up that version is a metadata request to the bucket on every get, hit or miss (a GCS
+get_blob round trip), so a hit still costs one request latency. With BENCH_CACHE_TTL=N a version
+checked less than N seconds ago is trusted without asking the bucket again ("inf" trusts it for the
+life of the process). Writes through the cache forget the key's version, but an object rewritten by
+another process can be served stale for up to N seconds. On a miss the version is checked again
+after the download, and the data is only cached when it did not change in between, so bytes of a
+newer object are never stored under the id of the old one.
+
+The cache holds at most BENCH_CACHE_BYTES bytes (default 10 GB) in BENCH_CACHE_DIR (default
+$BENCH_HOME/.cache/payloads) and evicts the least recently used entries. Hits, misses and bytes
+saved since the last reset_stats() are reported by stats().
+"""
+
+import os
+import shutil
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+DEFAULT_BUDGET = 10 << 30
+
+# Caches opened in this process, keyed by (directory, budget)
+_caches = {}
+_caches_lock = threading.Lock()
+
+_stats = {"hits": 0, "misses": 0, "bytes_saved": 0, "bytes_fetched": 0, "evictions": 0, "revalidations": 0,
+          "trusted": 0, "changed": 0}
+_stats_lock = threading.Lock()
+
+
+def enabled():
+    """Return True when the payload cache is switched on with BENCH_CACHE."""
+    return os.getenv("BENCH_CACHE", "0") not in ("", "0")
+
+
+def revalidate_after():
+    """Return the seconds a checked object version is trusted (BENCH_CACHE_TTL), 0 to check every time."""
+    return float(os.getenv("BENCH_CACHE_TTL", "0") or 0)
+
+
+def _count(**counts):
+    with _stats_lock:
+        for name, value in counts.items():
+            _stats[name] += value
+
+
+def reset_stats():
+    """Reset the hit/miss counters."""
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def stats():
+    """Return the hit/miss counters since the last reset_stats()."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+class PayloadCache:
+    """Files addressed by content id in a directory, with a byte budget and LRU eviction."""
+
+    def __init__(self, root, budget=DEFAULT_BUDGET):
+        self.root = os.path.abspath(root)
+        self.budget = budget
+        self._lock = threading.Lock()
+        # object name -> (content id, monotonic time its version was checked)
+        self.validated = {}
+        os.makedirs(self.root, exist_ok=True)
+
+        # rebuild the LRU order from a previous process, least recently used first
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(".") or not os.path.isfile(path):
+                continue
+            st = os.stat(path)
+            entries.append((st.st_mtime, name, st.st_size))
+        self.entries = OrderedDict((name, size) for _, name, size in sorted(entries))
+        self.size = sum(self.entries.values())
+        self._evict()
+
+    def _path(self, content_id):
+        return os.path.join(self.root, content_id)
+
+    def open(self, content_id):
+        """
+        Open a cached entry for reading and mark it recently used, or return None. The file is opened
+        under the lock, so a concurrent eviction cannot remove it before it is read.
+        """
+        with self._lock:
+            if content_id not in self.entries:
+                return None
+            path = self._path(content_id)
+            try:
+                f = open(path, "rb")
+                os.utime(path)
+            except FileNotFoundError:
+                # evicted by another process sharing the directory
+                self.size -= self.entries.pop(content_id, 0)
+                return None
+            self.entries.move_to_end(content_id)
+            return f
+
+    def insert(self, content_id, path=None, data=None):
+        """Add a file (copied) or a bytes object to the cache."""
+        size = os.path.getsize(path) if data is None else len(data)
+        if size > self.budget:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if data is None:
+                    with open(path, "rb") as src:
+                        shutil.copyfileobj(src, f, 1 << 20)
+                else:
+                    f.write(data)
+            os.replace(tmp_path, self._path(content_id))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        with self._lock:
+            self.size += size - self.entries.pop(content_id, 0)
+            self.entries[content_id] = size
+            self._evict()
+
+    def _evict(self):
+        while self.size > self.budget and self.entries:
+            content_id, size = self.entries.popitem(last=False)
+            self.size -= size
+            try:
+                os.unlink(self._path(content_id))
+            except FileNotFoundError:
+                pass
+            _count(evictions=1)
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            for content_id in self.entries:
+                try:
+                    os.unlink(self._path(content_id))
+                except FileNotFoundError:
+                    pass
+            self.entries.clear()
+            self.size = 0
+
+
+def cache_dir():
+    """Return the cache directory."""
+    root = os.getenv("BENCH_CACHE_DIR")
+    if root:
+        return root
+    if not os.getenv("BENCH_HOME"):
+        raise EnvironmentError("Required environment variable (BENCH_CACHE_DIR or BENCH_HOME) is not set.")
+    return os.path.join(os.getenv("BENCH_HOME"), ".cache", "payloads")
+
+
+def get_cache():
+    """Return the process-wide cache for the configured directory and budget."""
+    config = (cache_dir(), int(os.getenv("BENCH_CACHE_BYTES", DEFAULT_BUDGET)))
+    with _caches_lock:
+        if config not in _caches:
+            _caches[config] = PayloadCache(*config)
+        return _caches[config]
+
+
+class CachingBackend:
+    """Storage backend wrapper that serves get() and get_bytes() from a PayloadCache."""
+
+    def __init__(self, backend, cache, location=""):
+        self.backend = backend
+        self.cache = cache
+        self.location = location
+        self.name = backend.name
+
+    def __getattr__(self, attr):
+        return getattr(self.backend, attr)
+
+    def _content_id(self, key, trust=True):
+        name = f"{self.backend.name}:{self.location}:{key}"
+        ttl = revalidate_after()
+        if ttl and trust:
+            known = self.cache.validated.get(name)
+            if known and time.monotonic() - known[1] < ttl:
+                _count(trusted=1)
+                return known[0]
+        version = self.backend.version(key)
+        _count(revalidations=1)
+        content_id = hashlib.sha256(f"{name}:{version}".encode()).hexdigest()
+        self.cache.validated[name] = (content_id, time.monotonic())
+        return content_id
+
+    def _unchanged(self, key, content_id):
+        """Return True when the object still has the version content_id was computed from."""
+        if self._content_id(key, trust=False) == content_id:
+            return True
+        _count(changed=1)
+        return False
+
+    def _forget(self, key):
+        self.cache.validated.pop(f"{self.backend.name}:{self.location}:{key}", None)
+
+    def put(self, key, path, chunk_size=None):
+        """Upload a local file and forget the object's checked version."""
+        self._forget(key)
+        self.backend.put(key, path, chunk_size=chunk_size)
+
+    def put_bytes(self, key, data):
+        """Upload a str or bytes object and forget the object's checked version."""
+        self._forget(key)
+        self.backend.put_bytes(key, data)
+
+    def get(self, key, path, chunk_size=None):
+        """Copy an object to a local file from the cache, downloading it on a miss."""
+        content_id = self._content_id(key)
+        cached = self.cache.open(content_id)
+        if cached:
+            with cached, open(path, "wb") as f:
+                shutil.copyfileobj(cached, f, 1 << 20)
+            _count(hits=1, bytes_saved=os.path.getsize(path))
+            return
+        self.backend.get(key, path, chunk_size=chunk_size)
+        _count(misses=1, bytes_fetched=os.path.getsize(path))
+        if self._unchanged(key, content_id):
+            self.cache.insert(content_id, path=path)
+
+    def get_bytes(self, key):
+        """Read an object from the cache, downloading it on a miss."""
+        content_id = self._content_id(key)
+        cached = self.cache.open(content_id)
+        if cached:
+            with cached:
+                data = cached.read()
+            _count(hits=1, bytes_saved=len(data))
+            return data
+        data = self.backend.get_bytes(key)
+        _count(misses=1, bytes_fetched=len(data))
+        if self._unchanged(key, content_id):
+            self.cache.insert(content_id, data=data)
+        return data
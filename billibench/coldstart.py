@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Cold-start vs warm-start measurement.
+
+Every function runs in a fresh interpreter started with -X importtime. The child imports the
+handler, makes one cold call and then K warm calls in the same process. Handlers import heavy
+libraries and load models on first use, so the cold call pays for exactly what the requested size
+needs; pass --preload to run the load_models() hook before the cold call, as the runner does.
+
+The parent records the interpreter startup, import and model load times, first-call vs
+steady-state latency, and the import time of the handler aggregated per top-level package:
+
+    python -m billibench.coldstart --functions Func12_labelImage,Func19_join --sizes small --warm 5
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+from billibench import runner
+
+# Written to stderr by the child right before it imports the handler, so the import time of the
+# harness itself can be told apart from the handler's imports
+IMPORT_MARKER = "billibench: importing handler"
+
+
+def parse_importtime(lines):
+    """Aggregate -X importtime output into {top-level package: (self_us, count)} and the total."""
+    packages = {}
+    total = 0
+    for line in lines:
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # header line
+            continue
+        self_us = int(fields[0])
+        package = fields[2].strip().split(".")[0]
+        self_total, count = packages.get(package, (0, 0))
+        packages[package] = (self_total + self_us, count + 1)
+        total += self_us
+    return packages, total
+
+
+def child(func_name, size, warm, spawned, overrides=None, preload=False):
+    """Run in the fresh interpreter: import, cold call, warm calls. Prints one JSON line."""
+    entered = time.time()
+    app_name, path = runner.discover()[func_name]
+    event = runner.build_event(func_name, size, overrides)
+
+    sys.stderr.write(IMPORT_MARKER + "\n")
+    sys.stderr.flush()
+    start = time.perf_counter()
+    module = runner.import_function(func_name, path)
+    import_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if preload and hasattr(module, "load_models"):
+        module.load_models()
+    model_load_time = time.perf_counter() - start
+
+    cold = runner.invoke(module, event)
+    warm_calls = [runner.invoke(module, event) for _ in range(warm)]
+    result = {
+        "app": app_name,
+        "interpreter_startup": entered - spawned,
+        "import_time": import_time,
+        "model_load_time": model_load_time,
+        "first_call": cold["wall_time"],
+        "first_call_status": cold["status"],
+        "first_call_storage_setup": cold["storage_setup"],
+        "warm_calls": [record["wall_time"] for record in warm_calls],
+        "warm_statuses": [record["status"] for record in warm_calls],
+        "cold_total": time.time() - spawned - sum(record["wall_time"] for record in warm_calls),
+    }
+    sys.stdout.write("\n" + json.dumps(result, default=repr) + "\n")
+
+
+def measure(func_name, size, warm=5, overrides=None, timeout=None, preload=False):
+    """Run one function in a fresh interpreter and return the cold/warm measurements."""
+    command = [sys.executable, "-X", "importtime", "-m", "billibench.coldstart", "--child",
+               "--functions", func_name, "--sizes", size, "--warm", str(warm), "--spawned", repr(time.time()),
+               "--overrides", json.dumps(overrides or {})] + (["--preload"] if preload else [])
+    proc = subprocess.run(command, cwd=runner.BENCH_ROOT, capture_output=True, text=True, timeout=timeout)
+
+    record = {"function": func_name, "size": size, "overrides": overrides or {}, "warm": warm, "preload": preload}
+    lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+    if proc.returncode != 0 or not lines:
+        record.update({"status": "error", "error": proc.stderr.strip().splitlines()[-1:] or None,
+                       "returncode": proc.returncode})
+        return record
+    record.update(json.loads(lines[-1]))
+
+    stderr = proc.stderr.splitlines()
+    split = stderr.index(IMPORT_MARKER) if IMPORT_MARKER in stderr else 0
+    harness, harness_total = parse_importtime(stderr[:split])
+    packages, total = parse_importtime(stderr[split:])
+    record["harness_import_us"] = harness_total
+    record["handler_import_us"] = total
+    record["imports"] = {package: {"self_us": self_us, "modules": count}
+                         for package, (self_us, count) in sorted(packages.items(), key=lambda item: -item[1][0])}
+
+    warm_calls = record["warm_calls"]
+    record["steady_state"] = statistics.median(warm_calls) if warm_calls else None
+    record["cold_penalty"] = record["first_call"] - record["steady_state"] if warm_calls else None
+    record["status"] = "ok" if record["first_call_status"] == "ok" and set(record["warm_statuses"]) <= {"ok"} else "failed"
+    return record
+
+
+def report(record, top=5):
+    """Print one measurement."""
+    name = f"{record['function']} {record['size']}" + "".join(
+        f" {field}={value}" for field, value in sorted(record["overrides"].items()))
+    if record["status"] == "error":
+        print(f"{name}: error {record.get('error')}")
+        return
+    print(f"{name}: startup {record['interpreter_startup']:.3f}s "
+          f"import {record['import_time']:.3f}s models {record['model_load_time']:.3f}s "
+          f"first call {record['first_call']:.3f}s steady {record['steady_state'] or 0:.3f}s")
+    for package, entry in list(record["imports"].items())[:top]:
+        print(f"    {package:<24} {entry['self_us'] / 1e6:8.3f}s  {entry['modules']} modules")
+
+
+def main(argv=None):
+    """Measure cold and warm starts for a set of functions and sizes."""
+    parser = argparse.ArgumentParser(description="Measure cold-start vs warm-start latency and import time.")
+    parser.add_argument("--functions", help="comma separated function names (default: all)")
+    parser.add_argument("--sizes", default="small", help="comma separated sizes")
+    parser.add_argument("--warm", type=int, default=5, help="warm calls after the cold call")
+    parser.add_argument("--repetitions", type=int, default=1, help="fresh interpreters per function and size")
+    parser.add_argument("--set", action="append", default=[], metavar="FUNC.FIELD=V1,V2",
+                        help="set an extra event field, measuring every given value")
+    parser.add_argument("--preload", action="store_true", help="run load_models() before the cold call")
+    parser.add_argument("--timeout", type=float, help="seconds before a child interpreter is killed")
+    parser.add_argument("--output", default="coldstart.jsonl", help="JSON lines results file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--spawned", type=float, help=argparse.SUPPRESS)
+    parser.add_argument("--overrides", default="{}", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args.functions, args.sizes, args.warm, args.spawned, json.loads(args.overrides), args.preload)
+        return 0
+
+    matrix = {"sizes": args.sizes.split(","), "events": runner.parse_set(args.set)}
+    if args.functions:
+        matrix["functions"] = args.functions.split(",")
+    failures = 0
+    with open(os.path.abspath(args.output), "a") as out:
+        for func_name, size, overrides in runner.expand_matrix(matrix, runner.discover()):
+            for repetition in range(args.repetitions):
+                record = measure(func_name, size, args.warm, overrides, timeout=args.timeout, preload=args.preload)
+                record["repetition"] = repetition
+                failures += record["status"] != "ok"
+                out.write(json.dumps(record, default=repr) + "\n")
+                out.flush()
+                report(record)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+CPU-count scaling sweep.
+
+Every trial runs the handler in a fresh interpreter pinned with sched_setaffinity to the first k of
+the CPUs this process may use, for k = 1, 2, 4, ... up to all of them. The thread pool sizes of the
+numeric libraries (OMP_NUM_THREADS and friends) and the handlers' own thread counts (Func2_test and
+Func6_partition workers_num, Func4_xc_dump thread_number) follow k, unless --fixed-threads keeps
+their defaults to see how an oversubscribed handler behaves.
+
+Per core count it records the median latency and CPU seconds per invocation (the handler process
+and the tools it runs), the speedup over the smallest core count, the parallel efficiency
+(speedup / k) and the cores actually kept busy (CPU seconds / latency). The summary recommends the
+largest core count whose efficiency is still at least --min-efficiency:
+
+    python -m billibench.cpusweep --functions Func6_partition,Func8_mergesort,Func19_join --sizes large
+    python -m billibench.cpusweep --functions Func2_test --sizes medium --cores 1,4,16 --fixed-threads
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+
+from billibench import procs, runner
+from billibench.resultsdb import THREAD_VARIABLES
+
+# Event fields that set a handler's own thread count
+THREAD_EVENTS = {
+    "Func2_test": "workers_num",
+    "Func4_xc_dump": "thread_number",
+    "Func6_partition": "workers_num",
+}
+
+
+def default_cores(available):
+    """Return 1, 2, 4, ... up to the number of available CPUs, which is always included."""
+    counts = [1]
+    while counts[-1] * 2 < len(available):
+        counts.append(counts[-1] * 2)
+    if counts[-1] != len(available):
+        counts.append(len(available))
+    return counts
+
+
+def measure(func_name, size, cpus, repetitions=3, warmup=1, fixed_threads=False, timeout=None):
+    """Run one trial pinned to the given CPUs and return its record."""
+    overrides = {} if fixed_threads or func_name not in THREAD_EVENTS else {THREAD_EVENTS[func_name]: len(cpus)}
+    command = runner.child_command(func_name, size, warmup + repetitions, overrides)
+    record = {"function": func_name, "size": size, "cores": len(cpus), "cpus": sorted(cpus),
+              "repetitions": repetitions, "warmup": warmup, "fixed_threads": fixed_threads, "event": overrides}
+
+    env = None
+    if not fixed_threads:
+        env = dict(os.environ, **{name: str(len(cpus)) for name in THREAD_VARIABLES})
+
+    code, rusage, stdout, stderr, timed_out = procs.run_child(
+        command, lambda: os.sched_setaffinity(0, cpus), timeout, cwd=runner.BENCH_ROOT, env=env)
+    record["process_cpu_time"] = rusage.ru_utime + rusage.ru_stime
+    record["max_rss"] = rusage.ru_maxrss * 1024
+    result = runner.child_result(code, stdout)
+
+    if timed_out:
+        record["status"] = "timeout"
+    elif not result or set(result["statuses"][warmup:]) != {"ok"}:
+        record["status"] = "failed"
+        record["errors"] = result.get("errors") or stderr.strip().splitlines()[-3:]
+    else:
+        record["status"] = "ok"
+        record["wall_times"] = result["wall_times"][warmup:]
+        record["cpu_times"] = result["cpu_times"][warmup:]
+        record["median"] = statistics.median(record["wall_times"])
+        record["cpu_time"] = statistics.median(record["cpu_times"])
+        record["busy_cores"] = record["cpu_time"] / record["median"] if record["median"] else None
+    return record
+
+
+def sweep(func_name, size, core_counts, available, repetitions=3, warmup=1, fixed_threads=False,
+          min_efficiency=0.7, timeout=None, report=print):
+    """Sweep the core counts of one function and size. Returns (trials, recommendation)."""
+    trials = []
+    base = None
+    for count in sorted(core_counts):
+        record = measure(func_name, size, set(available[:count]), repetitions, warmup, fixed_threads, timeout)
+        if record["status"] == "ok":
+            base = base or record
+            # speedup over the smallest core count, scaled as if that count ran on one core
+            record["speedup"] = base["median"] / record["median"] * base["cores"]
+            record["efficiency"] = record["speedup"] / count
+        report(record)
+        trials.append(record)
+
+    efficient = [record["cores"] for record in trials
+                 if record["status"] == "ok" and record["efficiency"] >= min_efficiency]
+    recommendation = {"function": func_name, "size": size, "cores": max(efficient) if efficient else None,
+                      "min_efficiency": min_efficiency}
+    if base is None:
+        recommendation["reason"] = "no core count succeeded"
+    elif not efficient:
+        recommendation["reason"] = f"efficiency below {min_efficiency}"
+    return trials, recommendation
+
+
+def print_trial(record):
+    """Print one trial."""
+    if record["status"] != "ok":
+        print(f"{record['function']} {record['size']} {record['cores']:>3} cores: {record['status']}")
+        return
+    print(f"{record['function']} {record['size']} {record['cores']:>3} cores: latency {record['median']:.3f}s "
+          f"speedup {record['speedup']:5.2f} efficiency {record['efficiency']:4.2f} "
+          f"cpu {record['cpu_time']:.3f}s busy cores {record['busy_cores'] or 0:.2f}")
+
+
+def main(argv=None):
+    """Sweep CPU counts and report speedup and parallel efficiency per function and size."""
+    parser = argparse.ArgumentParser(description="Measure how each function scales with the number of cores.")
+    parser.add_argument("--functions", help="comma separated function names (default: all)")
+    parser.add_argument("--sizes", default="small", help="comma separated sizes")
+    parser.add_argument("--cores", help="comma separated core counts (default: 1, 2, 4, ... all available)")
+    parser.add_argument("--repetitions", type=int, default=3, help="measured invocations per trial")
+    parser.add_argument("--warmup", type=int, default=1, help="unmeasured invocations before them")
+    parser.add_argument("--fixed-threads", action="store_true",
+                        help="keep the default thread counts instead of matching them to the cores")
+    parser.add_argument("--min-efficiency", type=float, default=0.7,
+                        help="parallel efficiency a recommended core count must reach")
+    parser.add_argument("--timeout", type=float, help="seconds before a trial is killed")
+    parser.add_argument("--output", default="cpusweep.jsonl", help="JSON lines file with every trial")
+    parser.add_argument("--allocation",
+                        help="add the recommended core counts as vcpus to a billibench.billing allocation file")
+    args = parser.parse_args(argv)
+
+    available = sorted(os.sched_getaffinity(0))
+    core_counts = [int(count) for count in args.cores.split(",")] if args.cores else default_cores(available)
+    if max(core_counts) > len(available):
+        parser.error(f"only {len(available)} CPUs are available")
+
+    functions = runner.discover()
+    func_names = args.functions.split(",") if args.functions else sorted(
+        functions, key=lambda name: int(name.split("_")[0][4:]))
+    recommendations = []
+    with open(os.path.abspath(args.output), "a") as out:
+        def report(record):
+            print_trial(record)
+            out.write(json.dumps(record, default=repr) + "\n")
+            out.flush()
+
+        for func_name in func_names:
+            for size in args.sizes.split(","):
+                _, recommendation = sweep(func_name, size, core_counts, available, args.repetitions, args.warmup,
+                                          args.fixed_threads, args.min_efficiency, args.timeout, report)
+                recommendations.append(recommendation)
+
+    print()
+    for entry in recommendations:
+        cores = f"{entry['cores']} cores" if entry["cores"] else entry["reason"]
+        print(f"{entry['function']:<22} {entry['size']:<8} {cores}")
+    if args.allocation:
+        allocation = {}
+        if os.path.exists(args.allocation):
+            # keep the memory tiers written by billibench.memsweep
+            with open(args.allocation, "r") as f:
+                allocation = json.load(f)
+        for entry in recommendations:
+            if entry["cores"]:
+                allocation.setdefault(entry["function"], {}).setdefault(entry["size"], {})["vcpus"] = entry["cores"]
+        with open(args.allocation, "w") as f:
+            json.dump(allocation, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Parallel dataset generation for the upload_dataset.py scripts.
+
+Each size is generated by generate(size, seed) in a worker process, with a seed derived from the
+base seed and the size (see billibench.manifest.size_seed). The worker writes its files and
+returns the artifacts to upload as (key, path) pairs, or (key, path, info) with extra manifest fields
+such as the shape of a raw array. As soon as a size is finished its artifacts are uploaded from a
+thread pool in the parent, overlapping with the generation of the other sizes. Once everything is
+uploaded, the seed, parameters and checksums of the new sizes are merged into the function's
+manifest (see billibench.manifest).
+
+A size only starts when its estimated peak memory fits in the memory budget next to the sizes that
+are already running, so the large variants are not generated side by side on a small host. A size
+whose estimate exceeds the whole budget runs alone. Configuration:
+    BENCH_DATAGEN_WORKERS  generation processes (default: number of CPUs)
+    BENCH_DATAGEN_MEMORY   memory budget in GB (default: 80% of MemAvailable)
+    BENCH_DATAGEN_UPLOADS  concurrent uploads (default: 4)
+    BENCH_SEED             base seed of the per-size seeds (default: 777)
+"""
+
+import os
+import time
+import multiprocessing
+import concurrent.futures
+
+from billibench import manifest, storage
+
+GB = 1 << 30
+
+UPLOAD_CHUNK_SIZE = 1 << 30
+
+
+def available_memory():
+    """Return MemAvailable from /proc/meminfo in bytes."""
+    with open("/proc/meminfo", "r") as f:
+        for line in f:
+            if line.startswith("MemAvailable:"):
+                return int(line.split()[1]) * 1024
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES")
+
+
+def memory_budget():
+    """Return the memory budget for concurrent generation in bytes."""
+    budget = os.getenv("BENCH_DATAGEN_MEMORY")
+    if budget:
+        return int(float(budget) * GB)
+    return int(available_memory() * 0.8)
+
+
+def _upload(bucket, size, artifacts):
+    start = time.perf_counter()
+    for key, path in artifacts:
+        bucket.put(key, path, chunk_size=UPLOAD_CHUNK_SIZE)
+    return time.perf_counter() - start
+
+
+def _generate(generate, size, seed):
+    start = time.perf_counter()
+    artifacts = generate(size, seed)
+    elapsed = time.perf_counter() - start
+
+    # checksum in the worker, so large files are hashed in parallel
+    files, entries = [], []
+    for artifact in artifacts:
+        key, path, info = artifact if len(artifact) == 3 else (*artifact, {})
+        entry = manifest.describe(key, path, **info)
+        manifest.stamp(path, entry["sha256"])
+        files.append((key, path))
+        entries.append(entry)
+    return files, entries, elapsed
+
+
+def run(generate, sizes, func_name, memory=None, params=None, seed=None, workers=None, budget=None,
+        upload_threads=None):
+    """
+    Generate every size with generate(size, size_seed(seed, size)) in parallel, upload the returned
+    artifacts and record them in func_name's manifest.
+    memory maps a size to its estimated peak memory in bytes, params a size to its generator parameters.
+    """
+    sizes = list(sizes)
+    memory = memory or {}
+    params = params or {}
+    seed = manifest.seed() if seed is None else seed
+    workers = workers or int(os.getenv("BENCH_DATAGEN_WORKERS", os.cpu_count() or 1))
+    workers = max(1, min(workers, len(sizes)))
+    budget = budget or memory_budget()
+    upload_threads = upload_threads or int(os.getenv("BENCH_DATAGEN_UPLOADS", 4))
+    bucket = storage.initialize_storage()
+
+    pending = list(sizes)
+    running = {}
+    uploads = {}
+    entries = {}
+    errors = []
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context) as generators, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=upload_threads) as uploaders:
+        while pending or running:
+            # start every pending size that fits next to the running ones, in order
+            used = sum(memory.get(size, 0) for size in running.values())
+            for size in list(pending):
+                if len(running) >= workers:
+                    break
+                if running and used + memory.get(size, 0) > budget:
+                    continue
+                if memory.get(size, 0) > budget:
+                    print(f"{size}: estimated {memory[size] / GB:.1f} GB exceeds the {budget / GB:.1f} GB budget, "
+                          f"generating it alone")
+                running[generators.submit(_generate, generate, size, manifest.size_seed(seed, size))] = size
+                used += memory.get(size, 0)
+                pending.remove(size)
+
+            done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                size = running.pop(future)
+                try:
+                    artifacts, entries[size], elapsed = future.result()
+                except Exception as e:
+                    print(f"{size}: generation failed: {e}")
+                    errors.append((size, e))
+                    continue
+                print(f"{size}: generated in {elapsed:.1f}s, uploading {len(artifacts)} files")
+                uploads[uploaders.submit(_upload, bucket, size, artifacts)] = size
+
+        for future in concurrent.futures.as_completed(uploads):
+            size = uploads[future]
+            try:
+                print(f"{size}: uploaded in {future.result():.1f}s")
+            except Exception as e:
+                print(f"{size}: upload failed: {e}")
+                errors.append((size, e))
+
+    uploaded = {size: {"seed": manifest.size_seed(seed, size), "base_seed": seed, "params": params.get(size, {}),
+                       "artifacts": entries[size]}
+                for size in sizes if size in entries and size not in {size for size, _ in errors}}
+    if uploaded:
+        manifest.update(bucket, func_name, uploaded, generate)
+        print(f"{func_name}: recorded {', '.join(uploaded)} in {manifest.manifest_key(func_name)}")
+
+    if errors:
+        raise RuntimeError(f"Dataset generation failed for {', '.join(size for size, _ in errors)}")
@@ -0,0 +1,111 @@
+"""
+HDR-style latency histogram.
+
+Values are integers (the load generator records microseconds) counted in log-linear buckets: every
+power-of-two range is split into enough linear sub-buckets to keep the given number of significant
+decimal digits, so percentiles have a bounded relative error at any magnitude while memory stays
+small and constant. Histograms with the same parameters can be merged.
+"""
+
+import math
+
+
+class Histogram:
+    """Log-linear histogram of integer values between lowest and highest."""
+
+    def __init__(self, lowest=1, highest=3600 * 1000 * 1000, significant_figures=3):
+        if lowest < 1 or highest < 2 * lowest or not 1 <= significant_figures <= 5:
+            raise ValueError("Invalid histogram range or precision")
+        self.lowest = lowest
+        self.highest = highest
+        self.significant_figures = significant_figures
+
+        self.unit_magnitude = int(math.floor(math.log2(lowest)))
+        sub_bucket_count_magnitude = int(math.ceil(math.log2(2 * 10 ** significant_figures)))
+        self.sub_bucket_half_count_magnitude = max(sub_bucket_count_magnitude, 1) - 1
+        self.sub_bucket_count = 1 << (self.sub_bucket_half_count_magnitude + 1)
+        self.sub_bucket_half_count = self.sub_bucket_count // 2
+        self.sub_bucket_mask = (self.sub_bucket_count - 1) << self.unit_magnitude
+
+        # number of power-of-two buckets needed to cover highest
+        smallest_untrackable = self.sub_bucket_count << self.unit_magnitude
+        bucket_count = 1
+        while smallest_untrackable <= highest:
+            smallest_untrackable <<= 1
+            bucket_count += 1
+        self.counts = [0] * ((bucket_count + 1) * self.sub_bucket_half_count)
+
+        self.total = 0
+        self.overflows = 0
+        self.min = None
+        self.max = None
+        self.sum = 0
+
+    def _index(self, value):
+        pow2ceiling = (value | self.sub_bucket_mask).bit_length()
+        bucket_index = pow2ceiling - self.unit_magnitude - (self.sub_bucket_half_count_magnitude + 1)
+        sub_bucket_index = value >> (bucket_index + self.unit_magnitude)
+        return ((bucket_index + 1) << self.sub_bucket_half_count_magnitude) + sub_bucket_index - self.sub_bucket_half_count
+
+    def _value_range(self, index):
+        """Return the (lowest, highest) values counted at index."""
+        bucket_index = (index >> self.sub_bucket_half_count_magnitude) - 1
+        sub_bucket_index = (index & (self.sub_bucket_half_count - 1)) + self.sub_bucket_half_count
+        if bucket_index < 0:
+            sub_bucket_index -= self.sub_bucket_half_count
+            bucket_index = 0
+        shift = bucket_index + self.unit_magnitude
+        return sub_bucket_index << shift, (sub_bucket_index << shift) + (1 << shift) - 1
+
+    def record(self, value, count=1):
+        """Count a value; values above highest are clamped and counted as overflows."""
+        value = max(int(value), 0)
+        if value > self.highest:
+            self.overflows += count
+            value = self.highest
+        self.counts[self._index(value)] += count
+        self.total += count
+        self.sum += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        """Add the counts of another histogram with the same parameters."""
+        if (other.lowest, other.highest, other.significant_figures) != (self.lowest, self.highest,
+                                                                         self.significant_figures):
+            raise ValueError("Cannot merge histograms with different parameters")
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.total += other.total
+        self.overflows += other.overflows
+        self.sum += other.sum
+        if other.total:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def percentile(self, p):
+        """Return the value at percentile p (0-100), None when empty."""
+        if self.total == 0:
+            return None
+        target = max(1, int(math.ceil(p / 100 * self.total)))
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._value_range(i)[1], self.max)
+        return self.max
+
+    def mean(self):
+        """Return the mean of the recorded values, None when empty."""
+        return self.sum / self.total if self.total else None
+
+    def summary(self, percentiles=(50, 90, 95, 99, 99.9), scale=1):
+        """Return count, min, mean, max and the given percentiles, each divided by scale."""
+        if self.total == 0:
+            return {"count": 0}
+        summary = {"count": self.total, "min": self.min / scale, "mean": self.mean() / scale, "max": self.max / scale}
+        for p in percentiles:
+            summary[f"p{p:g}"] = self.percentile(p) / scale
+        if self.overflows:
+            summary["overflows"] = self.overflows
+        return summary
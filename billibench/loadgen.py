@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Open-loop load generator.
+
+Issues invocations of one function and size at a target rate to a pool of worker processes. Each
+worker imports the handler once and then serves requests from a shared FIFO queue, so when all
+workers are busy requests wait in the queue, as they would in front of a fixed pool of instances.
+Arrivals are scheduled independently of completions (open loop):
+    poisson   exponential inter-arrival times with mean 1/rate
+    constant  one request every 1/rate seconds
+    bursty    Poisson arrivals during --on seconds, none during --off seconds; the rate during on
+              periods is raised so that the mean rate over a whole cycle is still --rate
+
+For every request the queueing delay (arrival to handler start), the service time (handler start to
+end) and the latency (arrival to end) are recorded in HDR-style histograms. A worker that dies (a
+crash or an OOM kill) fails the request it was serving, even one it had only just taken from the
+queue; once every worker is gone, the requests still queued fail too, so a run always ends:
+
+    python -m billibench.loadgen --function Func7_sample --size small --rate 20 --duration 60 --workers 8
+    python -m billibench.loadgen --function Func10_dynamicHtml --arrival bursty --on 2 --off 8 --rate 5
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import random
+import argparse
+import multiprocessing
+
+from billibench import runner
+from billibench.histogram import Histogram
+
+ARRIVALS = ["poisson", "constant", "bursty"]
+
+# Seconds between checks for dead workers while waiting for results
+POLL_INTERVAL = 1.0
+
+# Slot value of a worker that is not serving a request
+IDLE = -(1 << 63)
+
+
+def arrival_times(process, rate, duration, on=1.0, off=1.0, seed=None):
+    """Return the arrival offsets (seconds from the start) of an arrival process over duration."""
+    rng = random.Random(seed)
+    times = []
+    if process == "constant":
+        n = int(duration * rate)
+        return [i / rate for i in range(n)]
+
+    if process == "poisson":
+        t = rng.expovariate(rate)
+        while t < duration:
+            times.append(t)
+            t += rng.expovariate(rate)
+        return times
+
+    if process == "bursty":
+        peak = rate * (on + off) / on
+        cycle = 0.0
+        while cycle < duration:
+            t = cycle + rng.expovariate(peak)
+            while t < min(cycle + on, duration):
+                times.append(t)
+                t += rng.expovariate(peak)
+            cycle += on + off
+        return times
+
+    raise ValueError(f"Unknown arrival process: {process}")
+
+
+def _worker(func_name, path, event, tasks, results, ready, current, slot):
+    """Serve requests from tasks until a None sentinel arrives, keeping the request served in current[slot]."""
+    try:
+        module = runner.load_function(func_name, path)
+    except Exception as e:
+        ready.put((os.getpid(), f"{type(e).__name__}: {e}"))
+        return
+    ready.put((os.getpid(), None))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        request_id, arrival = task
+        # shared memory, so the parent sees it even if this process dies before a queued message is sent
+        current[slot] = request_id
+        start = time.monotonic()
+        record = runner.invoke(module, event)
+        end = time.monotonic()
+        results.put({"id": request_id, "arrival": arrival, "start": start, "end": end, "pid": os.getpid(),
+                     "status": record["status"], "error": record.get("error")})
+        current[slot] = IDLE
+
+
+def _failed(request_id, arrival, pid, error):
+    now = time.monotonic()
+    return {"id": request_id, "arrival": arrival, "start": now, "end": now, "pid": pid, "status": "error",
+            "error": error}
+
+
+def collect(results, pool, current, outstanding):
+    """
+    Yield the results of the outstanding {request id: arrival} requests, all of them already queued.
+    The request of a worker that died becomes an error, and so does every outstanding request once no
+    worker is left. A worker can also die after taking a request from the queue and before recording
+    it in its slot; tasks are taken in FIFO order, so a request that is in no slot while a later one
+    was already taken, or while a live worker sits idle, was lost with it. Such a request fails once
+    it was seen that way at two polls in a row.
+    """
+    order = {request_id: i for i, request_id in enumerate(outstanding)}
+    taken = -1
+    failed = set()
+    suspects = set()
+    while outstanding:
+        try:
+            result = results.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            dead = [slot for slot, worker in enumerate(pool) if not worker.is_alive()]
+            for slot in dead:
+                request_id = current[slot]
+                if slot in failed or request_id not in outstanding:
+                    continue
+                failed.add(slot)
+                worker = pool[slot]
+                yield _failed(request_id, outstanding.pop(request_id), worker.pid,
+                              f"worker {worker.pid} exited with code {worker.exitcode}")
+            if len(dead) == len(pool):
+                for request_id, arrival in list(outstanding.items()):
+                    del outstanding[request_id]
+                    yield _failed(request_id, arrival, None, "no live workers")
+            elif dead:
+                serving = [current[slot] for slot, worker in enumerate(pool) if worker.is_alive()]
+                taken = max([taken] + [order[request_id] for request_id in serving if request_id in order])
+                lost = {request_id for request_id in outstanding if request_id not in serving
+                        and (IDLE in serving or order[request_id] < taken)}
+                for request_id in sorted(lost & suspects, key=order.get):
+                    yield _failed(request_id, outstanding.pop(request_id), None,
+                                  "request taken by a worker that exited")
+                suspects = lost - suspects
+            continue
+        taken = max(taken, order.get(result["id"], -1))
+        # a request already failed by a dead worker may still deliver its result; count it once
+        if outstanding.pop(result["id"], None) is not None:
+            yield result
+
+
+def run(func_name, size, rate, duration, workers=4, process="poisson", on=1.0, off=1.0, seed=None,
+        overrides=None, warmup=0, root=runner.BENCH_ROOT, output_path=None):
+    """Drive the function with open-loop load and return the summary."""
+    functions = runner.discover(root)
+    if func_name not in functions:
+        raise ValueError(f"Unknown function: {func_name}")
+    app_name, path = functions[func_name]
+    event = runner.build_event(func_name, size, overrides)
+
+    context = multiprocessing.get_context("spawn")
+    tasks, results, ready = context.Queue(), context.Queue(), context.Queue()
+    current = context.Array("q", [IDLE] * workers, lock=False)
+    pool = [context.Process(target=_worker, args=(func_name, path, event, tasks, results, ready, current, slot),
+                            daemon=True)
+            for slot in range(workers)]
+    for worker in pool:
+        worker.start()
+
+    try:
+        # wait until every worker has imported the handler so load starts warm
+        loaded = 0
+        while loaded < len(pool):
+            try:
+                pid, error = ready.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                for worker in pool:
+                    if not worker.is_alive():
+                        raise RuntimeError(f"Worker {worker.pid} exited with code {worker.exitcode} "
+                                           f"while loading {func_name}")
+                continue
+            if error:
+                raise RuntimeError(f"Worker {pid} failed to load {func_name}: {error}")
+            loaded += 1
+        # warmup requests have negative ids
+        warmups = {-1 - i: time.monotonic() for i in range(warmup * workers)}
+        for request_id, arrival in warmups.items():
+            tasks.put((request_id, arrival))
+        for _ in collect(results, pool, current, dict(warmups)):
+            pass
+
+        arrivals = arrival_times(process, rate, duration, on, off, seed)
+        latency, queueing, service, lag = Histogram(), Histogram(), Histogram(), Histogram()
+        statuses = {}
+        records = []
+
+        t0 = time.monotonic() + 0.1
+        outstanding = {}
+        for request_id, offset in enumerate(arrivals):
+            arrival = t0 + offset
+            delay = arrival - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            # how late the generator issued the request; large values mean the generator is saturated
+            lag.record((time.monotonic() - arrival) * 1e6)
+            outstanding[request_id] = arrival
+            tasks.put((request_id, arrival))
+
+        for result in collect(results, pool, current, outstanding):
+            latency.record((result["end"] - result["arrival"]) * 1e6)
+            queueing.record((result["start"] - result["arrival"]) * 1e6)
+            service.record((result["end"] - result["start"]) * 1e6)
+            statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+            records.append(result)
+    finally:
+        for _ in pool:
+            tasks.put(None)
+        for worker in pool:
+            worker.join(timeout=10)
+            if worker.is_alive():
+                worker.terminate()
+
+    elapsed = max((record["end"] for record in records), default=t0) - t0
+    summary = {
+        "app": app_name,
+        "function": func_name,
+        "size": size,
+        "event": runner.summarize_event(event),
+        "arrival": process,
+        "rate": rate,
+        "duration": duration,
+        "workers": workers,
+        "requests": len(arrivals),
+        "statuses": statuses,
+        "throughput": len(records) / elapsed if elapsed > 0 else None,
+        "latency": latency.summary(scale=1e6),
+        "queueing": queueing.summary(scale=1e6),
+        "service": service.summary(scale=1e6),
+        "dispatch_lag": lag.summary(scale=1e6),
+    }
+    if process == "bursty":
+        summary.update({"on": on, "off": off})
+
+    if output_path:
+        with open(output_path, "w") as f:
+            for record in sorted(records, key=lambda record: record["id"]):
+                record = dict(record, arrival=record["arrival"] - t0, start=record["start"] - t0, end=record["end"] - t0)
+                f.write(json.dumps(record) + "\n")
+    return summary
+
+
+def main(argv=None):
+    """Run an open-loop load test and print the summary as JSON."""
+    parser = argparse.ArgumentParser(description="Drive a BilliBench function with open-loop load.")
+    parser.add_argument("--function", required=True, help="function name, e.g. Func7_sample")
+    parser.add_argument("--size", default="small", help="payload size")
+    parser.add_argument("--rate", type=float, required=True, help="mean arrival rate in requests per second")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of arrivals to generate")
+    parser.add_argument("--workers", type=int, default=4, help="worker processes serving requests")
+    parser.add_argument("--arrival", choices=ARRIVALS, default="poisson", help="arrival process")
+    parser.add_argument("--on", type=float, default=1.0, help="bursty: length of an on period in seconds")
+    parser.add_argument("--off", type=float, default=1.0, help="bursty: length of an off period in seconds")
+    parser.add_argument("--seed", type=int, help="seed of the arrival process")
+    parser.add_argument("--set", action="append", default=[], metavar="FIELD=VALUE", help="extra event field")
+    parser.add_argument("--warmup", type=int, default=0, help="unmeasured invocations per worker before the run")
+    parser.add_argument("--output", help="write one JSON line per request")
+    parser.add_argument("--summary", help="write the summary to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    overrides = {}
+    for item in args.set:
+        field, _, value = item.partition("=")
+        try:
+            overrides[field] = json.loads(value)
+        except ValueError:
+            overrides[field] = value
+
+    summary = run(args.function, args.size, args.rate, args.duration, workers=args.workers, process=args.arrival,
+                  on=args.on, off=args.off, seed=args.seed, overrides=overrides, warmup=args.warmup,
+                  output_path=args.output)
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2)
+    else:
+        print(json.dumps(summary, indent=2))
+    return 0 if set(summary["statuses"]) <= {"ok"} else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Dataset manifests and local regeneration.
+
+Every generated dataset is described by <function>/manifest.json in the bucket. The manifest names
+the generator (the upload_dataset.py script and its generate function) and records, per size, the
+seed, the generator parameters and one entry per artifact with its key, byte size, sha256 and, for
+arrays, shape and dtype. Every size is generated with its own seed, derived from BENCH_SEED (default
+777) and the size name, so the sizes are independent draws rather than prefixes of one stream. The
+manifest records the derived seed next to the base seed, and regenerating a size with it reproduces
+the recorded objects byte for byte.
+
+Handlers fetch their generated inputs with get(). With BENCH_REGENERATE=1 the input is generated
+locally from the manifest instead of downloaded, and checked against the recorded sha256. The
+regenerated files stay where the generator writes them (the recorded path under BENCH_HOME) and are
+reused by later calls, in any process, while their checksum stamps match the manifest.
+"""
+
+import os
+import sys
+import json
+import shutil
+import hashlib
+import threading
+import importlib.util
+
+DEFAULT_SEED = 777
+MANIFEST_NAME = "manifest.json"
+
+_regenerate_lock = threading.Lock()
+
+
+def seed():
+    """Return the base seed of the dataset generators."""
+    return int(os.getenv("BENCH_SEED", DEFAULT_SEED))
+
+
+def size_seed(base, size):
+    """Return the seed of one size, derived from the base seed; it fits every 32-bit seeded generator."""
+    return int.from_bytes(hashlib.sha256(f"{base}:{size}".encode()).digest()[:4], "little")
+
+
+def regenerate_enabled():
+    """Return True when handlers regenerate their inputs locally with BENCH_REGENERATE=1."""
+    return os.getenv("BENCH_REGENERATE", "0") not in ("", "0")
+
+
+def manifest_key(func_name):
+    """Return the bucket key of a function's manifest."""
+    return f"{func_name}/{MANIFEST_NAME}"
+
+
+def sha256(path):
+    """Return the hex sha256 of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(8 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def describe(key, path, **info):
+    """Return the manifest entry of an artifact. .npy files get their shape and dtype from the header."""
+    entry = {"key": key, "path": _relative(path), "bytes": os.path.getsize(path), "sha256": sha256(path)}
+    if path.endswith(".npy"):
+        import numpy as np
+
+        array = np.load(path, mmap_mode="r", allow_pickle=False)
+        entry.update({"shape": list(array.shape), "dtype": array.dtype.str})
+    entry.update(info)
+    return entry
+
+
+def _relative(path):
+    """Return path relative to BENCH_HOME, so manifests are valid on every host."""
+    home = os.getenv("BENCH_HOME")
+    return os.path.relpath(os.path.abspath(path), home) if home else os.path.abspath(path)
+
+
+def _absolute(path):
+    return path if os.path.isabs(path) else os.path.join(os.getenv("BENCH_HOME", ""), path)
+
+
+def generator(generate):
+    """Return the manifest entry naming a generate function and the script that defines it."""
+    return {"script": _relative(sys.modules[generate.__module__].__file__), "function": generate.__name__}
+
+
+def load(bucket, func_name):
+    """Return a function's manifest from the bucket, or None if it has none."""
+    key = manifest_key(func_name)
+    if key not in bucket.list(key):
+        return None
+    return json.loads(bucket.get_bytes(key))
+
+
+def update(bucket, func_name, sizes, generate=None):
+    """Merge {size: entry} into a function's manifest, keeping the sizes that were not regenerated."""
+    manifest = load(bucket, func_name) or {"function": func_name, "sizes": {}}
+    if generate is not None:
+        manifest["generator"] = generator(generate)
+    manifest["sizes"].update(sizes)
+    bucket.put_bytes(manifest_key(func_name), json.dumps(manifest, indent=2, sort_keys=True))
+    return manifest
+
+
+def _load_generator(script):
+    path = _absolute(script)
+    spec = importlib.util.spec_from_file_location(f"billibench_generator_{abs(hash(path))}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _stamp(path):
+    return path + ".sha256"
+
+
+def stamp(path, checksum):
+    """Record the verified sha256 of a generated file next to it."""
+    with open(_stamp(path), "w") as f:
+        f.write(checksum + "\n")
+
+
+def _is_current(path, artifact):
+    """Return True when a regenerated file still matches its manifest entry."""
+    try:
+        if os.path.getsize(path) != artifact["bytes"]:
+            return False
+        with open(_stamp(path), "r") as f:
+            return f.read().strip() == artifact["sha256"]
+    except FileNotFoundError:
+        return False
+
+
+def regenerate(bucket, key):
+    """Generate the artifact at key locally from its manifest and return the path of the file."""
+    func_name = key.split("/")[0]
+    manifest = load(bucket, func_name)
+    if manifest is None or "generator" not in manifest:
+        raise FileNotFoundError(f"No manifest with a generator for {func_name}")
+    for size, entry in manifest["sizes"].items():
+        artifacts = {artifact["key"]: artifact for artifact in entry["artifacts"]}
+        if key in artifacts:
+            break
+    else:
+        raise KeyError(f"{key} is not in the manifest of {func_name}")
+
+    with _regenerate_lock:
+        paths = {artifact_key: _absolute(artifact["path"]) for artifact_key, artifact in artifacts.items()}
+        if not all(_is_current(paths[artifact_key], artifact) for artifact_key, artifact in artifacts.items()):
+            module = _load_generator(manifest["generator"]["script"])
+            print(f"Regenerating {func_name} {size} with seed {entry['seed']}")
+            generated = getattr(module, manifest["generator"]["function"])(size, entry["seed"])
+            paths.update((artifact[0], artifact[1]) for artifact in generated)
+            for artifact_key, artifact in artifacts.items():
+                checksum = sha256(paths[artifact_key])
+                if checksum != artifact["sha256"]:
+                    raise ValueError(f"Regenerated {artifact_key} does not match the manifest "
+                                     f"(sha256 {checksum}, expected {artifact['sha256']})")
+                stamp(paths[artifact_key], checksum)
+    return paths[key]
+
+
+def get(bucket, key, path, chunk_size=None):
+    """Fetch a generated input to a local file: download it, or regenerate it with BENCH_REGENERATE=1."""
+    if not regenerate_enabled():
+        bucket.get(key, path, chunk_size=chunk_size)
+        return
+    shutil.copyfile(regenerate(bucket, key), path)
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Memory-size sweep and right-sizing recommender.
+
+Every trial runs the handler in a fresh interpreter under a memory limit, enforced either with a
+cgroup v2 memory.max (page cache counts against the limit and swap is disabled, like a serverless
+instance) or, where cgroups cannot be delegated, with RLIMIT_AS (address space only, a much coarser
+bound). A first unlimited trial gives the baseline latency and peak memory. The sweep then starts
+from the smallest tier above the baseline peak and tightens the limit tier by tier until the
+function runs out of memory or misses its latency SLO, and recommends the smallest tier that met it.
+
+Per trial it records the latency, peak memory (cgroup memory.peak, or the child's max RSS), major
+page faults (the sign of page-cache thrashing before an OOM), OOM kills and the slowdown against the
+baseline:
+
+    python -m billibench.memsweep --functions Func14_knn,Func19_join --sizes large --slowdown 1.2
+    python -m billibench.memsweep --sizes small --tiers 128,256,512,1024 --slo 2.5 --method rlimit
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import resource
+import statistics
+
+from billibench import procs, runner
+
+MB = 1 << 20
+
+# Memory tiers in MB, as offered by common serverless platforms
+DEFAULT_TIERS = [128, 256, 512, 1024, 1536, 2048, 3008, 4096, 6144, 8192, 10240]
+
+METHODS = ["cgroup", "rlimit"]
+
+# Output of failed allocations; handlers catch MemoryError and print it, often with an empty message
+MEMORY_MARKERS = ("MemoryError", "Unable to allocate", "Cannot allocate memory", "std::bad_alloc")
+
+
+def cgroup_root():
+    """Return the cgroup v2 directory the sweep creates its cgroups in."""
+    root = os.getenv("BENCH_CGROUP_ROOT")
+    if root:
+        return root
+    with open("/proc/self/cgroup", "r") as f:
+        for line in f:
+            if line.startswith("0::"):
+                return os.path.join("/sys/fs/cgroup", line.strip()[3:].lstrip("/"))
+    return "/sys/fs/cgroup"
+
+
+def enable_memory_controller(root):
+    """Enable the memory controller for the children of a cgroup v2 directory."""
+    control = os.path.join(root, "cgroup.subtree_control")
+    if not os.path.exists(control):
+        raise OSError(f"{root} is not a cgroup v2 directory")
+    with open(control, "r") as f:
+        if "memory" in f.read().split():
+            return
+    try:
+        with open(control, "w") as f:
+            f.write("+memory")
+    except OSError as e:
+        # a cgroup with processes of its own cannot enable controllers for its children
+        raise OSError(f"cannot enable the memory controller in {control}: {e.strerror or e}; "
+                      "set BENCH_CGROUP_ROOT to a delegated cgroup without processes") from e
+
+
+class Cgroup:
+    """A child cgroup with a memory limit, removed again by close()."""
+
+    def __init__(self, limit=None, root=None):
+        root = root or cgroup_root()
+        enable_memory_controller(root)
+        self.path = os.path.join(root, f"billibench-{os.getpid()}-{time.monotonic_ns()}")
+        os.mkdir(self.path)
+        try:
+            if not os.path.exists(os.path.join(self.path, "memory.max")):
+                raise OSError(f"{self.path} is not a cgroup v2 directory with the memory controller")
+            self._write("memory.max", str(limit) if limit else "max")
+            if limit and os.path.exists(os.path.join(self.path, "memory.swap.max")):
+                self._write("memory.swap.max", "0")
+        except OSError:
+            self.close()
+            raise
+
+    def _write(self, name, value):
+        with open(os.path.join(self.path, name), "w") as f:
+            f.write(value)
+
+    def _read(self, name):
+        with open(os.path.join(self.path, name), "r") as f:
+            return f.read()
+
+    def enter(self):
+        """Move the calling process into the cgroup (run in the child before exec)."""
+        self._write("cgroup.procs", str(os.getpid()))
+
+    def stats(self):
+        """Return the peak memory, OOM kills and major faults of the cgroup."""
+        events = dict(line.split() for line in self._read("memory.events").splitlines())
+        stat = dict(line.split() for line in self._read("memory.stat").splitlines())
+        peak = int(self._read("memory.peak")) if os.path.exists(os.path.join(self.path, "memory.peak")) else None
+        return {"peak_memory": peak, "oom_kills": int(events.get("oom_kill", 0)),
+                "major_faults": int(stat.get("pgmajfault", 0))}
+
+    def close(self):
+        try:
+            os.rmdir(self.path)
+        except OSError:
+            pass
+
+
+def cgroup_unavailable(root=None):
+    """Return why memory-limited child cgroups cannot be created here, or None when they can."""
+    try:
+        cgroup = Cgroup(root=root)
+    except OSError as e:
+        return str(e)
+    cgroup.close()
+    return None
+
+
+def cgroup_available(root=None):
+    """Return True when memory-limited child cgroups can be created here."""
+    return cgroup_unavailable(root) is None
+
+
+def measure(func_name, size, limit=None, method="cgroup", repetitions=3, overrides=None, timeout=None,
+            watch=False):
+    """
+    Run one trial under a memory limit in bytes (None for unlimited) and return its record. A limited
+    trial that fails without a sign of running out of memory is run again with watch, once, to see
+    whether the handler caught a MemoryError.
+    """
+    command = runner.child_command(func_name, size, repetitions, overrides, watch)
+    record = {"function": func_name, "size": size, "method": method,
+              "limit_mb": limit / MB if limit else None, "repetitions": repetitions}
+
+    cgroup = Cgroup(limit) if method == "cgroup" else None
+    if cgroup:
+        preexec_fn = cgroup.enter
+    elif limit:
+        def preexec_fn():
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    else:
+        preexec_fn = None
+
+    try:
+        code, rusage, stdout, stderr, timed_out = procs.run_child(command, preexec_fn, timeout, cwd=runner.BENCH_ROOT)
+        stats = cgroup.stats() if cgroup else {"peak_memory": None, "oom_kills": 0, "major_faults": rusage.ru_majflt}
+    finally:
+        if cgroup:
+            cgroup.close()
+
+    record.update(stats)
+    record["max_rss"] = rusage.ru_maxrss * 1024
+    if record["peak_memory"] is None:
+        record["peak_memory"] = record["max_rss"]
+    result = runner.child_result(code, stdout)
+    record.update(result)
+
+    out_of_memory = (stats["oom_kills"] > 0 or code == -signal.SIGKILL and not timed_out
+                     or bool(result.get("memory_errors"))
+                     or any("MemoryError" in error_type for error_type in result.get("error_types", []))
+                     or any(marker in stderr or marker in stdout for marker in MEMORY_MARKERS))
+    if timed_out:
+        record["status"] = "timeout"
+    elif out_of_memory:
+        record["status"] = "oom"
+    elif not result or set(result["statuses"]) != {"ok"}:
+        if limit and result and result.get("memory_errors") is None:
+            watched = measure(func_name, size, limit, method, repetitions, overrides, timeout, watch=True)
+            if watched["status"] == "oom":
+                return watched
+        record["status"] = "failed"
+        record["stderr"] = stderr.strip().splitlines()[-3:]
+    else:
+        record["status"] = "ok"
+        record["median"] = statistics.median(result["wall_times"])
+    return record
+
+
+def sweep(func_name, size, tiers=DEFAULT_TIERS, method="cgroup", repetitions=3, slo=None, slowdown=1.2,
+          timeout=None, report=print):
+    """Sweep the memory tiers of one function and size. Returns (trials, recommendation)."""
+    baseline = measure(func_name, size, None, method, repetitions, timeout=timeout)
+    baseline["baseline"] = True
+    report(baseline)
+    trials = [baseline]
+    if baseline["status"] != "ok":
+        return trials, {"function": func_name, "size": size, "tier_mb": None,
+                        "reason": f"baseline {baseline['status']}"}
+
+    target = slo if slo is not None else baseline["median"] * slowdown
+    tiers = sorted(tiers)
+    start = next((i for i, tier in enumerate(tiers) if tier * MB >= baseline["peak_memory"]), len(tiers) - 1)
+
+    def trial(tier):
+        record = measure(func_name, size, tier * MB, method, repetitions, timeout=timeout)
+        if record["status"] == "ok":
+            record["slowdown"] = record["median"] / baseline["median"]
+            record["meets_slo"] = record["median"] <= target
+        report(record)
+        trials.append(record)
+        return record["status"] == "ok" and record["meets_slo"]
+
+    # tighten from the first tier above the baseline peak; if even that one fails, loosen instead
+    passing = None
+    for i in range(start, -1, -1):
+        if not trial(tiers[i]):
+            break
+        passing = tiers[i]
+    if passing is None:
+        for tier in tiers[start + 1:]:
+            if trial(tier):
+                passing = tier
+                break
+
+    recommendation = {"function": func_name, "size": size, "tier_mb": passing, "slo": target,
+                      "baseline_latency": baseline["median"], "baseline_peak_mb": baseline["peak_memory"] / MB}
+    if passing is None:
+        recommendation["reason"] = "no tier met the SLO"
+    return trials, recommendation
+
+
+def print_trial(record):
+    """Print one trial."""
+    limit = f"{record['limit_mb']:.0f} MB" if record["limit_mb"] else "unlimited"
+    latency = f"{record['median']:.3f}s" if record.get("median") is not None else "-"
+    peak = f"{record['peak_memory'] / MB:.0f} MB" if record.get("peak_memory") else "-"
+    print(f"{record['function']} {record['size']} {limit:>10}: {record['status']:<8} latency {latency:>9} "
+          f"peak {peak:>9} major faults {record.get('major_faults', 0)}")
+
+
+def main(argv=None):
+    """Sweep memory limits and recommend a memory tier per function and size."""
+    parser = argparse.ArgumentParser(description="Find the smallest memory tier that meets a latency SLO.")
+    parser.add_argument("--functions", help="comma separated function names (default: all)")
+    parser.add_argument("--sizes", default="small", help="comma separated sizes")
+    parser.add_argument("--tiers", help="comma separated memory tiers in MB (default: 128 MB to 10 GB)")
+    parser.add_argument("--method", choices=METHODS, help="how to limit memory (default: cgroup when available)")
+    parser.add_argument("--repetitions", type=int, default=3, help="invocations per trial")
+    parser.add_argument("--slo", type=float, help="latency SLO in seconds (median per trial)")
+    parser.add_argument("--slowdown", type=float, default=1.2,
+                        help="without --slo, allowed median slowdown against the unlimited baseline")
+    parser.add_argument("--timeout", type=float, help="seconds before a trial is killed")
+    parser.add_argument("--output", default="memsweep.jsonl", help="JSON lines file with every trial")
+    parser.add_argument("--allocation", help="write the recommended tiers as a billibench.billing allocation file")
+    args = parser.parse_args(argv)
+
+    method = args.method
+    if method is None:
+        reason = cgroup_unavailable()
+        method = "cgroup" if reason is None else "rlimit"
+        if reason:
+            print(f"Cgroup memory limits are not available: {reason}")
+    if method == "rlimit":
+        print("Limiting memory with RLIMIT_AS: the limit bounds address space, not resident memory")
+    tiers = [int(tier) for tier in args.tiers.split(",")] if args.tiers else DEFAULT_TIERS
+
+    functions = runner.discover()
+    func_names = args.functions.split(",") if args.functions else sorted(
+        functions, key=lambda name: int(name.split("_")[0][4:]))
+    recommendations = []
+    with open(os.path.abspath(args.output), "a") as out:
+        def report(record):
+            print_trial(record)
+            out.write(json.dumps(record, default=repr) + "\n")
+            out.flush()
+
+        for func_name in func_names:
+            for size in args.sizes.split(","):
+                _, recommendation = sweep(func_name, size, tiers, method, args.repetitions, args.slo,
+                                          args.slowdown, args.timeout, report)
+                recommendations.append(recommendation)
+
+    print()
+    for entry in recommendations:
+        tier = f"{entry['tier_mb']} MB" if entry["tier_mb"] else entry["reason"]
+        print(f"{entry['function']:<22} {entry['size']:<8} {tier}")
+    if args.allocation:
+        allocation = {}
+        for entry in recommendations:
+            if entry["tier_mb"]:
+                allocation.setdefault(entry["function"], {})[entry["size"]] = {"memory_mb": entry["tier_mb"]}
+        with open(args.allocation, "w") as f:
+            json.dump(allocation, f, indent=2)
+    return 0 if all(entry["tier_mb"] for entry in recommendations) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""
+Child processes of handlers.
+
+Handlers run their tools with run() instead of os.system(): the command is executed without a
+shell, a non-zero exit status raises subprocess.CalledProcessError, and a timeout (the timeout
+argument, or BENCH_PROCESS_TIMEOUT seconds) kills the child's whole process group and raises
+subprocess.TimeoutExpired. The child is reaped with wait4(), which returns the resource usage of the
+child and of every descendant it waited for: user and system CPU, max RSS, page faults, block I/O
+and context switches.
+
+The children run since the last reset_stats() are reported by stats(), one entry per child plus the
+totals, and the runner stores them in the "processes" field of every invocation.
+
+The sweeps start their trial interpreters with run_child(), which reaps the child the same way and
+returns its rusage, and measure the CPU time of an interpreter and its children with cpu_time().
+"""
+
+import os
+import time
+import signal
+import resource
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+
+# Result field -> struct rusage field
+USAGE_FIELDS = {
+    "user_time": "ru_utime",
+    "sys_time": "ru_stime",
+    "max_rss": "ru_maxrss",
+    "minor_faults": "ru_minflt",
+    "major_faults": "ru_majflt",
+    "block_reads": "ru_inblock",
+    "block_writes": "ru_oublock",
+    "voluntary_switches": "ru_nvcsw",
+    "involuntary_switches": "ru_nivcsw",
+}
+
+# Children run since the last reset_stats()
+_children = []
+_lock = threading.Lock()
+
+
+def default_timeout():
+    """Return the timeout in seconds of handler children, or None."""
+    timeout = os.getenv("BENCH_PROCESS_TIMEOUT")
+    return float(timeout) if timeout else None
+
+
+def usage(rusage):
+    """Convert a struct rusage to a dict, with max_rss in bytes."""
+    entry = {name: getattr(rusage, field) for name, field in USAGE_FIELDS.items()}
+    entry["max_rss"] *= 1024
+    return entry
+
+
+def make_executable(path):
+    """Add the execute bits to a file, like chmod +x."""
+    os.chmod(path, os.stat(path).st_mode | 0o111)
+
+
+@contextmanager
+def _output(target):
+    """Open a path for writing, or pass a file object, DEVNULL or None through."""
+    if isinstance(target, (str, os.PathLike)):
+        with open(target, "wb") as f:
+            yield f
+    else:
+        yield target
+
+
+def _wait(pid, timeout, kill):
+    """
+    Reap a child with wait4 and return (status, rusage, timed_out). After timeout seconds kill() is
+    called unless the child has exited by then. The exit is seen with waitid(WNOWAIT) before the
+    child is reaped, so kill() never signals a pid or process group that was already reused, and a
+    child that finished in time is never reported as timed out.
+    """
+    lock = threading.Lock()
+    state = {"exited": False, "timed_out": False}
+
+    def expire():
+        with lock:
+            if state["exited"] or os.waitid(os.P_PID, pid, os.WEXITED | os.WNOHANG | os.WNOWAIT) is not None:
+                return
+            state["timed_out"] = True
+            kill()
+
+    timer = threading.Timer(timeout, expire) if timeout else None
+    if timer:
+        timer.start()
+    try:
+        os.waitid(os.P_PID, pid, os.WEXITED | os.WNOWAIT)
+        with lock:
+            state["exited"] = True
+    finally:
+        if timer:
+            timer.cancel()
+    _, status, rusage = os.wait4(pid, 0)
+    return status, rusage, state["timed_out"]
+
+
+def run(args, cwd=None, stdout=None, stderr=None, timeout=None, check=True, env=None):
+    """
+    Run a command without a shell and return its record. stdout and stderr may be a path, a file
+    object, subprocess.DEVNULL or None to inherit the handler's.
+    """
+    args = [str(arg) for arg in args]
+    timeout = default_timeout() if timeout is None else timeout
+    with _output(stdout) as out, _output(stderr) as err:
+        start = time.perf_counter()
+        # a new session, so a timeout can kill the whole process group
+        proc = subprocess.Popen(args, cwd=cwd, stdout=out, stderr=err, env=env, start_new_session=True)
+
+        def kill():
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+        status, rusage, timed_out = _wait(proc.pid, timeout, kill)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+
+    record = {"command": os.path.basename(args[0]), "returncode": proc.returncode,
+              "wall_time": time.perf_counter() - start, "timed_out": timed_out}
+    record.update(usage(rusage))
+    with _lock:
+        _children.append(record)
+
+    if timed_out:
+        raise subprocess.TimeoutExpired(args, timeout)
+    if check and proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, args)
+    return record
+
+
+def run_child(command, preexec_fn=None, timeout=None, cwd=None, env=None):
+    """Run a command, wait for it with wait4 and return (exit code, rusage, stdout, stderr, timed_out)."""
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(command, stdout=out, stderr=err, cwd=cwd, env=env, preexec_fn=preexec_fn)
+        status, rusage, timed_out = _wait(proc.pid, timeout, lambda: os.kill(proc.pid, signal.SIGKILL))
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        out.seek(0)
+        err.seek(0)
+        return (proc.returncode, rusage, out.read().decode(errors="replace"),
+                err.read().decode(errors="replace"), timed_out)
+
+
+def cpu_time():
+    """Return the CPU seconds used so far by this process and its waited-for children."""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def reset_stats():
+    """Forget the recorded children."""
+    with _lock:
+        del _children[:]
+
+
+def stats():
+    """Return the children run since the last reset_stats() and their totals."""
+    with _lock:
+        children = list(_children)
+    total = {name: sum(child[name] for child in children) for name in USAGE_FIELDS}
+    total["max_rss"] = max((child["max_rss"] for child in children), default=0)
+    total["cpu_time"] = total["user_time"] + total["sys_time"]
+    total["processes"] = len(children)
+    return {"children": children, "total": total}
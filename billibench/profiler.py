@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Sampling profiler for handler invocations.
+
+A background thread takes the Python stack of every thread (sys._current_frames()) at a fixed
+interval, so thread pools such as the one in Func6 and dask's worker threads are covered without
+changing the handlers. Stacks start with the thread name, with pool thread numbers removed so the
+threads of one pool add up. Two modes:
+    wall  every thread's stack counts once per sample, waiting threads included
+    cpu   every stack is weighted by the microseconds of CPU its thread used since the last sample,
+          so idle threads drop out
+
+Profiles are written in the collapsed-stack format of flamegraph.pl and speedscope
+("frame;frame;frame count"). The runner profiles every invocation with --profile DIR. The command
+line prints the hottest functions of a set of profiles and diffs the profiles of one function and
+size between two runs (written as "stack before after" for flamegraph.pl's differential graphs):
+
+    python -m billibench.runner --functions Func6_partition --sizes medium --profile profiles/ --profile-mode cpu
+    python -m billibench.profiler top profiles/ --function Func6_partition --size medium
+    python -m billibench.profiler diff before/ after/ --function Func6_partition --size medium --output diff.folded
+"""
+
+import os
+import re
+import sys
+import glob
+import time
+import argparse
+import threading
+from collections import Counter
+
+MODES = ["wall", "cpu"]
+
+# Threads of the harness that are never profiled
+IGNORED_THREADS = ("billibench-profiler", "billibench-sampler")
+
+
+def thread_label(name):
+    """Return the stack root of a thread: its name without the pool thread number."""
+    return "thread:" + re.sub(r"[_-]\d+$", "", name)
+
+
+def frame_label(code):
+    """
+    Return the label of a frame. Line numbers are left out so profiles of different revisions can
+    be diffed; collapsed stacks must not contain ';'.
+    """
+    return f"{code.co_name} ({os.path.basename(code.co_filename)})".replace(";", ":")
+
+
+def stack_of(frame, roots=()):
+    """Return the frames of a stack as labels, outermost first, cut below any frame running a code in roots."""
+    labels = []
+    while frame is not None and frame.f_code not in roots:
+        labels.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+class Profiler:
+    """Sample the Python stacks of all threads from a background thread."""
+
+    def __init__(self, interval=0.005, mode="wall", roots=()):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.interval = interval
+        self.mode = mode
+        # code objects of the harness frames that call the handler; stacks start below them
+        self.roots = set(roots)
+        self.stacks = Counter()
+        self.samples = 0
+        self._cpu = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="billibench-profiler", daemon=True)
+        self._overhead = 0.0
+
+    def _cpu_time(self, ident):
+        try:
+            return time.clock_gettime(time.pthread_getcpuclockid(ident))
+        except (OSError, OverflowError):
+            # the thread has exited
+            return None
+
+    def sample(self):
+        """Record the stacks of all threads once."""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            name = names.get(ident, f"thread-{ident}")
+            if name in IGNORED_THREADS:
+                continue
+            weight = 1
+            if self.mode == "cpu":
+                now = self._cpu_time(ident)
+                if now is None:
+                    continue
+                previous = self._cpu.get(ident)
+                self._cpu[ident] = now
+                weight = int(round((now - previous) * 1e6)) if previous is not None else 0
+                if weight <= 0:
+                    continue
+            self.stacks[";".join([thread_label(name)] + stack_of(frame, self.roots))] += weight
+        self.samples += 1
+
+    def _run(self):
+        deadline = time.perf_counter()
+        while not self._stop.is_set():
+            self.sample()
+            deadline += self.interval
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                deadline = time.perf_counter()
+        self.sample()
+        self._overhead = time.thread_time()
+
+    def start(self):
+        """Start sampling."""
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop sampling and return the collapsed stacks and the profiler's own CPU time."""
+        self._stop.set()
+        self._thread.join()
+        return {"mode": self.mode, "interval": self.interval, "samples": self.samples,
+                "stacks": dict(self.stacks), "overhead": self._overhead}
+
+
+def write_collapsed(stacks, path):
+    """Write {stack: count} in the collapsed-stack format."""
+    with open(path, "w") as f:
+        for stack, count in sorted(stacks.items()):
+            f.write(f"{stack} {count}\n")
+
+
+def read_collapsed(path):
+    """Read a collapsed-stack file into a Counter."""
+    stacks = Counter()
+    with open(path, "r") as f:
+        for line in f:
+            stack, _, count = line.rstrip("\n").rpartition(" ")
+            if stack:
+                stacks[stack] += int(count)
+    return stacks
+
+
+def profile_name(func_name, size, index):
+    """Return the file name of the profile of one invocation."""
+    return f"{func_name}_{size}_{index:05d}.collapsed"
+
+
+def load(path, func_name=None, size=None):
+    """Merge a collapsed file, or the profiles of a function and size in a directory."""
+    if not os.path.isdir(path):
+        return read_collapsed(path)
+    pattern = f"{func_name or '*'}_{size or '*'}_*.collapsed"
+    stacks = Counter()
+    for profile in sorted(glob.glob(os.path.join(path, pattern))):
+        stacks.update(read_collapsed(profile))
+    return stacks
+
+
+def frame_totals(stacks):
+    """Return (self, total) counts per frame label."""
+    self_counts, total_counts = Counter(), Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        self_counts[frames[-1]] += count
+        for frame in set(frames):
+            total_counts[frame] += count
+    return self_counts, total_counts
+
+
+def diff(before, after):
+    """Return {stack: (before, after)} with both profiles scaled to the total of after."""
+    scale = sum(after.values()) / sum(before.values()) if before and sum(before.values()) else 1.0
+    return {stack: (int(round(before.get(stack, 0) * scale)), after.get(stack, 0))
+            for stack in set(before) | set(after)}
+
+
+def print_top(stacks, top=20):
+    """Print the frames with the most self and total samples."""
+    total = sum(stacks.values()) or 1
+    self_counts, total_counts = frame_totals(stacks)
+    print(f"{'self':>7} {'total':>7}  frame")
+    for frame, count in self_counts.most_common(top):
+        print(f"{count / total:7.1%} {total_counts[frame] / total:7.1%}  {frame}")
+
+
+def print_diff(before, after, top=20):
+    """Print the frames whose share of self samples changed most."""
+    before_self, _ = frame_totals(before)
+    after_self, _ = frame_totals(after)
+    before_total, after_total = sum(before.values()) or 1, sum(after.values()) or 1
+    changes = {frame: after_self.get(frame, 0) / after_total - before_self.get(frame, 0) / before_total
+               for frame in set(before_self) | set(after_self)}
+    print(f"{'before':>7} {'after':>7} {'change':>7}  frame")
+    for frame, change in sorted(changes.items(), key=lambda item: -abs(item[1]))[:top]:
+        print(f"{before_self.get(frame, 0) / before_total:7.1%} {after_self.get(frame, 0) / after_total:7.1%} "
+              f"{change:+7.1%}  {frame}")
+
+
+def main(argv=None):
+    """Summarize or diff collapsed-stack profiles."""
+    parser = argparse.ArgumentParser(description="Summarize and diff handler profiles.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    top_parser = subparsers.add_parser("top", help="print the hottest frames of one or more profiles")
+    top_parser.add_argument("path", help="collapsed file or profile directory")
+
+    diff_parser = subparsers.add_parser("diff", help="compare the profiles of two runs")
+    diff_parser.add_argument("before", help="collapsed file or profile directory of the baseline")
+    diff_parser.add_argument("after", help="collapsed file or profile directory to compare")
+    diff_parser.add_argument("--output", help="write 'stack before after' lines for flamegraph.pl")
+
+    for subparser in (top_parser, diff_parser):
+        subparser.add_argument("--function", help="profile directories: only this function")
+        subparser.add_argument("--size", help="profile directories: only this size")
+        subparser.add_argument("--top", type=int, default=20, help="frames to print")
+    args = parser.parse_args(argv)
+
+    if args.command == "top":
+        stacks = load(args.path, args.function, args.size)
+        if not stacks:
+            print("No samples")
+            return 1
+        print_top(stacks, args.top)
+        return 0
+
+    before = load(args.before, args.function, args.size)
+    after = load(args.after, args.function, args.size)
+    if not before or not after:
+        print("No samples")
+        return 1
+    print_diff(before, after, args.top)
+    if args.output:
+        with open(args.output, "w") as f:
+            for stack, (count_before, count_after) in sorted(diff(before, after).items()):
+                f.write(f"{stack} {count_before} {count_after}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Workload trace replay with keep-alive and instance-pool simulation.
+
+Replays the invocation counts of a trace in the Azure Functions public dataset format
+(invocations_per_function_md.anon.dNN.csv: HashOwner, HashApp, HashFunction, Trigger and one column
+of invocation counts per minute 1..1440) against BilliBench functions. Every trace function is
+mapped to a BilliBench function and size, either explicitly with --mapping or, given the trace's
+duration percentiles (function_durations_percentiles.anon.dNN.csv) and a runner results file, to
+the function and size whose median latency is closest to the trace function's median duration.
+Arrivals are spread uniformly at random within each minute and replayed --speedup times faster
+than real time.
+
+Each trace function has its own pool of instances. An instance is a worker process that imports the
+handler when it starts (the cold start) and then serves one invocation at a time. An invocation goes
+to the most recently used idle instance of its function (warm) or starts a new one (cold); an
+instance idle for longer than the keep-alive window is shut down. With --max-instances the least
+recently used idle instance of any function is evicted to make room, and invocations wait when every
+instance is busy.
+
+The summary reports the cold-start rate, latency, service time and cold-start histograms, the
+instance-seconds kept alive, and the billed time and cost of every allocation-based scheme of
+billibench.billing. Keep-alive is given in trace seconds; handler durations are real:
+
+    python -m billibench.replay invocations_per_function_md.anon.d01.csv --durations function_durations_percentiles.anon.d01.csv --results results.jsonl --top 10 --minutes 60 --speedup 60
+    python -m billibench.replay trace.csv --mapping mapping.json --keep-alive 600 --max-instances 8 --output replay.jsonl
+"""
+
+import os
+import csv
+import sys
+import json
+import math
+import time
+import queue
+import random
+import argparse
+import statistics
+import multiprocessing
+from collections import deque
+
+import numpy as np
+
+from billibench import billing, procs, runner
+from billibench.histogram import Histogram
+
+MINUTES = 1440
+
+
+def load_invocations(path):
+    """Return {HashFunction: {"app", "trigger", "counts"}} from an invocations-per-minute CSV."""
+    functions = {}
+    with open(path, "r", newline="") as f:
+        for row in csv.DictReader(f):
+            counts = [int(row.get(str(minute)) or 0) for minute in range(1, MINUTES + 1)]
+            functions[row["HashFunction"]] = {"app": row.get("HashApp"), "trigger": row.get("Trigger"),
+                                              "counts": counts}
+    return functions
+
+
+def load_durations(path):
+    """Return {HashFunction: median duration in seconds} from a duration-percentiles CSV."""
+    with open(path, "r", newline="") as f:
+        return {row["HashFunction"]: float(row["percentile_Average_50"]) / 1000 for row in csv.DictReader(f)}
+
+
+def measured_latencies(path):
+    """Return {(function, size): median wall time} of the successful invocations in a results file."""
+    samples = {}
+    for record in billing.load_records(path):
+        if record.get("status") == "ok":
+            samples.setdefault((record["function"], record["size"]), []).append(record["wall_time"])
+    return {key: statistics.median(values) for key, values in samples.items()}
+
+
+def select(functions, start=0, minutes=MINUTES, top=None):
+    """Return the trace functions with invocations in the window, busiest first, at most top of them."""
+    totals = {name: sum(entry["counts"][start:start + minutes]) for name, entry in functions.items()}
+    names = sorted((name for name, total in totals.items() if total), key=lambda name: -totals[name])
+    return names[:top] if top else names
+
+
+def map_functions(names, durations, latencies):
+    """Map every trace function to the (function, size) with the closest median latency."""
+    if not latencies:
+        raise ValueError("No successful invocations to map the trace functions onto")
+    mapping = {}
+    for name in names:
+        if name not in durations:
+            raise KeyError(f"No duration for trace function {name}")
+        target = max(durations[name], 1e-6)
+        mapping[name] = min(latencies, key=lambda key: abs(math.log(max(latencies[key], 1e-6) / target)))
+    return mapping
+
+
+def load_mapping(path):
+    """Read {HashFunction: "FuncN_name:size"} from a JSON file."""
+    with open(path, "r") as f:
+        return {name: tuple(target.split(":", 1)) for name, target in json.load(f).items()}
+
+
+def arrival_times(functions, names, start=0, minutes=MINUTES, sample=1.0, seed=None):
+    """Return sorted (trace seconds, trace function) arrivals, spread uniformly within every minute."""
+    rng = random.Random(seed)
+    arrivals = []
+    for name in names:
+        for minute, count in enumerate(functions[name]["counts"][start:start + minutes]):
+            for _ in range(count):
+                if sample < 1 and rng.random() >= sample:
+                    continue
+                arrivals.append(((minute + rng.random()) * 60, name))
+    return sorted(arrivals)
+
+
+def _instance(instance_id, func_name, path, tasks, results):
+    """Import the handler, then serve invocations from tasks until a None sentinel arrives."""
+    started = time.monotonic()
+    try:
+        module = runner.load_function(func_name, path)
+        error = None
+    except Exception as e:
+        module = None
+        error = f"{type(e).__name__}: {e}"
+    load_time = time.monotonic() - started
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        request_id, event = task
+        start = time.monotonic()
+        if module is None:
+            results.put({"id": request_id, "instance": instance_id, "start": start, "end": start,
+                         "status": "error", "error": error, "load_time": load_time, "cpu_time": 0.0})
+            continue
+        cpu_start = procs.cpu_time()
+        record = runner.invoke(module, event)
+        results.put({"id": request_id, "instance": instance_id, "start": start, "end": time.monotonic(),
+                     "status": record["status"], "error": record.get("error"), "load_time": load_time,
+                     "cpu_time": procs.cpu_time() - cpu_start})
+        load_time = 0.0
+
+
+class Instance:
+    """A simulated function instance backed by a worker process that keeps the handler loaded."""
+
+    def __init__(self, context, instance_id, trace_function, func_name, path, results):
+        self.id = instance_id
+        self.trace_function = trace_function
+        self.tasks = context.Queue()
+        self.process = context.Process(target=_instance, args=(instance_id, func_name, path, self.tasks, results),
+                                       daemon=True)
+        self.started = time.monotonic()
+        self.process.start()
+        self.busy = False
+        # (request id, time sent) of the invocation the instance is serving
+        self.request = None
+        self.last_used = self.started
+        self.invocations = 0
+        self.stopped = None
+
+    def stop(self, now):
+        self.tasks.put(None)
+        self.stopped = now
+
+
+def run(arrivals, mapping, keep_alive=600, speedup=1.0, max_instances=None, root=runner.BENCH_ROOT,
+        output_path=None):
+    """Replay the arrivals against the mapped functions and return (records, instances)."""
+    functions = runner.discover(root)
+    events = {}
+    for name, (func_name, size) in mapping.items():
+        if func_name not in functions:
+            raise ValueError(f"Unknown function: {func_name}")
+        events[name] = runner.build_event(func_name, size)
+    keep_alive_real = keep_alive / speedup
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    instances = {}
+    retired = []
+    pools = {name: [] for name in mapping}
+    backlog = {name: deque() for name in mapping}
+    pending = {}
+    records = []
+
+    def retire(instance, now):
+        instance.stop(now)
+        pools[instance.trace_function].remove(instance)
+        del instances[instance.id]
+        retired.append(instance)
+
+    def place(request_id, name, arrival):
+        """Send a request to an idle instance or a new one; return False if it has to wait."""
+        now = time.monotonic()
+        idle = [instance for instance in pools[name] if not instance.busy]
+        cold = not idle
+        if idle:
+            instance = max(idle, key=lambda instance: instance.last_used)
+        else:
+            if max_instances and len(instances) >= max_instances:
+                victims = [instance for instance in instances.values() if not instance.busy]
+                if not victims:
+                    return False
+                retire(min(victims, key=lambda instance: instance.last_used), now)
+            func_name, path = mapping[name][0], functions[mapping[name][0]][1]
+            instance = Instance(context, len(instances) + len(retired), name, func_name, path, results)
+            instances[instance.id] = instance
+            pools[name].append(instance)
+        instance.busy = True
+        instance.request = (request_id, now)
+        instance.invocations += 1
+        pending[request_id] = {"id": request_id, "trace_function": name, "function": mapping[name][0],
+                               "size": mapping[name][1], "arrival": arrival, "cold": cold, "instance": instance.id}
+        instance.tasks.put((request_id, events[name]))
+        return True
+
+    def drain():
+        for name, waiting in backlog.items():
+            while waiting and place(*waiting[0]):
+                waiting.popleft()
+
+    def expire(now):
+        for instance in list(instances.values()):
+            if not instance.busy and now - instance.last_used > keep_alive_real:
+                retire(instance, instance.last_used + keep_alive_real)
+
+    def reap(now):
+        """Fail the invocations of instances whose process died (crash, OOM kill) and retire them."""
+        for instance in list(instances.values()):
+            if instance.busy and not instance.process.is_alive():
+                request_id, sent = instance.request
+                record = pending.pop(request_id)
+                record.update({"start": sent, "end": now, "status": "error",
+                               "error": f"instance exited with code {instance.process.exitcode}",
+                               "load_time": 0.0, "cpu_time": 0.0})
+                records.append(record)
+                instance.busy = False
+                instance.request = None
+                retire(instance, now)
+
+    def collect(timeout):
+        try:
+            result = results.get(timeout=max(timeout, 0.001))
+        except queue.Empty:
+            reap(time.monotonic())
+            drain()
+            return
+        # an instance may deliver its result and then die before it is read; reap() has then already
+        # failed the request and retired the instance, so count the request once
+        instance = instances.get(result["instance"])
+        record = pending.pop(result["id"], None)
+        if instance is None or record is None:
+            drain()
+            return
+        instance.busy = False
+        instance.request = None
+        instance.last_used = result["end"]
+        record.update(result)
+        records.append(record)
+        drain()
+
+    t0 = time.monotonic() + 0.1
+    try:
+        for request_id, (offset, name) in enumerate(arrivals):
+            arrival = t0 + offset / speedup
+            while time.monotonic() < arrival:
+                collect(arrival - time.monotonic())
+                expire(time.monotonic())
+            expire(time.monotonic())
+            drain()
+            if backlog[name] or not place(request_id, name, arrival):
+                backlog[name].append((request_id, name, arrival))
+
+        while pending or any(backlog.values()):
+            collect(1.0)
+            expire(time.monotonic())
+            drain()
+    finally:
+        now = time.monotonic()
+        for instance in list(instances.values()):
+            # an idle instance is kept for the keep-alive window after its last invocation
+            retire(instance, instance.last_used + keep_alive_real if not instance.busy else now)
+        for instance in retired:
+            instance.process.join(timeout=10)
+            if instance.process.is_alive():
+                instance.process.terminate()
+
+    for record in records:
+        record["latency"] = record["end"] - record["arrival"]
+        record["service"] = record["end"] - record["start"]
+        record["wait"] = record["start"] - record["arrival"]
+        for field in ("arrival", "start", "end"):
+            record[field] -= t0
+    records.sort(key=lambda record: record["id"])
+
+    if output_path:
+        with open(output_path, "w") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+    return records, retired
+
+
+def bill(records, allocation=None, memory_mb=billing.DEFAULT_MEMORY_MB, vcpus=billing.DEFAULT_VCPUS,
+         bill_init=False, schemes=billing.SCHEMES):
+    """Return the billed seconds and cost of the replay under every allocation-based scheme."""
+    memory_gb, cpus = billing.allocations(records, allocation, memory_mb, vcpus)
+    service = np.array([record["service"] for record in records])
+    if bill_init:
+        service = service + np.array([record["wait"] if record["cold"] else 0.0 for record in records])
+    bills = {}
+    for name, scheme in schemes.items():
+        if scheme["usage"]:
+            # needs the sampled CPU and memory usage of every invocation
+            continue
+        billed = billing.billed_duration(service, scheme["granularity"])
+        cost = billed * (memory_gb * scheme["memory_price"] + cpus * scheme["cpu_price"])
+        bills[name] = {"billed_seconds": float(billed.sum()), "cost": float(cost.sum())}
+    return bills
+
+
+def summarize(records, instances, keep_alive, speedup):
+    """Return the cold-start rate, latency histograms and instance usage of a replay."""
+    latency, service, cold_start, wait = Histogram(), Histogram(), Histogram(), Histogram()
+    statuses = {}
+    per_function = {}
+    for record in records:
+        latency.record(record["latency"] * 1e6)
+        service.record(record["service"] * 1e6)
+        (cold_start if record["cold"] else wait).record(record["wait"] * 1e6)
+        statuses[record["status"]] = statuses.get(record["status"], 0) + 1
+        entry = per_function.setdefault(record["trace_function"], {
+            "function": record["function"], "size": record["size"], "invocations": 0, "cold": 0})
+        entry["invocations"] += 1
+        entry["cold"] += record["cold"]
+    for entry in per_function.values():
+        entry["cold_rate"] = entry["cold"] / entry["invocations"]
+
+    lifetimes = [instance.stopped - instance.started for instance in instances]
+    busy = sum(record["service"] for record in records)
+    cold = sum(record["cold"] for record in records)
+    return {
+        "invocations": len(records),
+        "statuses": statuses,
+        "keep_alive": keep_alive,
+        "speedup": speedup,
+        "cold_starts": cold,
+        "cold_rate": cold / len(records) if records else None,
+        "instances": len(instances),
+        "instance_seconds": sum(lifetimes),
+        "busy_seconds": busy,
+        "idle_fraction": 1 - busy / sum(lifetimes) if sum(lifetimes) else None,
+        "cpu_seconds": sum(record["cpu_time"] for record in records),
+        "latency": latency.summary(scale=1e6),
+        "service": service.summary(scale=1e6),
+        "cold_start": cold_start.summary(scale=1e6),
+        "warm_wait": wait.summary(scale=1e6),
+        "functions": per_function,
+    }
+
+
+def main(argv=None):
+    """Replay a workload trace against BilliBench functions and print the summary as JSON."""
+    parser = argparse.ArgumentParser(description="Replay an invocation trace with a simulated instance pool.")
+    parser.add_argument("trace", help="invocations-per-minute CSV in the Azure Functions trace format")
+    parser.add_argument("--durations", help="duration-percentiles CSV of the same trace, for automatic mapping")
+    parser.add_argument("--results", help="runner results file with the latencies to map the durations onto")
+    parser.add_argument("--mapping", help='JSON file {"HashFunction": "FuncN_name:size"}')
+    parser.add_argument("--top", type=int, default=10, help="replay the busiest N trace functions (0: all)")
+    parser.add_argument("--start", type=int, default=0, help="first minute of the trace to replay")
+    parser.add_argument("--minutes", type=int, default=60, help="minutes of the trace to replay")
+    parser.add_argument("--sample", type=float, default=1.0, help="fraction of the invocations to replay")
+    parser.add_argument("--seed", type=int, help="seed of the arrival times and sampling")
+    parser.add_argument("--speedup", type=float, default=1.0, help="replay this many times faster than the trace")
+    parser.add_argument("--keep-alive", type=float, default=600, help="idle seconds (trace time) before an instance stops")
+    parser.add_argument("--max-instances", type=int, help="most instances alive at once")
+    parser.add_argument("--allocation", help="JSON file with per-function (and per-size) memory_mb and vcpus")
+    parser.add_argument("--memory-mb", type=float, default=billing.DEFAULT_MEMORY_MB, help="default memory allocation")
+    parser.add_argument("--vcpus", type=float, default=billing.DEFAULT_VCPUS, help="default vCPU allocation")
+    parser.add_argument("--bill-init", action="store_true", help="also bill the cold-start time of cold invocations")
+    parser.add_argument("--output", help="write one JSON line per invocation")
+    parser.add_argument("--summary", help="write the summary to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    functions = load_invocations(args.trace)
+    if args.mapping:
+        mapping = load_mapping(args.mapping)
+        names = [name for name in select(functions, args.start, args.minutes) if name in mapping][:args.top or None]
+    elif args.durations and args.results:
+        names = select(functions, args.start, args.minutes, args.top)
+        mapping = map_functions(names, load_durations(args.durations), measured_latencies(args.results))
+    else:
+        parser.error("pass --mapping, or --durations and --results")
+    mapping = {name: mapping[name] for name in names}
+
+    arrivals = arrival_times(functions, names, args.start, args.minutes, args.sample, args.seed)
+    records, instances = run(arrivals, mapping, args.keep_alive, args.speedup, args.max_instances,
+                             output_path=args.output)
+    allocation = None
+    if args.allocation:
+        with open(args.allocation, "r") as f:
+            allocation = json.load(f)
+
+    summary = summarize(records, instances, args.keep_alive, args.speedup)
+    summary["billing"] = bill(records, allocation, args.memory_mb, args.vcpus, args.bill_init)
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2)
+    else:
+        print(json.dumps(summary, indent=2))
+    return 0 if set(summary["statuses"]) <= {"ok"} else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+Local results database and run-to-run regression detection.
+
+Runner invocations are stored in a SQLite file (--db on the runner, or import an existing results
+file). Every run records the git revision of the tree and a host fingerprint: CPU model, cores,
+memory, Python and library versions, and the BLAS/OpenMP/torch thread settings. Per invocation the
+status, wall time, resource summary and phase durations are kept; the raw resource samples are not.
+
+The runner also stamps every record with the revision and host fingerprint it was measured at, and
+an imported results file keeps them, so files measured on other hosts compare correctly.
+
+compare tests every function, size and event configuration of two runs (run ids, labels, or git
+revisions, branches and tags matching one or more runs) with a two-sided Mann-Whitney U test and
+flags significant changes larger than a threshold. Sweep points with different event overrides are
+compared separately, and a configuration measured in only one of the runs is reported as unmatched:
+
+    python -m billibench.resultsdb import results.jsonl --label baseline
+    python -m billibench.resultsdb runs
+    python -m billibench.resultsdb compare 3 4 --metric wall_time
+    python -m billibench.resultsdb compare 1a2b3c HEAD --metric phase:sort
+    python -m billibench.resultsdb compare main~3 my-branch
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import sqlite3
+import hashlib
+import argparse
+import platform
+import statistics
+import subprocess
+
+DEFAULT_DB = "results.db"
+
+# Libraries whose versions are part of the host fingerprint
+LIBRARIES = ["numpy", "scipy", "pandas", "dask", "numexpr", "scikit-learn", "torch", "torchvision",
+             "transformers", "google-cloud-storage"]
+
+# Environment variables that set the thread pools of the numerical libraries
+THREAD_VARIABLES = ["OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "BLIS_NUM_THREADS",
+                    "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS", "NUMEXPR_MAX_THREADS"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started REAL,
+    label TEXT,
+    revision TEXT,
+    dirty INTEGER,
+    fingerprint TEXT,
+    host TEXT
+);
+CREATE TABLE IF NOT EXISTS invocations (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER REFERENCES runs(id),
+    function TEXT,
+    size TEXT,
+    event TEXT,
+    repetition INTEGER,
+    status TEXT,
+    wall_time REAL,
+    cpu_time REAL,
+    max_rss REAL,
+    record TEXT
+);
+CREATE TABLE IF NOT EXISTS phases (
+    invocation_id INTEGER REFERENCES invocations(id),
+    name TEXT,
+    start REAL,
+    duration REAL,
+    bytes INTEGER
+);
+CREATE INDEX IF NOT EXISTS invocations_run ON invocations(run_id, function, size);
+CREATE INDEX IF NOT EXISTS phases_invocation ON phases(invocation_id);
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _cpu_model():
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or None
+
+
+def _memory():
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _library_versions():
+    from importlib import metadata
+
+    versions = {}
+    for name in LIBRARIES:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            pass
+    return versions
+
+
+def _thread_settings():
+    settings = {name: os.environ[name] for name in THREAD_VARIABLES if name in os.environ}
+    # only libraries the run has already loaded, importing them here would be slow
+    if "torch" in sys.modules:
+        settings["torch"] = sys.modules["torch"].get_num_threads()
+    if "numpy" in sys.modules:
+        try:
+            from threadpoolctl import threadpool_info
+
+            settings["threadpools"] = [{"api": pool.get("internal_api"), "version": pool.get("version"),
+                                        "threads": pool.get("num_threads")} for pool in threadpool_info()]
+        except ImportError:
+            pass
+    return settings
+
+
+def host_info():
+    """Return the host fingerprint fields."""
+    return {
+        "hostname": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_model": _cpu_model(),
+        "cpu_count": os.cpu_count(),
+        "cpu_affinity": len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else None,
+        "memory": _memory(),
+        "libraries": _library_versions(),
+        "threads": _thread_settings(),
+    }
+
+
+def fingerprint(host):
+    """Return a short hash of the host fields that affect performance."""
+    fields = {key: value for key, value in host.items() if key != "hostname"}
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def git_revision(root=ROOT):
+    """Return (commit, dirty) of the tree, or (None, None) outside a git checkout."""
+    try:
+        revision = subprocess.run(["git", "rev-parse", "HEAD"], cwd=root, capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                                capture_output=True, text=True, check=True).stdout
+        return revision, bool(status.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def git_commit(revision, root=ROOT):
+    """Return the commit a branch, tag or revision expression (HEAD~2) names, or None."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--verify", "--quiet", f"{revision}^{{commit}}"], cwd=root,
+                              capture_output=True, text=True, check=True).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def provenance():
+    """Return the revision, dirty flag, host fingerprint and host fields of this tree and host."""
+    commit, dirty = git_revision()
+    host = host_info()
+    return {"revision": commit, "dirty": dirty, "fingerprint": fingerprint(host), "host": host}
+
+
+class ResultsDB:
+    """SQLite store of runs, invocations and phases."""
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("BENCH_RESULTS_DB", DEFAULT_DB)
+        self.db = sqlite3.connect(self.path)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def start_run(self, label=None, revision=None, started=None, origin=None):
+        """
+        Create a run and return its id. The run is stamped with the current tree and host, or with
+        origin, the provenance() of the tree and host the results were measured on.
+        """
+        origin = origin or provenance()
+        cursor = self.db.execute(
+            "INSERT INTO runs (started, label, revision, dirty, fingerprint, host) VALUES (?, ?, ?, ?, ?, ?)",
+            (started or time.time(), label, revision or origin["revision"], origin["dirty"], origin["fingerprint"],
+             json.dumps(origin["host"])))
+        self.db.commit()
+        return cursor.lastrowid
+
+    def finish_run(self, run_id):
+        """Refresh the host fingerprint once the run has loaded its libraries and thread pools."""
+        host = host_info()
+        self.db.execute("UPDATE runs SET fingerprint = ?, host = ? WHERE id = ?",
+                        (fingerprint(host), json.dumps(host), run_id))
+        self.db.commit()
+
+    def add(self, run_id, record):
+        """Store one runner record."""
+        record = dict(record)
+        resources = record.get("resources")
+        if resources:
+            # keep the summary, the raw samples belong in the results file
+            record["resources"] = {key: value for key, value in resources.items() if key not in ("samples", "cpu_util")}
+        summary = (resources or {}).get("summary", {})
+        cursor = self.db.execute(
+            "INSERT INTO invocations (run_id, function, size, event, repetition, status, wall_time, cpu_time, "
+            "max_rss, record) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (run_id, record.get("function"), record.get("size"), json.dumps(record.get("event"), sort_keys=True),
+             record.get("repetition"), record.get("status"), record.get("wall_time"), summary.get("cpu_time"),
+             summary.get("max_rss"), json.dumps(record, default=repr)))
+        self.db.executemany("INSERT INTO phases (invocation_id, name, start, duration, bytes) VALUES (?, ?, ?, ?, ?)",
+                            [(cursor.lastrowid, phase["name"], phase["start"], phase["end"] - phase["start"],
+                              phase.get("bytes")) for phase in record.get("phases", [])])
+        self.db.commit()
+
+    def runs(self):
+        """Return every run as a dict, oldest first."""
+        rows = self.db.execute(
+            "SELECT runs.id, started, label, revision, dirty, fingerprint, COUNT(invocations.id) FROM runs "
+            "LEFT JOIN invocations ON invocations.run_id = runs.id GROUP BY runs.id ORDER BY runs.id").fetchall()
+        return [dict(zip(["id", "started", "label", "revision", "dirty", "fingerprint", "invocations"], row))
+                for row in rows]
+
+    def resolve(self, spec):
+        """
+        Return the run ids selected by a run id, "latest", a label, a stored revision prefix, or any
+        name git resolves to a commit (HEAD, HEAD~2, a branch or a tag).
+        """
+        if spec == "latest":
+            row = self.db.execute("SELECT MAX(id) FROM runs").fetchone()
+            return [row[0]] if row[0] is not None else []
+        if spec.isdigit() and self.db.execute("SELECT 1 FROM runs WHERE id = ?", (int(spec),)).fetchone():
+            return [int(spec)]
+        rows = self.db.execute("SELECT id FROM runs WHERE label = ? OR revision LIKE ? ORDER BY id",
+                               (spec, f"{spec}%")).fetchall()
+        if not rows:
+            commit = git_commit(spec)
+            if commit:
+                rows = self.db.execute("SELECT id FROM runs WHERE revision = ? ORDER BY id", (commit,)).fetchall()
+        return [row[0] for row in rows]
+
+    def samples(self, run_ids, metric="wall_time"):
+        """Return {(function, size, event): [values]} of the successful invocations of some runs."""
+        marks = ",".join("?" * len(run_ids))
+        if metric.startswith("phase:"):
+            rows = self.db.execute(
+                f"SELECT function, size, event, SUM(duration) FROM invocations JOIN phases ON invocation_id = id "
+                f"WHERE run_id IN ({marks}) AND status = 'ok' AND name = ? GROUP BY id",
+                (*run_ids, metric[len("phase:"):])).fetchall()
+        elif metric in ("wall_time", "cpu_time", "max_rss"):
+            rows = self.db.execute(
+                f"SELECT function, size, event, {metric} FROM invocations "
+                f"WHERE run_id IN ({marks}) AND status = 'ok' AND {metric} IS NOT NULL", run_ids).fetchall()
+        else:
+            raise ValueError(f"Unknown metric: {metric}")
+        values = {}
+        for func_name, size, event, value in rows:
+            values.setdefault((func_name, size, event), []).append(value)
+        return values
+
+    def fingerprints(self, run_ids):
+        """Return the distinct host fingerprints of some runs."""
+        marks = ",".join("?" * len(run_ids))
+        return {row[0] for row in self.db.execute(f"SELECT fingerprint FROM runs WHERE id IN ({marks})", run_ids)}
+
+
+def mann_whitney(a, b):
+    """Two-sided Mann-Whitney U test with the normal approximation (tie and continuity corrected)."""
+    n1, n2 = len(a), len(b)
+    values = sorted([(value, 0) for value in a] + [(value, 1) for value in b])
+    ranks = [0.0] * len(values)
+    ties = 0.0
+    i = 0
+    while i < len(values):
+        j = i
+        while j + 1 < len(values) and values[j + 1][0] == values[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        t = j - i + 1
+        ties += t ** 3 - t
+        i = j + 1
+
+    u1 = sum(rank for rank, (_, group) in zip(ranks, values) if group == 0) - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return u1, 1.0
+    z = (abs(u1 - n1 * n2 / 2) - 0.5) / math.sqrt(variance)
+    return u1, min(1.0, math.erfc(max(z, 0) / math.sqrt(2)))
+
+
+def compare(db, base, head, metric="wall_time", alpha=0.05, threshold=0.05, min_samples=5):
+    """
+    Compare two sets of runs per function, size and event. Returns one row per configuration; one
+    measured on only one side is "unmatched" rather than pooled with the other configurations.
+    """
+    base_samples, head_samples = db.samples(base, metric), db.samples(head, metric)
+    rows = []
+    for key in sorted(set(base_samples) | set(head_samples), key=lambda key: (key[0], key[1], key[2] or "")):
+        a, b = base_samples.get(key, []), head_samples.get(key, [])
+        row = {"function": key[0], "size": key[1], "event": json.loads(key[2]) if key[2] else None,
+               "base_n": len(a), "head_n": len(b), "base_median": statistics.median(a) if a else None,
+               "head_median": statistics.median(b) if b else None, "change": None, "p": None}
+        if not a or not b:
+            row["verdict"] = "unmatched"
+        elif len(a) < min_samples or len(b) < min_samples:
+            row["verdict"] = "insufficient"
+        else:
+            _, row["p"] = mann_whitney(a, b)
+            row["change"] = row["head_median"] / row["base_median"] - 1 if row["base_median"] else None
+            significant = row["p"] < alpha and row["change"] is not None and abs(row["change"]) > threshold
+            row["verdict"] = ("regression" if row["change"] > 0 else "improvement") if significant else "same"
+        rows.append(row)
+    return rows
+
+
+def config(event):
+    """Return the event fields other than size as key=value pairs."""
+    return ",".join(f"{key}={value}" for key, value in sorted((event or {}).items()) if key != "size") or "-"
+
+
+def report(rows, metric):
+    """Print a comparison table."""
+    header = ["function", "size", "base_n", "head_n", "base_median", "head_median", "change", "p", "verdict"]
+    print(f"metric: {metric}")
+    print("  ".join(f"{column:>18}" for column in header) + "  config")
+    for row in rows:
+        values = [row[column] for column in header]
+        values[6] = f"{row['change']:+.1%}" if row["change"] is not None else None
+        print("  ".join(f"{value:>18.4g}" if isinstance(value, float) else f"{str(value):>18}" for value in values)
+              + f"  {config(row['event'])}")
+
+
+def main(argv=None):
+    """Import results files, list runs and compare runs."""
+    parser = argparse.ArgumentParser(description="Store runner results in SQLite and detect regressions.")
+    parser.add_argument("--db", help=f"SQLite file (default: $BENCH_RESULTS_DB or {DEFAULT_DB})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    importer = commands.add_parser("import", help="store a runner results file as a new run")
+    importer.add_argument("results", help="JSON lines results file")
+    importer.add_argument("--label", help="name of the run")
+    importer.add_argument("--revision",
+                          help="git revision the results were measured at (default: the one stamped in the "
+                               "results, or HEAD)")
+
+    commands.add_parser("runs", help="list the stored runs")
+
+    comparer = commands.add_parser("compare", help="flag significant changes between two runs")
+    comparer.add_argument("base", help="run id, label, git revision or 'latest'")
+    comparer.add_argument("head", help="run id, label, git revision or 'latest'")
+    comparer.add_argument("--metric", default="wall_time", help="wall_time, cpu_time, max_rss or phase:<name>")
+    comparer.add_argument("--alpha", type=float, default=0.05, help="significance level")
+    comparer.add_argument("--threshold", type=float, default=0.05, help="smallest relative change to flag")
+    comparer.add_argument("--min-samples", type=int, default=5, help="invocations needed on each side")
+    comparer.add_argument("--output", help="write the comparison as JSON")
+    args = parser.parse_args(argv)
+
+    db = ResultsDB(args.db)
+    try:
+        if args.command == "import":
+            with open(args.results, "r") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+            # keep the tree and host the results were measured on, when the runner stamped them
+            origins = [record["provenance"] for record in records if record.get("provenance")]
+            if len({(origin["revision"], origin["fingerprint"]) for origin in origins}) > 1:
+                print("Warning: the results were measured at several revisions or host configurations")
+            run_id = db.start_run(args.label, args.revision, min((r["start"] for r in records if r.get("start")),
+                                                                default=None), origins[0] if origins else None)
+            for record in records:
+                db.add(run_id, record)
+            print(f"Stored {len(records)} invocations as run {run_id}")
+            return 0
+
+        if args.command == "runs":
+            for run in db.runs():
+                started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(run["started"]))
+                revision = (run["revision"] or "-")[:12] + ("+" if run["dirty"] else "")
+                print(f"{run['id']:>5}  {started}  {revision:<13}  {run['fingerprint']}  "
+                      f"{run['invocations']:>6}  {run['label'] or ''}")
+            return 0
+
+        base, head = db.resolve(args.base), db.resolve(args.head)
+        if not base or not head:
+            print(f"No runs match {args.base if not base else args.head}")
+            return 2
+        if len(db.fingerprints(base) | db.fingerprints(head)) > 1:
+            print("Warning: the runs were measured on different hosts or host configurations")
+        rows = compare(db, base, head, args.metric, args.alpha, args.threshold, args.min_samples)
+        report(rows, args.metric)
+        unmatched = sum(row["verdict"] == "unmatched" for row in rows)
+        if unmatched:
+            print(f"Warning: {unmatched} configurations were measured in only one of the runs")
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(rows, f, indent=2)
+        return 1 if any(row["verdict"] == "regression" for row in rows) else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
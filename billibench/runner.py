@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""
+Suite runner: discover every AppN_*/FuncM_*/function.py handler, run a sweep matrix
+(functions x sizes x extra event fields) for N repetitions and write one JSON line per invocation.
+
+Usage:
+    python -m billibench.runner --functions Func0_compile,Func8_mergesort --sizes small,medium --repetitions 3
+    python -m billibench.runner --set Func2_test.workers_num=1,4,16 --output results.jsonl
+    python -m billibench.runner --matrix sweep.json
+
+The memory and CPU sweeps run each trial in a fresh interpreter started with child_command(): it
+invokes one handler repetitions times and prints a JSON summary line, read back with child_result().
+"""
+
+import os
+import ast
+import sys
+import json
+import glob
+import time
+import socket
+import argparse
+import itertools
+import threading
+import traceback
+import importlib.util
+
+from billibench import cache, procs, profiler, resultsdb, scratch, shaping, storage, trace, validate
+from billibench.sampler import ResourceSampler
+
+# Root of the BilliBench repository (parent directory of this package)
+BENCH_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SIZES = ["small", "medium", "large"]
+
+QA_CONTEXT = "France is a country in Western Europe. Its capital is Paris, a major European city known for its art, fashion, and culture."
+
+# Extra event fields per function and size, taken from each handler's __main__ block.
+# "content_length" is expanded into a "content" string of that many characters.
+DEFAULT_EVENTS = {
+    "Func2_test": {
+        "small": {"gtest_filter": "", "workers_num": 1},
+        "medium": {"gtest_filter": "*VP9DecodeMultiThreadedTest*", "workers_num": 16},
+        "large": {"gtest_filter": "*VP9*", "workers_num": 24},
+    },
+    "Func4_xc_dump": {
+        "small": {"quality": "rt", "thread_number": 1},
+        "medium": {"quality": "good", "thread_number": 10},
+        "large": {"quality": "best", "thread_number": 10},
+    },
+    "Func9_UploadReview": {
+        "small": {"key": "small", "content_length": 10000},
+        "medium": {"key": "medium", "content_length": 5000000},
+        "large": {"key": "large", "content_length": 512000000},
+    },
+    "Func13_qa": {
+        "small": {"task_type": "qa", "question": "What is the capital of France?", "context": QA_CONTEXT},
+        "medium": {"task_type": "qa", "question": "What is the capital of France?", "context": QA_CONTEXT},
+        "large": {"task_type": "text_gen", "prompt": "Once upon a time"},
+    },
+}
+
+# Event values longer than this are summarized in the results file
+MAX_RECORDED_VALUE = 256
+
+
+def discover(root=BENCH_ROOT):
+    """Return {func_name: (app_name, path)} for every function.py that defines handler()."""
+    functions = {}
+    for path in sorted(glob.glob(os.path.join(root, "App*", "Func*", "function.py"))):
+        with open(path, "r") as f:
+            tree = ast.parse(f.read(), filename=path)
+        if not any(isinstance(node, ast.FunctionDef) and node.name == "handler" for node in tree.body):
+            continue
+        func_dir = os.path.dirname(path)
+        functions[os.path.basename(func_dir)] = (os.path.basename(os.path.dirname(func_dir)), path)
+    return functions
+
+
+def import_function(func_name, path):
+    """Import a function.py under a unique module name."""
+    spec = importlib.util.spec_from_file_location(f"{func_name}.function", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_function(func_name, path):
+    """Import a function.py and run its optional load_models() hook."""
+    module = import_function(func_name, path)
+    if hasattr(module, "load_models"):
+        module.load_models()
+    return module
+
+
+def build_event(func_name, size, overrides=None):
+    """Build the handler event for a function and size, applying sweep overrides."""
+    event = {"size": size}
+    event.update(DEFAULT_EVENTS.get(func_name, {}).get(size, {}))
+    event.update(overrides or {})
+    if "content_length" in event:
+        event["content"] = "0" * int(event.pop("content_length"))
+    return event
+
+
+def summarize_event(event):
+    """Return a copy of the event that is small enough to store in the results file."""
+    summary = {}
+    for key, value in event.items():
+        if isinstance(value, str) and len(value) > MAX_RECORDED_VALUE:
+            value = f"<{len(value)} chars>"
+        summary[key] = value
+    return summary
+
+
+def exit_status(ret):
+    """Map a handler return value to an exit status (0 on success)."""
+    if isinstance(ret, bool):
+        return int(not ret)
+    if isinstance(ret, int):
+        return ret
+    if isinstance(ret, dict) and ret.get("idx") == -1:
+        return 1
+    return 0
+
+
+def invoke(module, event, sample_interval=None, profile=None):
+    """Run one handler invocation and return its measurements. profile is a (mode, interval) pair."""
+    cwd = os.getcwd()
+    storage.reset_setup_stats()
+    cache.reset_stats()
+    procs.reset_stats()
+    scratch.reset_stats()
+    shaping.reset_stats()
+    trace.reset()
+    sampler = ResourceSampler(sample_interval).start() if sample_interval else None
+    stack_sampler = profiler.Profiler(profile[1], profile[0], roots=[invoke.__code__]).start() if profile else None
+    record = {"start": time.time()}
+    start = time.perf_counter()
+    try:
+        ret = module.handler(event)
+        record["wall_time"] = time.perf_counter() - start
+        record["return_value"] = ret
+        record["exit_status"] = exit_status(ret)
+        record["status"] = "ok" if record["exit_status"] == 0 else "failed"
+    except BaseException as e:
+        if isinstance(e, KeyboardInterrupt):
+            raise
+        record["wall_time"] = time.perf_counter() - start
+        record["return_value"] = None
+        record["exit_status"] = 1
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+        record["error_type"] = type(e).__name__
+    finally:
+        # Some handlers chdir into their temporary directory
+        os.chdir(cwd)
+        if stack_sampler:
+            record["profile"] = stack_sampler.stop()
+        if sampler:
+            record["resources"] = sampler.stop()
+    record["storage_setup"] = storage.setup_stats()
+    if cache.enabled():
+        record["cache"] = cache.stats()
+    record["scratch"] = scratch.stats()
+    if shaping.enabled():
+        record["shaping"] = dict(shaping.config(), **shaping.stats())
+    children = procs.stats()
+    if children["children"]:
+        record["processes"] = children
+    record["phases"] = trace.collect(start)
+    return record
+
+
+def watch_memory_errors(trace=False):
+    """
+    Count the MemoryErrors raised in this process, including those the handler catches, and return
+    the counter ({"count": n}). Uses sys.monitoring (Python 3.12); older interpreters need a trace
+    function on every call, which slows the handler down, so they only watch with trace=True and
+    return None otherwise.
+    """
+    counter = {"count": 0}
+    monitoring = getattr(sys, "monitoring", None)
+    if monitoring is not None:
+        def raised(code, offset, exception):
+            if isinstance(exception, MemoryError):
+                counter["count"] += 1
+
+        tool = monitoring.PROFILER_ID
+        monitoring.use_tool_id(tool, "billibench.runner")
+        monitoring.register_callback(tool, monitoring.events.RAISE, raised)
+        monitoring.set_events(tool, monitoring.events.RAISE)
+        return counter
+    if not trace:
+        return None
+
+    def tracer(frame, event, arg):
+        # only call and exception events, no per-line tracing
+        frame.f_trace_lines = False
+        if event == "exception" and isinstance(arg[1], MemoryError):
+            counter["count"] += 1
+        return tracer
+
+    sys.settrace(tracer)
+    threading.settrace(tracer)
+    return counter
+
+
+def child(func_name, size, repetitions, overrides=None, watch=False):
+    """
+    Run in a trial interpreter: load the handler, invoke it repetitions times and print one JSON line.
+    With watch, MemoryErrors are counted even where that slows the handler down.
+    """
+    _, path = discover()[func_name]
+    event = build_event(func_name, size, overrides)
+    module = load_function(func_name, path)
+    memory_errors = watch_memory_errors(watch)
+    records = []
+    cpu_times = []
+    for _ in range(repetitions):
+        start = procs.cpu_time()
+        records.append(invoke(module, event))
+        cpu_times.append(procs.cpu_time() - start)
+    result = {
+        "wall_times": [record["wall_time"] for record in records],
+        "cpu_times": cpu_times,
+        "statuses": [record["status"] for record in records],
+        "errors": [record.get("error") for record in records if record.get("error")],
+        "error_types": [record["error_type"] for record in records if record.get("error_type")],
+        "memory_errors": memory_errors["count"] if memory_errors else None,
+    }
+    sys.stdout.write("\n" + json.dumps(result, default=repr) + "\n")
+
+
+def child_command(func_name, size, repetitions, overrides=None, watch=False):
+    """Return the command that runs child() in a fresh interpreter."""
+    command = [sys.executable, "-m", "billibench.runner", "--child", "--functions", func_name, "--sizes", size,
+               "--repetitions", str(repetitions), "--overrides", json.dumps(overrides or {})]
+    return command + ["--watch"] if watch else command
+
+
+def child_result(code, stdout):
+    """Return the summary printed by a child() that exited with code, or {} when it printed none."""
+    lines = [line for line in stdout.splitlines() if line.startswith("{")]
+    return json.loads(lines[-1]) if code == 0 and lines else {}
+
+
+def expand_matrix(matrix, functions):
+    """Yield (func_name, size, overrides) for every point of the sweep matrix."""
+    func_names = matrix.get("functions") or sorted(functions, key=lambda name: int(name.split("_")[0][4:]))
+    sizes = matrix.get("sizes") or SIZES
+    for func_name in func_names:
+        if func_name not in functions:
+            raise ValueError(f"Unknown function: {func_name}")
+        fields = matrix.get("events", {}).get(func_name, {})
+        keys = sorted(fields)
+        for size in sizes:
+            for values in itertools.product(*(fields[key] for key in keys)):
+                yield func_name, size, dict(zip(keys, values))
+
+
+def validated_invoke(module, func_name, event, sample_interval=None, profile=None):
+    """Invoke a handler and check its outputs; a run that returned 0 but fails validation is "invalid"."""
+    try:
+        bucket = storage.initialize_storage()
+        before = validate.snapshot(bucket, func_name, event)
+    except Exception as e:
+        bucket, before = None, e
+    record = invoke(module, event, sample_interval, profile)
+    if record["status"] != "ok":
+        return record
+    if isinstance(before, Exception):
+        record["validation"] = {"valid": False, "reason": f"output snapshot failed: {type(before).__name__}: {before}"}
+    else:
+        record["validation"] = validate.check(bucket, func_name, event, before)
+    if not record["validation"]["valid"]:
+        record["status"] = "invalid"
+    return record
+
+
+def run(matrix, output_path, root=BENCH_ROOT, sample_interval=None, trace_path=None, validation=True,
+        db_path=None, label=None, profile_dir=None, profile_mode="wall", profile_interval=0.005):
+    """
+    Run a sweep matrix and append one JSON record per invocation to output_path,
+    and to the results database at db_path when given. With profile_dir, every invocation is
+    profiled and its collapsed stacks are written to that directory.
+    """
+    functions = discover(root)
+    repetitions = int(matrix.get("repetitions", 1))
+    host = socket.gethostname()
+    modules = {}
+    failures = 0
+    records = []
+    db = resultsdb.ResultsDB(db_path) if db_path else None
+    run_id = db.start_run(label) if db else None
+    profile = (profile_mode, profile_interval) if profile_dir else None
+    origin = None
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+    index = 0
+
+    with open(output_path, "a") as out:
+        for func_name, size, overrides in expand_matrix(matrix, functions):
+            app_name, path = functions[func_name]
+            if func_name not in modules:
+                try:
+                    modules[func_name] = load_function(func_name, path)
+                except Exception as e:
+                    traceback.print_exc()
+                    modules[func_name] = e
+
+            event = build_event(func_name, size, overrides)
+            for repetition in range(repetitions):
+                base = {
+                    "app": app_name,
+                    "function": func_name,
+                    "size": size,
+                    "event": summarize_event(event),
+                    "repetition": repetition,
+                    "host": host,
+                }
+                module = modules[func_name]
+                if isinstance(module, Exception):
+                    record = {"start": time.time(), "wall_time": None, "return_value": None,
+                              "exit_status": 1, "status": "error",
+                              "error": f"import failed: {type(module).__name__}: {module}"}
+                elif validation:
+                    record = validated_invoke(module, func_name, event, sample_interval, profile)
+                else:
+                    record = invoke(module, event, sample_interval, profile)
+                base.update(record)
+                if origin is None:
+                    # after the first invocation, so the thread pools of the loaded libraries are included
+                    origin = resultsdb.provenance()
+                base["provenance"] = origin
+                if "profile" in base:
+                    # keep the stacks out of the results file
+                    path = os.path.join(profile_dir, profiler.profile_name(func_name, size, index))
+                    profiler.write_collapsed(base["profile"].pop("stacks"), path)
+                    base["profile"]["path"] = path
+                index += 1
+                failures += base["status"] != "ok"
+                out.write(json.dumps(base, default=repr) + "\n")
+                out.flush()
+                if db:
+                    db.add(run_id, base)
+                if trace_path:
+                    records.append(base)
+                reason = base.get("validation", {}).get("reason")
+                print(f"{func_name} {size} #{repetition}: {base['status']} {base['wall_time']}"
+                      + (f" ({reason})" if reason else ""))
+
+    if db:
+        db.finish_run(run_id)
+        db.close()
+        print(f"Stored as run {run_id} in {db_path}")
+    if trace_path:
+        with open(trace_path, "w") as f:
+            json.dump(trace.to_chrome_trace(records), f, default=repr)
+    return failures
+
+
+def parse_set(values):
+    """Parse --set Func.field=v1,v2 arguments into {func: {field: [values]}}."""
+    events = {}
+    for item in values:
+        target, _, raw = item.partition("=")
+        func_name, _, field = target.partition(".")
+        if not raw or not field:
+            raise ValueError(f"Invalid --set argument: {item}")
+        parsed = []
+        for value in raw.split(","):
+            try:
+                parsed.append(json.loads(value))
+            except ValueError:
+                parsed.append(value)
+        events.setdefault(func_name, {})[field] = parsed
+    return events
+
+
+def main(argv=None):
+    """Main execution function."""
+    parser = argparse.ArgumentParser(description="Run the BilliBench function suite.")
+    parser.add_argument("--matrix", help="JSON file with functions, sizes, events and repetitions")
+    parser.add_argument("--functions", help="comma separated function names (default: all)")
+    parser.add_argument("--sizes", help="comma separated sizes (default: small,medium,large)")
+    parser.add_argument("--set", action="append", default=[], metavar="FUNC.FIELD=V1,V2",
+                        help="sweep an extra event field over the given values")
+    parser.add_argument("--repetitions", type=int, help="invocations per sweep point")
+    parser.add_argument("--output", default="results.jsonl", help="JSON lines results file")
+    parser.add_argument("--sample-interval", type=float, metavar="SECONDS",
+                        help="sample CPU, RSS, I/O and network usage at this interval (e.g. 0.01)")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="also write the handler phases of this run as Chrome trace-event JSON")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="profile every invocation and write collapsed stacks to this directory")
+    parser.add_argument("--profile-mode", choices=profiler.MODES, default="wall",
+                        help="count every thread per sample (wall) or weight by thread CPU time (cpu)")
+    parser.add_argument("--profile-interval", type=float, default=0.005, metavar="SECONDS",
+                        help="stack sampling interval")
+    parser.add_argument("--no-storage-cache", action="store_true",
+                        help="create a new storage client and bucket handle on every invocation")
+    parser.add_argument("--cache", action="store_true",
+                        help="serve repeated downloads from the on-host payload cache (BENCH_CACHE=1)")
+    parser.add_argument("--scratch", metavar="ROOT",
+                        help="handler scratch space: disk, shm or a directory (BENCH_SCRATCH)")
+    parser.add_argument("--no-validate", action="store_true",
+                        help="do not check the outputs of successful invocations")
+    parser.add_argument("--db", metavar="PATH", help="also store the run in this SQLite results database")
+    parser.add_argument("--label", help="name of the run in the results database")
+    parser.add_argument("--list", action="store_true", help="list discovered functions and exit")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--overrides", default="{}", help=argparse.SUPPRESS)
+    parser.add_argument("--watch", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args.functions, args.sizes, args.repetitions or 1, json.loads(args.overrides), args.watch)
+        return 0
+
+    if args.no_storage_cache:
+        os.environ["BENCH_STORAGE_CACHE"] = "0"
+    if args.cache:
+        os.environ["BENCH_CACHE"] = "1"
+    if args.scratch:
+        os.environ["BENCH_SCRATCH"] = args.scratch
+
+    if args.list:
+        for func_name, (app_name, path) in discover().items():
+            print(f"{app_name}/{func_name}")
+        return 0
+
+    matrix = {}
+    if args.matrix:
+        with open(args.matrix, "r") as f:
+            matrix = json.load(f)
+    if args.functions:
+        matrix["functions"] = args.functions.split(",")
+    if args.sizes:
+        matrix["sizes"] = args.sizes.split(",")
+    for func_name, fields in parse_set(args.set).items():
+        matrix.setdefault("events", {}).setdefault(func_name, {}).update(fields)
+    if args.repetitions is not None:
+        matrix["repetitions"] = args.repetitions
+
+    failures = run(matrix, os.path.abspath(args.output), sample_interval=args.sample_interval,
+                   trace_path=args.trace and os.path.abspath(args.trace), validation=not args.no_validate,
+                   db_path=args.db and os.path.abspath(args.db), label=args.label,
+                   profile_dir=args.profile and os.path.abspath(args.profile), profile_mode=args.profile_mode,
+                   profile_interval=args.profile_interval)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+"""
+Per-invocation resource usage sampler.
+
+A background thread reads /proc at a fixed interval (down to ~1 ms) and records, for the process and
+all of its descendants (make, gcc, vpxenc, xc-enc, gtest-parallel, ...):
+    cpu_time     cumulative user+system CPU seconds, including reaped children
+    rss          resident set size in bytes, summed over the live process tree
+    read_bytes   cumulative block I/O read by the live tree
+    write_bytes  cumulative block I/O written by the live tree
+    net_rx       bytes received on non-loopback interfaces of the network namespace
+    net_tx       bytes sent on non-loopback interfaces of the network namespace
+    procs        number of live processes in the tree
+    sampler_cpu  CPU seconds spent by the sampler thread itself
+
+CPU time comes from /proc/<pid>/stat, which counts in clock ticks (1/SC_CLK_TCK, usually 10 ms).
+Utilization between samples taken a few ticks apart is therefore coarse; the tick length is
+reported as "cpu_resolution". A child reaped while the tree is being read can drop out of one
+sample, so the recorded series is kept non-decreasing.
+
+Samples are stored column-wise so they can be loaded straight into numpy arrays.
+"""
+
+import os
+import time
+import threading
+
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+COLUMNS = ["t", "cpu_time", "rss", "read_bytes", "write_bytes", "net_rx", "net_tx", "procs", "sampler_cpu"]
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _children(pid):
+    """Return the direct children of every thread of pid."""
+    children = []
+    try:
+        tids = os.listdir(f"/proc/{pid}/task")
+    except OSError:
+        return children
+    for tid in tids:
+        try:
+            children.extend(int(child) for child in _read(f"/proc/{pid}/task/{tid}/children").split())
+        except OSError:
+            pass
+    return children
+
+
+def _children_by_scan(pid):
+    """Return the direct children of pid by scanning /proc (kernels without task/*/children)."""
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            stat = _read(f"/proc/{entry}/stat")
+        except OSError:
+            continue
+        if int(stat[stat.rindex(b")") + 2:].split()[1]) == pid:
+            children.append(int(entry))
+    return children
+
+
+def process_tree(pid):
+    """Return pid and all of its live descendants."""
+    find_children = _children if os.path.exists(f"/proc/{pid}/task/{pid}/children") else _children_by_scan
+    tree = [pid]
+    i = 0
+    while i < len(tree):
+        tree.extend(find_children(tree[i]))
+        i += 1
+    return tree
+
+
+def _net_bytes():
+    """Return (rx, tx) bytes over all non-loopback interfaces."""
+    rx = tx = 0
+    for line in _read("/proc/net/dev").splitlines()[2:]:
+        name, _, data = line.partition(b":")
+        if name.strip() == b"lo":
+            continue
+        fields = data.split()
+        rx += int(fields[0])
+        tx += int(fields[8])
+    return rx, tx
+
+
+def read_usage(pid):
+    """Return (cpu_time, rss, read_bytes, write_bytes, procs) for the process tree rooted at pid."""
+    ticks = rss = read_bytes = write_bytes = procs = 0
+    for tree_pid in process_tree(pid):
+        try:
+            stat = _read(f"/proc/{tree_pid}/stat")
+        except OSError:
+            continue
+        fields = stat[stat.rindex(b")") + 2:].split()
+        # own time plus the time of the children this process already reaped, so a make or bash
+        # in the tree that waits for its own children keeps their time in the sum
+        ticks += int(fields[11]) + int(fields[12]) + int(fields[13]) + int(fields[14])
+        rss += int(fields[21]) * PAGE_SIZE
+        procs += 1
+        try:
+            for line in _read(f"/proc/{tree_pid}/io").splitlines():
+                if line.startswith(b"read_bytes:"):
+                    read_bytes += int(line.split()[1])
+                elif line.startswith(b"write_bytes:"):
+                    write_bytes += int(line.split()[1])
+        except OSError:
+            pass
+    return ticks / CLK_TCK, rss, read_bytes, write_bytes, procs
+
+
+class ResourceSampler:
+    """Sample resource usage of a process tree from a background thread."""
+
+    def __init__(self, interval=0.01, pid=None):
+        self.interval = interval
+        self.pid = pid or os.getpid()
+        self.samples = {column: [] for column in COLUMNS}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="billibench-sampler", daemon=True)
+        self._start = None
+
+    def sample(self):
+        """Record one sample."""
+        t = time.perf_counter() - self._start
+        cpu_time, rss, read_bytes, write_bytes, procs = read_usage(self.pid)
+        if self.samples["cpu_time"]:
+            # a child reaped after its parent's stat was read is missing from this one sample
+            cpu_time = max(cpu_time, self.samples["cpu_time"][-1])
+        net_rx, net_tx = _net_bytes()
+        for column, value in zip(COLUMNS, (t, cpu_time, rss, read_bytes, write_bytes, net_rx, net_tx, procs,
+                                           time.thread_time())):
+            self.samples[column].append(value)
+
+    def _run(self):
+        deadline = time.perf_counter()
+        while not self._stop.is_set():
+            self.sample()
+            deadline += self.interval
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                # fell behind; do not try to catch up with a burst of samples
+                deadline = time.perf_counter()
+        self.sample()
+
+    def start(self):
+        """Start sampling."""
+        self._start = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop sampling and return the time series, a summary and the sampler overhead."""
+        self._stop.set()
+        self._thread.join()
+        return {
+            "interval": self.interval,
+            "cpu_resolution": 1 / CLK_TCK,
+            "samples": self.samples,
+            "cpu_util": cpu_utilization(self.samples),
+            "summary": summarize(self.samples),
+            "overhead": overhead(self.samples),
+        }
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.result = self.stop()
+
+
+def summarize(samples):
+    """Summarize a sample series: totals over the run and peak values."""
+    n = len(samples["t"])
+    if n == 0:
+        return {}
+    duration = samples["t"][-1] - samples["t"][0]
+    cpu_time = samples["cpu_time"][-1] - samples["cpu_time"][0]
+    return {
+        "samples": n,
+        "duration": duration,
+        "cpu_time": cpu_time,
+        "mean_cpu_util": cpu_time / duration if duration > 0 else None,
+        "max_rss": max(samples["rss"]),
+        "max_procs": max(samples["procs"]),
+        "read_bytes": max(0, samples["read_bytes"][-1] - samples["read_bytes"][0]),
+        "write_bytes": max(0, samples["write_bytes"][-1] - samples["write_bytes"][0]),
+        "net_rx": samples["net_rx"][-1] - samples["net_rx"][0],
+        "net_tx": samples["net_tx"][-1] - samples["net_tx"][0],
+    }
+
+
+def overhead(samples):
+    """Report how much CPU the sampler itself consumed."""
+    n = len(samples["t"])
+    if n == 0:
+        return {}
+    sampler_cpu = samples["sampler_cpu"][-1] - samples["sampler_cpu"][0]
+    cpu_time = samples["cpu_time"][-1] - samples["cpu_time"][0]
+    return {
+        "sampler_cpu": sampler_cpu,
+        "per_sample": sampler_cpu / max(n - 1, 1),
+        "fraction_of_cpu": sampler_cpu / cpu_time if cpu_time > 0 else None,
+    }
+
+
+def cpu_utilization(samples):
+    """Return the CPU utilization (in cores) between consecutive samples."""
+    t, cpu = samples["t"], samples["cpu_time"]
+    return [(cpu[i] - cpu[i - 1]) / (t[i] - t[i - 1]) if t[i] > t[i - 1] else 0.0 for i in range(1, len(t))]
@@ -0,0 +1,135 @@
+"""
+Scratch directories for handlers.
+
+Handlers unpack payloads and write intermediate files into a per-invocation scratch directory. By
+default it is created under BENCH_HOME, on the disk that backs the checkout. BENCH_SCRATCH selects
+another root: "shm" (or "tmpfs") for /dev/shm, "disk" for BENCH_HOME, or any directory path, for
+example a dedicated tmpfs or local SSD mount. Files in a tmpfs root live in memory and count
+against the memory of the process's cgroup.
+
+When a scratch directory is closed, the bytes and files still in it are counted while it is removed
+(bytes_left, files_left): a handler that deletes its temporary files itself leaves nothing. While a
+directory is open, a background thread measures the size of its tree every BENCH_SCRATCH_INTERVAL
+seconds (default 0.05, 0 to only measure it when it is closed); bytes_peak is the largest size seen,
+summed over the directories. It counts only files under the scratch directory, on disk and tmpfs
+alike, but a file written and deleted between two measurements is missed. The totals, and the time
+the removals took, since the last reset_stats() are reported by stats().
+"""
+
+import os
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+
+SHM_ROOT = "/dev/shm"
+
+DEFAULT_INTERVAL = 0.05
+
+_stats = {"directories": 0, "bytes_left": 0, "files_left": 0, "bytes_peak": 0, "cleanup_time": 0.0}
+_stats_lock = threading.Lock()
+
+
+def root():
+    """Return the directory scratch directories are created in."""
+    setting = os.getenv("BENCH_SCRATCH", "disk")
+    if setting in ("shm", "tmpfs"):
+        return SHM_ROOT
+    if setting != "disk":
+        return setting
+    if not os.getenv("BENCH_HOME"):
+        raise EnvironmentError("Required environment variable (BENCH_SCRATCH or BENCH_HOME) is not set.")
+    return os.getenv("BENCH_HOME")
+
+
+def interval():
+    """Return the seconds between size measurements of an open scratch directory, 0 for none."""
+    return float(os.getenv("BENCH_SCRATCH_INTERVAL", DEFAULT_INTERVAL))
+
+
+def reset_stats():
+    """Zero the scratch counters."""
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0.0 if name == "cleanup_time" else 0
+
+
+def stats():
+    """Return the scratch usage and cleanup time since the last reset_stats()."""
+    with _stats_lock:
+        return dict(_stats, root=root())
+
+
+def tree_size(path):
+    """Return the bytes of the files under path, skipping files removed while it is walked."""
+    total = 0
+    for dir_path, _, file_names in os.walk(path):
+        for name in file_names:
+            try:
+                total += os.lstat(os.path.join(dir_path, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class _PeakWatcher:
+    """Measure the size of a directory tree from a background thread and keep the largest."""
+
+    def __init__(self, path, every):
+        self.path = path
+        self.every = every
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="billibench-scratch", daemon=True)
+        if every > 0:
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.every):
+            self.peak = max(self.peak, tree_size(self.path))
+
+    def stop(self):
+        """Stop measuring and return the largest size seen."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        return self.peak
+
+
+def _remove(path):
+    """Remove a directory tree and return (bytes, files) it held."""
+    total = 0
+    files = 0
+    for dir_path, dir_names, file_names in os.walk(path, topdown=False):
+        for name in file_names:
+            file_path = os.path.join(dir_path, name)
+            total += os.lstat(file_path).st_size
+            files += 1
+            os.unlink(file_path)
+        for name in dir_names:
+            dir_entry = os.path.join(dir_path, name)
+            if os.path.islink(dir_entry):
+                os.unlink(dir_entry)
+            else:
+                os.rmdir(dir_entry)
+    os.rmdir(path)
+    return total, files
+
+
+@contextmanager
+def directory():
+    """Create a scratch directory under root() and remove it, with accounting, on exit."""
+    path = tempfile.mkdtemp(dir=root())
+    watcher = _PeakWatcher(path, interval())
+    try:
+        yield path
+    finally:
+        peak = watcher.stop()
+        start = time.perf_counter()
+        total, files = _remove(path)
+        with _stats_lock:
+            _stats["directories"] += 1
+            _stats["bytes_left"] += total
+            _stats["files_left"] += files
+            _stats["bytes_peak"] += max(peak, total)
+            _stats["cleanup_time"] += time.perf_counter() - start
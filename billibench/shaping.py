@@ -0,0 +1,298 @@
+"""
+Latency and bandwidth shaping for the storage backend.
+
+A local bucket answers in microseconds at disk speed, so handlers that are download-bound on cloud
+storage look compute-bound offline. When any of the variables below is set, initialize_storage()
+wraps the backend in a ShapedBackend that delays every request like a remote object store would:
+    BENCH_SHAPE_LATENCY           seconds before the first byte of every request (default 0)
+    BENCH_SHAPE_JITTER            distribution of that latency, as KIND:PARAM
+                                      uniform:W      adds 0 to W seconds
+                                      exponential:M  adds an exponential delay with mean M seconds
+                                      lognormal:S    multiplies by a lognormal factor with sigma S (median unchanged)
+                                      pareto:A       multiplies by a Pareto factor >= 1 with shape A (heavy tail)
+    BENCH_SHAPE_STREAM_BANDWIDTH  MB/s of every single request
+    BENCH_SHAPE_BANDWIDTH         MB/s of all requests of the process together
+    BENCH_SHAPE_SEED              seed of the latency samples (default: random)
+
+Every get, get_bytes, put, put_bytes, read_range, open, size, version and list call is one
+request. Large objects are transferred in parallel ranges or parts as billibench.transfer splits
+them, each range a request and stream of its own, so the per-stream cap limits single-stream
+transfers and the aggregate cap limits all of them. Bandwidth is enforced with token buckets, in
+CHUNK-sized steps so concurrent streams share the aggregate cap. The payload cache sits on top of the
+shaped backend: a hit transfers nothing, but its version check is a metadata request that pays the
+latency (unless BENCH_CACHE_TTL trusts a recently checked version, see billibench.cache).
+
+The shaping settings and the requests, bytes and injected delay since the last reset_stats() are
+reported by config() and stats(); the runner stores both in the "shaping" field of every record:
+
+    BENCH_STORAGE=local BENCH_SHAPE_LATENCY=0.03 BENCH_SHAPE_JITTER=lognormal:0.5 \\
+        BENCH_SHAPE_STREAM_BANDWIDTH=60 BENCH_SHAPE_BANDWIDTH=200 \\
+        python -m billibench.runner --functions Func11_get,Func19_join --sizes large
+"""
+
+import io
+import os
+import math
+import time
+import random
+import threading
+import concurrent.futures
+
+from billibench import transfer
+
+MB = 1 << 20
+
+# Bytes taken from the token buckets at a time
+CHUNK = 256 << 10
+
+JITTERS = ["uniform", "exponential", "lognormal", "pareto"]
+
+# Aggregate token buckets of this process, keyed by rate
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+_random = random.Random()
+_random_seed = None
+_random_lock = threading.Lock()
+
+_stats = {"requests": 0, "bytes": 0, "latency_time": 0.0, "throttle_time": 0.0}
+_stats_lock = threading.Lock()
+
+
+def _float(name):
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+def parse_jitter(value):
+    """Parse KIND:PARAM into (kind, param), or return None for no jitter."""
+    if not value or value == "none":
+        return None
+    kind, _, param = value.partition(":")
+    if kind not in JITTERS or not param:
+        raise ValueError(f"Invalid BENCH_SHAPE_JITTER: {value} (expected one of {', '.join(JITTERS)} as KIND:PARAM)")
+    return kind, float(param)
+
+
+def config():
+    """Return the shaping settings from the environment, bandwidths in MB/s."""
+    jitter = parse_jitter(os.getenv("BENCH_SHAPE_JITTER"))
+    seed = os.getenv("BENCH_SHAPE_SEED")
+    return {
+        "latency": _float("BENCH_SHAPE_LATENCY") or 0.0,
+        "jitter": f"{jitter[0]}:{jitter[1]:g}" if jitter else None,
+        "stream_bandwidth": _float("BENCH_SHAPE_STREAM_BANDWIDTH"),
+        "bandwidth": _float("BENCH_SHAPE_BANDWIDTH"),
+        "seed": int(seed) if seed else None,
+    }
+
+
+def enabled():
+    """Return True when any latency or bandwidth shaping is configured."""
+    settings = config()
+    return bool(settings["latency"] or settings["jitter"] or settings["stream_bandwidth"] or settings["bandwidth"])
+
+
+def _count(**counts):
+    with _stats_lock:
+        for name, value in counts.items():
+            _stats[name] += value
+
+
+def reset_stats():
+    """Reset the request and delay counters."""
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0.0 if name.endswith("_time") else 0
+
+
+def stats():
+    """Return the requests, bytes and injected delay since the last reset_stats()."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def sample_latency(latency, jitter=None, seed=None):
+    """Return one first-byte latency in seconds."""
+    global _random_seed
+    with _random_lock:
+        if seed != _random_seed:
+            _random.seed(seed)
+            _random_seed = seed
+        if jitter is None:
+            return latency
+        kind, param = jitter
+        if kind == "uniform":
+            return latency + _random.uniform(0, param)
+        if kind == "exponential":
+            return latency + _random.expovariate(1 / param)
+        if kind == "lognormal":
+            return latency * math.exp(_random.gauss(0, param))
+        return latency * _random.paretovariate(param)
+
+
+class TokenBucket:
+    """Rate limiter that hands out reservations; waiting callers are served in the order they asked."""
+
+    def __init__(self, rate, burst=CHUNK, tokens=None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst if tokens is None else tokens
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount):
+        """Take amount tokens and return the seconds to wait until they are available."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+def aggregate_bucket(rate):
+    """Return the process-wide token bucket for an aggregate rate in bytes/s."""
+    with _buckets_lock:
+        if rate not in _buckets:
+            _buckets[rate] = TokenBucket(rate)
+        return _buckets[rate]
+
+
+class _ShapedStream(io.RawIOBase):
+    """Readable stream that paces reads like one request."""
+
+    def __init__(self, stream, pacer):
+        self.stream = stream
+        self.pacer = pacer
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.stream.read(len(buffer))
+        buffer[:len(data)] = data
+        self.pacer(len(data))
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.stream.close()
+        super().close()
+
+
+class ShapedBackend:
+    """Storage backend wrapper that adds first-byte latency and bandwidth limits to every request."""
+
+    def __init__(self, backend, settings):
+        self.backend = backend
+        self.name = backend.name
+        self.settings = settings
+        self.jitter = parse_jitter(settings["jitter"])
+        self.stream_rate = settings["stream_bandwidth"] * MB if settings["stream_bandwidth"] else None
+        self.bucket = aggregate_bucket(settings["bandwidth"] * MB) if settings["bandwidth"] else None
+
+    def __getattr__(self, attr):
+        return getattr(self.backend, attr)
+
+    def _request(self):
+        """Wait for the first byte of a request."""
+        delay = sample_latency(self.settings["latency"], self.jitter, self.settings["seed"])
+        if delay > 0:
+            time.sleep(delay)
+        _count(requests=1, latency_time=delay)
+
+    def pacer(self):
+        """Return a function that blocks until n more bytes of one stream may have been transferred."""
+        # the stream starts without tokens, so its first chunk already takes CHUNK / rate
+        buckets = [bucket for bucket in (TokenBucket(self.stream_rate, tokens=0) if self.stream_rate else None,
+                                         self.bucket) if bucket]
+
+        def pace(n):
+            throttled = 0.0
+            for start in range(0, n if buckets else 0, CHUNK):
+                size = min(CHUNK, n - start)
+                # wait for the slower of the two caps
+                delay = max(bucket.reserve(size) for bucket in buckets)
+                if delay > 0:
+                    time.sleep(delay)
+                    throttled += delay
+            _count(bytes=n, throttle_time=throttled)
+
+        return pace
+
+    def _stream(self, n):
+        """Transfer n bytes as one request."""
+        self._request()
+        self.pacer()(n)
+
+    def _streams(self, size, threads, part_size):
+        """Transfer size bytes as concurrent requests of part_size bytes."""
+        parts = transfer.ranges(size, part_size)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as pool:
+            for future in [pool.submit(self._stream, end - start) for start, end in parts]:
+                future.result()
+
+    def get(self, key, path, chunk_size=None):
+        """
+        Download an object to a local file. The backend does the download (GCS pins the generation
+        of its ranges); a large object is then shaped as the metadata request plus one stream per
+        range, as GCSBackend.get issues them.
+        """
+        self._request()
+        self.backend.get(key, path, chunk_size=chunk_size)
+        size = os.path.getsize(path)
+        if transfer.use_ranges(size):
+            self._streams(size, transfer.download_threads(), transfer.download_part_size())
+        else:
+            self.pacer()(size)
+
+    def get_bytes(self, key):
+        """Download an object into memory."""
+        self._request()
+        data = self.backend.get_bytes(key)
+        self.pacer()(len(data))
+        return data
+
+    def put(self, key, path, chunk_size=None):
+        """Upload a local file; large files are shaped as parallel parts."""
+        size = os.path.getsize(path)
+        if transfer.use_parts(size):
+            self._streams(size, transfer.upload_threads(), transfer.upload_part_size())
+        else:
+            self._stream(size)
+        self.backend.put(key, path, chunk_size=chunk_size)
+
+    def put_bytes(self, key, data):
+        """Upload a str or bytes object."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self._stream(len(data))
+        self.backend.put_bytes(key, data)
+
+    def open(self, key):
+        """Open an object as a readable binary stream whose reads are paced."""
+        self._request()
+        return io.BufferedReader(_ShapedStream(self.backend.open(key), self.pacer()), buffer_size=CHUNK)
+
+    def read_range(self, key, start, end):
+        """Read bytes [start, end) of an object."""
+        self._request()
+        data = self.backend.read_range(key, start, end)
+        self.pacer()(len(data))
+        return data
+
+    def size(self, key):
+        """Return the size of an object in bytes."""
+        self._request()
+        return self.backend.size(key)
+
+    def list(self, prefix=""):
+        """Return the sorted keys starting with prefix."""
+        self._request()
+        return self.backend.list(prefix)
+
+    def version(self, key):
+        """Return the version string of an object."""
+        self._request()
+        return self.backend.version(key)
@@ -0,0 +1,359 @@
+"""
+Storage backends for function payloads and results.
+
+Objects are addressed by bucket keys such as "Func0_compile/payload_small.zip". The backend is
+selected with the BENCH_STORAGE environment variable:
+    gcs   (default) Google Cloud Storage bucket GCP_BUCKET in project GCP_PROJECT
+    local directory BENCH_STORAGE_ROOT (default: $BENCH_HOME/Bucket) mirroring the bucket key layout
+
+The backend (and for GCS the client and bucket handle) is created on the first initialize_storage()
+call and reused by later invocations in the same process. Set BENCH_STORAGE_CACHE=0 to build a new
+one on every call, so cold and warm storage setup cost can be measured separately.
+
+With BENCH_CACHE=1 downloads are served from an on-host payload cache (see billibench.cache).
+Large GCS objects are downloaded in parallel byte ranges, and large files are uploaded in parallel
+parts (see billibench.transfer). With BENCH_SHAPE_* set, every request gets the first-byte latency
+and bandwidth of a remote object store (see billibench.shaping). set_backend() installs a backend
+that wraps the configured one, as the workflow runner does to keep intermediate objects local (see
+billibench.workflow).
+"""
+
+import os
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+
+from billibench import cache, shaping, trace, transfer
+
+DEFAULT_BACKEND = "gcs"
+
+# Most source objects a single GCS compose request accepts
+MAX_COMPOSE = 32
+
+# Backends created so far in this process, keyed by their configuration
+_backends = {}
+_backends_lock = threading.Lock()
+
+# Storage setups performed since the last reset_setup_stats()
+_setup_stats = []
+
+# Backend installed with set_backend(), returned by initialize_storage() instead of the configured one
+_override = None
+
+
+class GCSBackend:
+    """Objects stored in a Google Cloud Storage bucket."""
+
+    name = "gcs"
+
+    def __init__(self, project_id, bucket_name):
+        from google.cloud import storage
+
+        self.client = storage.Client(project=project_id)
+        self.bucket = self.client.get_bucket(bucket_name)
+
+    def _blob(self, key, chunk_size=None):
+        blob = self.bucket.blob(key)
+        if chunk_size:
+            blob.chunk_size = chunk_size
+        return blob
+
+    def get(self, key, path, chunk_size=None):
+        """
+        Download an object to a local file, in parallel ranges when it is large.
+
+        The first range is requested without a metadata lookup, so an object smaller than one range
+        arrives whole in a single request. Only a full first range costs a get_blob call for the
+        object size; the rest is then downloaded in parallel ranges.
+        """
+        from google.api_core import exceptions
+
+        blob = self._blob(key, chunk_size)
+        part_size = transfer.download_part_size()
+        try:
+            if transfer.download_threads() == 1:
+                blob.download_to_filename(path)
+                trace.add_bytes(os.path.getsize(path))
+                return
+            first = blob.download_as_bytes(start=0, end=part_size - 1)
+        except exceptions.NotFound:
+            raise FileNotFoundError(key)
+        except exceptions.RequestRangeNotSatisfiable:
+            # an empty object has no first byte to return
+            first = b""
+
+        size = len(first)
+        if size == part_size:
+            # pin the generation the first range was read from, so every range reads the same version
+            blob = self.bucket.get_blob(key, generation=blob.generation)
+            if blob is None:
+                raise FileNotFoundError(key)
+            size = blob.size
+        if transfer.use_ranges(size, part_size=part_size):
+            def fetch(start, end):
+                return first if start == 0 else blob.download_as_bytes(start=start, end=end - 1)
+
+            transfer.download(fetch, size, path, part_size=part_size)
+        else:
+            with open(path, "wb") as f:
+                f.write(first)
+        trace.add_bytes(size)
+
+    def get_bytes(self, key):
+        """Download an object into memory."""
+        data = self._blob(key).download_as_bytes()
+        trace.add_bytes(len(data))
+        return data
+
+    def put(self, key, path, chunk_size=None):
+        """Upload a local file, in parallel parts composed server-side when it is large."""
+        size = os.path.getsize(path)
+        if transfer.use_parts(size):
+            self._put_parts(key, path)
+        else:
+            self._blob(key, chunk_size).upload_from_filename(path)
+        trace.add_bytes(size)
+
+    def _put_parts(self, key, path):
+        prefix = f"{key}.parts-{uuid.uuid4().hex}/"
+        try:
+            count = transfer.upload(
+                lambda index, data: self.bucket.blob(f"{prefix}{index:06d}").upload_from_string(data), path)
+            sources = [self.bucket.blob(f"{prefix}{index:06d}") for index in range(count)]
+            # compose accepts at most MAX_COMPOSE sources, so compose larger uploads in levels
+            level = 0
+            while len(sources) > MAX_COMPOSE:
+                groups = [sources[i:i + MAX_COMPOSE] for i in range(0, len(sources), MAX_COMPOSE)]
+                sources = []
+                for index, group in enumerate(groups):
+                    blob = self.bucket.blob(f"{prefix}compose-{level}-{index:06d}")
+                    blob.compose(group)
+                    sources.append(blob)
+                level += 1
+            self.bucket.blob(key).compose(sources)
+        finally:
+            for blob in self.client.list_blobs(self.bucket, prefix=prefix):
+                try:
+                    blob.delete()
+                except Exception as e:
+                    print(f"Failed to delete upload part {blob.name}: {e}")
+
+    def put_bytes(self, key, data):
+        """Upload a str or bytes object."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self._blob(key).upload_from_string(data)
+        trace.add_bytes(len(data))
+
+    def open(self, key):
+        """Open an object as a readable binary stream."""
+        return self._blob(key).open("rb")
+
+    def read_range(self, key, start, end):
+        """Read bytes [start, end) of an object."""
+        data = self._blob(key).download_as_bytes(start=start, end=end - 1)
+        trace.add_bytes(len(data))
+        return data
+
+    def size(self, key):
+        """Return the size of an object in bytes."""
+        blob = self.bucket.get_blob(key)
+        if blob is None:
+            raise FileNotFoundError(key)
+        return blob.size
+
+    def list(self, prefix=""):
+        """Return the sorted keys starting with prefix."""
+        return sorted(blob.name for blob in self.client.list_blobs(self.bucket, prefix=prefix))
+
+    def version(self, key):
+        """Return a string that changes whenever the object is rewritten (generation and etag)."""
+        blob = self.bucket.get_blob(key)
+        if blob is None:
+            raise FileNotFoundError(key)
+        return f"{blob.generation}-{blob.etag}"
+
+
+class LocalBackend:
+    """Objects stored as files under a local directory that mirrors the bucket key layout."""
+
+    name = "local"
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key):
+        path = os.path.normpath(os.path.join(self.root, key))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise ValueError(f"Key escapes the storage root: {key}")
+        return path
+
+    def _target(self, key):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def get(self, key, path, chunk_size=None):
+        """Copy an object to a local file."""
+        shutil.copyfile(self._path(key), path)
+        trace.add_bytes(os.path.getsize(path))
+
+    def get_bytes(self, key):
+        """Read an object into memory."""
+        with open(self._path(key), "rb") as f:
+            data = f.read()
+        trace.add_bytes(len(data))
+        return data
+
+    def put(self, key, path, chunk_size=None):
+        """Copy a local file into the store, in parallel parts when it is large."""
+        size = os.path.getsize(path)
+        if transfer.use_parts(size):
+            self._put_parts(key, path)
+        else:
+            shutil.copyfile(path, self._target(key))
+        trace.add_bytes(size)
+
+    def _put_parts(self, key, path):
+        target = self._target(key)
+        part_size = transfer.upload_part_size()
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".")
+        try:
+            try:
+                os.fchmod(fd, 0o644)
+                transfer.upload(lambda index, data: os.pwrite(fd, data, index * part_size), path, part_size=part_size)
+            finally:
+                os.close(fd)
+            # the object appears only once every part is in place
+            os.replace(tmp_path, target)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def put_bytes(self, key, data):
+        """Write a str or bytes object into the store."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        with open(self._target(key), "wb") as f:
+            f.write(data)
+        trace.add_bytes(len(data))
+
+    def open(self, key):
+        """Open an object as a readable binary stream."""
+        return open(self._path(key), "rb")
+
+    def read_range(self, key, start, end):
+        """Read bytes [start, end) of an object."""
+        with open(self._path(key), "rb") as f:
+            f.seek(start)
+            data = f.read(end - start)
+        trace.add_bytes(len(data))
+        return data
+
+    def size(self, key):
+        """Return the size of an object in bytes."""
+        return os.path.getsize(self._path(key))
+
+    def list(self, prefix=""):
+        """Return the sorted keys starting with prefix."""
+        keys = []
+        for root, _, files in os.walk(self.root):
+            for f in files:
+                key = os.path.relpath(os.path.join(root, f), self.root).replace(os.sep, "/")
+                if key.startswith(prefix):
+                    keys.append(key)
+        return sorted(keys)
+
+    def version(self, key):
+        """Return a string that changes whenever the object is rewritten (size and mtime)."""
+        st = os.stat(self._path(key))
+        return f"{st.st_size}-{st.st_mtime_ns}"
+
+
+def create_storage(backend):
+    """Create a new storage backend from the environment."""
+    if backend == "gcs":
+        project_id = os.getenv("GCP_PROJECT")
+        bucket_name = os.getenv("GCP_BUCKET")
+        if not project_id or not bucket_name:
+            raise EnvironmentError("Required environment variables (GCP_PROJECT, GCP_BUCKET) are not set.")
+        return GCSBackend(project_id, bucket_name)
+
+    if backend == "local":
+        return LocalBackend(local_root())
+
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+def local_root():
+    """Return the directory used by the local backend."""
+    root = os.getenv("BENCH_STORAGE_ROOT")
+    if not root:
+        if not os.getenv("BENCH_HOME"):
+            raise EnvironmentError("Required environment variable (BENCH_STORAGE_ROOT or BENCH_HOME) is not set.")
+        root = os.path.join(os.getenv("BENCH_HOME"), "Bucket")
+    return root
+
+
+def storage_config():
+    """Return the (backend, location) pair that identifies the configured storage."""
+    backend = os.getenv("BENCH_STORAGE", DEFAULT_BACKEND)
+    if backend == "gcs":
+        return backend, f"{os.getenv('GCP_PROJECT')}/{os.getenv('GCP_BUCKET')}"
+    if backend == "local":
+        return backend, local_root()
+    return backend, None
+
+
+def initialize_storage():
+    """Return the storage backend selected by BENCH_STORAGE, reusing the process-wide one when cached."""
+    start = time.perf_counter()
+    if _override is not None:
+        _setup_stats.append({"backend": "override", "cached": True, "setup_time": time.perf_counter() - start})
+        return _override
+    config = storage_config()
+    cached = os.getenv("BENCH_STORAGE_CACHE", "1") != "0"
+
+    if not cached:
+        bucket = create_storage(config[0])
+        reused = False
+    else:
+        with _backends_lock:
+            bucket = _backends.get(config)
+            reused = bucket is not None
+            if not reused:
+                bucket = create_storage(config[0])
+                _backends[config] = bucket
+
+    if shaping.enabled():
+        bucket = shaping.ShapedBackend(bucket, shaping.config())
+    if cache.enabled():
+        bucket = cache.CachingBackend(bucket, cache.get_cache(), config[1])
+
+    _setup_stats.append({"backend": config[0], "cached": reused, "setup_time": time.perf_counter() - start})
+    return bucket
+
+
+def set_backend(backend):
+    """Make initialize_storage() return backend in this process, or the configured backend again for None."""
+    global _override
+    _override = backend
+
+
+def reset_setup_stats():
+    """Forget the recorded storage setups."""
+    del _setup_stats[:]
+
+
+def setup_stats():
+    """Return the storage setups recorded since the last reset_setup_stats()."""
+    return list(_setup_stats)
+
+
+def clear_cache():
+    """Drop the process-wide backends so the next initialize_storage() starts cold."""
+    with _backends_lock:
+        _backends.clear()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Phase-level timing for handlers.
+
+Handlers wrap each step in a named phase:
+
+    with trace.phase("download"):
+        bucket.get(key, path)
+
+Storage operations add the bytes they move to the innermost open phase. The runner stores the
+phases of every invocation in its results file, and this module converts them to Chrome
+trace-event JSON (chrome://tracing, Perfetto):
+
+    python -m billibench.trace results.jsonl --output trace.json
+"""
+
+import sys
+import json
+import time
+import argparse
+import threading
+from contextlib import contextmanager
+
+# Finished spans of the current invocation
+_spans = []
+# Open spans of all threads, innermost last
+_open = []
+_lock = threading.Lock()
+
+
+@contextmanager
+def phase(name, **args):
+    """Record a named span around a block of handler code."""
+    span = {"name": name, "start": time.perf_counter(), "end": None, "bytes": 0,
+            "thread": threading.current_thread().name, "tid": threading.get_ident()}
+    if args:
+        span["args"] = args
+    with _lock:
+        _open.append(span)
+    try:
+        yield span
+    finally:
+        span["end"] = time.perf_counter()
+        with _lock:
+            _open.remove(span)
+            _spans.append(span)
+
+
+def add_bytes(n):
+    """Charge n bytes moved to the innermost open phase of this thread (or of any thread)."""
+    tid = threading.get_ident()
+    with _lock:
+        for span in reversed(_open):
+            if span["tid"] == tid:
+                span["bytes"] += n
+                return
+        if _open:
+            _open[-1]["bytes"] += n
+
+
+def reset():
+    """Forget all recorded spans."""
+    with _lock:
+        del _spans[:]
+
+
+def collect(origin):
+    """Return the finished spans with start/end in seconds relative to origin (a perf_counter value)."""
+    with _lock:
+        spans = sorted(_spans, key=lambda span: span["start"])
+    phases = []
+    for span in spans:
+        entry = dict(span, start=span["start"] - origin, end=span["end"] - origin)
+        entry.pop("tid")
+        phases.append(entry)
+    return phases
+
+
+def to_chrome_trace(records):
+    """Convert runner records with a "phases" field to a Chrome trace-event document."""
+    events = []
+    for pid, record in enumerate(records):
+        label = f"{record['function']} {record['size']} #{record.get('repetition', 0)}"
+        events.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": label}})
+        threads = {}
+        if record.get("wall_time") is not None:
+            events.append({"name": "invocation", "ph": "X", "pid": pid, "tid": 0, "ts": 0,
+                           "dur": record["wall_time"] * 1e6, "args": {"status": record.get("status")}})
+        for span in record.get("phases", []):
+            tid = threads.setdefault(span["thread"], len(threads))
+            args = dict(span.get("args", {}), bytes=span["bytes"])
+            events.append({"name": span["name"], "ph": "X", "pid": pid, "tid": tid, "ts": span["start"] * 1e6,
+                           "dur": (span["end"] - span["start"]) * 1e6, "args": args})
+        for thread, tid in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread}})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def main(argv=None):
+    """Convert a runner results file to Chrome trace-event JSON."""
+    parser = argparse.ArgumentParser(description="Export handler phases as Chrome trace-event JSON.")
+    parser.add_argument("results", help="JSON lines results file written by billibench.runner")
+    parser.add_argument("--output", default="trace.json", help="trace file to write")
+    args = parser.parse_args(argv)
+
+    with open(args.results, "r") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    with open(args.output, "w") as f:
+        json.dump(to_chrome_trace(records), f)
+    print(f"Wrote {len(records)} invocations to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
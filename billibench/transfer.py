@@ -0,0 +1,162 @@
+"""
+Parallel ranged transfers for large objects.
+
+download() splits an object into byte ranges of BENCH_DOWNLOAD_PART_SIZE MB (default 64) and fetches
+them with up to BENCH_DOWNLOAD_THREADS concurrent requests (default 8). Each range is written into
+place with pwrite() in a file preallocated to the full object size, so ranges can complete in any
+order and the file is never copied. A failed range is retried up to BENCH_DOWNLOAD_RETRIES times
+(default 3) with exponential backoff without restarting the rest of the download.
+
+upload() is the reverse: parts of BENCH_UPLOAD_PART_SIZE MB (default 64) are read with pread() and
+handed to the backend by up to BENCH_UPLOAD_THREADS concurrent uploads (default 8), each retried up
+to BENCH_UPLOAD_RETRIES times. The backend then assembles the parts (GCS compose, or a file
+rename for the local backend).
+
+Objects that fit in a single part, or any object when the thread count is 1, are left to the
+backend's single-stream transfer.
+"""
+
+import os
+import time
+import concurrent.futures
+
+MB = 1 << 20
+
+DEFAULT_THREADS = 8
+DEFAULT_PART_SIZE = 64 * MB
+DEFAULT_RETRIES = 3
+
+
+def download_threads():
+    """Return the number of concurrent range requests per download."""
+    return max(1, int(os.getenv("BENCH_DOWNLOAD_THREADS", DEFAULT_THREADS)))
+
+
+def download_part_size():
+    """Return the size of one range in bytes."""
+    part_size = os.getenv("BENCH_DOWNLOAD_PART_SIZE")
+    return int(float(part_size) * MB) if part_size else DEFAULT_PART_SIZE
+
+
+def upload_threads():
+    """Return the number of concurrent part uploads per upload."""
+    return max(1, int(os.getenv("BENCH_UPLOAD_THREADS", DEFAULT_THREADS)))
+
+
+def upload_part_size():
+    """Return the size of one upload part in bytes."""
+    part_size = os.getenv("BENCH_UPLOAD_PART_SIZE")
+    return int(float(part_size) * MB) if part_size else DEFAULT_PART_SIZE
+
+
+def use_ranges(size, threads=None, part_size=None):
+    """Return True when an object of this size is worth downloading in parallel ranges."""
+    threads = threads or download_threads()
+    part_size = part_size or download_part_size()
+    return threads > 1 and size > part_size
+
+
+def use_parts(size, threads=None, part_size=None):
+    """Return True when a file of this size is worth uploading in parallel parts."""
+    threads = threads or upload_threads()
+    part_size = part_size or upload_part_size()
+    return threads > 1 and size > part_size
+
+
+def ranges(size, part_size):
+    """Split [0, size) into [start, end) ranges of part_size bytes."""
+    return [(start, min(start + part_size, size)) for start in range(0, size, part_size)]
+
+
+def _retry(call, retries):
+    """Call call() until it succeeds, at most retries + 1 times, with exponential backoff."""
+    for attempt in range(retries + 1):
+        try:
+            return call()
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(0.1 * 2 ** attempt)
+
+
+def _run_parts(threads, task, parts):
+    """Run task(*part) for every part on a thread pool, cancelling the rest on the first failure."""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [pool.submit(task, *part) for part in parts]
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                future.result()
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def _checked_fetch(fetch, start, end):
+    data = fetch(start, end)
+    if len(data) != end - start:
+        raise IOError(f"Short read for bytes {start}-{end}: got {len(data)}")
+    return data
+
+
+def _fetch_range(fetch, fd, start, end, retries):
+    data = _retry(lambda: _checked_fetch(fetch, start, end), retries)
+    view = memoryview(data)
+    offset = start
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+    return end - start
+
+
+def download(fetch, size, path, threads=None, part_size=None, retries=None):
+    """
+    Download an object of size bytes into path with concurrent range requests.
+    fetch(start, end) returns bytes [start, end) of the object.
+    """
+    threads = threads or download_threads()
+    part_size = part_size or download_part_size()
+    retries = int(os.getenv("BENCH_DOWNLOAD_RETRIES", DEFAULT_RETRIES)) if retries is None else retries
+
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        try:
+            os.posix_fallocate(fd, 0, size)
+        except (AttributeError, OSError):
+            # not supported by the platform or the file system
+            os.ftruncate(fd, size)
+
+        _run_parts(threads, lambda start, end: _fetch_range(fetch, fd, start, end, retries), ranges(size, part_size))
+    except BaseException:
+        os.close(fd)
+        os.unlink(path)
+        raise
+    os.close(fd)
+    return size
+
+
+def _put_part(put_part, fd, index, start, end, retries):
+    data = os.pread(fd, end - start, start)
+    if len(data) != end - start:
+        raise IOError(f"Short read for bytes {start}-{end}: got {len(data)}")
+    _retry(lambda: put_part(index, data), retries)
+    return end - start
+
+
+def upload(put_part, path, threads=None, part_size=None, retries=None):
+    """
+    Upload the file at path in parts with concurrent requests and return the number of parts.
+    put_part(index, data) uploads part index; the caller assembles the parts in index order.
+    """
+    threads = threads or upload_threads()
+    part_size = part_size or upload_part_size()
+    retries = int(os.getenv("BENCH_UPLOAD_RETRIES", DEFAULT_RETRIES)) if retries is None else retries
+
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        parts = [(index, start, end) for index, (start, end) in enumerate(ranges(os.fstat(fd).st_size, part_size))]
+        _run_parts(threads, lambda index, start, end: _put_part(put_part, fd, index, start, end, retries), parts)
+    finally:
+        os.close(fd)
+    return len(parts)
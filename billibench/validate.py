@@ -0,0 +1,381 @@
+"""
+Output validation.
+
+A handler that returns 0 is not necessarily a handler that worked: several of them run external
+tools whose exit codes are ignored, so a fast run may just be a broken run. After every invocation
+the runner checks the function's outputs in the bucket:
+
+    - every output object was rewritten by this invocation (its version changed) and is not empty
+    - a per-function check of the content, e.g. the Func8 output is sorted, the Func19 join has one
+      row per key, the Func3 y4m has one frame per input PNG
+
+The checks stream the outputs or read only the bytes they need (headers, zip central directories),
+so they stay cheap next to the invocation. The expected counts come from the inputs themselves or
+from the dataset manifest. An invocation that fails validation is recorded with status "invalid".
+"""
+
+import io
+import ast
+import time
+import struct
+import zipfile
+
+from billibench import manifest
+
+# Output keys of every function, formatted with the event fields
+OUTPUTS = {
+    "Func0_compile": ["Func0_compile/output.o"],
+    "Func1_ar": ["Func1_ar/output.a"],
+    "Func2_test": ["Func2_test/output_{size}.txt"],
+    "Func3_png2y4m": ["Func3_png2y4m/{size}.y4m"],
+    "Func4_xc_dump": ["Func4_xc_dump/{size}.state", "Func4_xc_dump/{size}.ivf"],
+    "Func5_xc_enc": ["Func5_xc_enc/output.ivf"],
+    "Func6_partition": [f"Func6_partition/{{size}}/{i}.npy" for i in range(100)],
+    "Func7_sample": ["Func7_sample/{size}_result.txt"],
+    "Func8_mergesort": ["Func8_mergesort/{size}/{size}_sorted.npy"],
+    "Func9_UploadReview": ["Func9_UploadReview/{key}"],
+    "Func10_dynamicHtml": ["Func10_dynamicHtml/output_{size}.html"],
+    "Func14_knn": ["Func14_knn/{size}_knn_model.pkl"],
+    "Func15_linearReg": ["Func15_linearReg/{size}_linearReg_model.pkl"],
+    "Func16_logisticReg": ["Func16_logisticReg/{size}_logisticReg_model.pkl"],
+    "Func17_SVC": ["Func17_SVC/{size}_SVC_model.pkl"],
+    "Func18_kmeans": ["Func18_kmeans/{size}_kmeans_model.pkl"],
+    "Func19_join": ["Func19_join/{size}_join_result.csv"],
+    "Func20_select": ["Func20_select/{size}_select_result.csv"],
+    "Func21_groupby": ["Func21_groupby/{size}_groupby_result.csv"],
+}
+
+READ_SIZE = 8 << 20
+
+# Content checks, registered with @validator
+VALIDATORS = {}
+
+
+class ValidationError(Exception):
+    """An output does not look like the result of a successful invocation."""
+
+
+def validator(func_name):
+    """Register a content check, called as check(bucket, event) after the generic checks pass."""
+    def register(check):
+        VALIDATORS[func_name] = check
+        return check
+    return register
+
+
+def outputs(func_name, event):
+    """Return the output keys of one invocation."""
+    return [template.format(**event) for template in OUTPUTS.get(func_name, [])]
+
+
+def _version(bucket, key):
+    try:
+        return bucket.version(key)
+    except FileNotFoundError:
+        return None
+
+
+def snapshot(bucket, func_name, event):
+    """Return the versions of the outputs before an invocation, so stale outputs can be detected."""
+    return {key: _version(bucket, key) for key in outputs(func_name, event)}
+
+
+def check(bucket, func_name, event, before):
+    """Validate the outputs of an invocation. Returns {"valid", "reason", "time"}."""
+    start = time.perf_counter()
+    try:
+        for key, version in before.items():
+            after = _version(bucket, key)
+            if after is None:
+                raise ValidationError(f"{key} was not written")
+            if after == version:
+                raise ValidationError(f"{key} was not rewritten by this invocation")
+            if bucket.size(key) == 0:
+                raise ValidationError(f"{key} is empty")
+        if func_name in VALIDATORS:
+            VALIDATORS[func_name](bucket, event)
+        result = {"valid": True, "reason": None}
+    except ValidationError as e:
+        result = {"valid": False, "reason": str(e)}
+    except Exception as e:
+        result = {"valid": False, "reason": f"validator failed: {type(e).__name__}: {e}"}
+    result["time"] = time.perf_counter() - start
+    return result
+
+
+class RangeFile(io.RawIOBase):
+    """Seekable read-only file over an object, read with range requests."""
+
+    def __init__(self, bucket, key):
+        self.bucket = bucket
+        self.key = key
+        self.length = bucket.size(key)
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.length}[whence]
+        self.position = max(0, base + offset)
+        return self.position
+
+    def readinto(self, buffer):
+        end = min(self.position + len(buffer), self.length)
+        if end <= self.position:
+            return 0
+        data = self.bucket.read_range(self.key, self.position, end)
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+def zip_members(bucket, key, suffix):
+    """Count the members of a zip object ending with suffix, reading only its central directory."""
+    with zipfile.ZipFile(io.BufferedReader(RangeFile(bucket, key), 1 << 16)) as archive:
+        return sum(1 for name in archive.namelist() if name.endswith(suffix))
+
+
+def _read_exact(stream, n):
+    data = b""
+    while len(data) < n:
+        chunk = stream.read(n - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def _skip(stream, n):
+    while n > 0:
+        chunk = stream.read(min(n, READ_SIZE))
+        if not chunk:
+            raise ValidationError("Output is truncated")
+        n -= len(chunk)
+
+
+def _manifest_size(bucket, func_name, size):
+    """Return the manifest entry of a size, or None when the dataset has no manifest."""
+    recorded = manifest.load(bucket, func_name)
+    return recorded["sizes"].get(size) if recorded else None
+
+
+@validator("Func0_compile")
+def check_compile(bucket, event):
+    """The object file is an ELF file."""
+    if bucket.read_range("Func0_compile/output.o", 0, 4) != b"\x7fELF":
+        raise ValidationError("output.o is not an ELF object")
+
+
+@validator("Func1_ar")
+def check_ar(bucket, event):
+    """The archive holds one member per object file in the payload."""
+    expected = zip_members(bucket, f"Func1_ar/payload_{event['size']}.zip", ".o")
+    members = 0
+    with bucket.open("Func1_ar/output.a") as stream:
+        if _read_exact(stream, 8) != b"!<arch>\n":
+            raise ValidationError("output.a is not an ar archive")
+        while True:
+            header = _read_exact(stream, 60)
+            if not header:
+                break
+            if len(header) < 60 or header[58:60] != b"`\n":
+                raise ValidationError("output.a has a corrupt member header")
+            size = int(header[48:58])
+            # symbol and long name tables
+            if header[:16].rstrip() not in (b"/", b"//", b"/SYM64/"):
+                members += 1
+            _skip(stream, size + size % 2)
+    if members != expected:
+        raise ValidationError(f"output.a has {members} members, expected {expected}")
+
+
+@validator("Func2_test")
+def check_test(bucket, event):
+    """gtest-parallel did not report failed tests."""
+    with bucket.open(f"Func2_test/output_{event['size']}.txt") as stream:
+        for line in io.TextIOWrapper(stream, errors="replace"):
+            if line.startswith("FAILED TESTS"):
+                raise ValidationError(line.strip())
+
+
+def y4m_frame_size(header):
+    """Return the size in bytes of one frame described by a y4m stream header."""
+    fields = {token[:1]: token[1:] for token in header.split()[1:]}
+    width, height = int(fields["W"]), int(fields["H"])
+    colorspace = fields.get("C", "420jpeg")
+    if colorspace.startswith("mono"):
+        planes = 1
+    elif colorspace.startswith("444alpha"):
+        planes = 4
+    elif colorspace.startswith("444"):
+        planes = 3
+    elif colorspace.startswith("422"):
+        planes = 2
+    else:
+        planes = 1.5
+    depth = 2 if "p1" in colorspace else 1
+    return int(width * height * planes * depth)
+
+
+@validator("Func3_png2y4m")
+def check_y4m(bucket, event):
+    """The y4m stream has one frame per PNG in the payload."""
+    key = f"Func3_png2y4m/{event['size']}.y4m"
+    head = bucket.read_range(key, 0, min(4096, bucket.size(key)))
+    if not head.startswith(b"YUV4MPEG2 ") or b"\n" not in head:
+        raise ValidationError(f"{key} is not a y4m stream")
+    header = head[:head.index(b"\n")].decode()
+    # frames are FRAME headers without parameters followed by the planes
+    record = len(b"FRAME\n") + y4m_frame_size(header)
+    body = bucket.size(key) - len(header) - 1
+    if body % record or head[len(header) + 1:len(header) + 7] != b"FRAME\n":
+        raise ValidationError(f"{key} has a truncated or malformed frame")
+    frames = body // record
+    expected = zip_members(bucket, f"Func3_png2y4m/payload_{event['size']}.zip", ".png")
+    if frames != expected:
+        raise ValidationError(f"{key} has {frames} frames, expected {expected}")
+
+
+def ivf_frames(bucket, key):
+    """Return the frame count in the header of an IVF file."""
+    header = bucket.read_range(key, 0, 32)
+    if header[:4] != b"DKIF":
+        raise ValidationError(f"{key} is not an IVF file")
+    return struct.unpack("<I", header[24:28])[0]
+
+
+@validator("Func4_xc_dump")
+def check_xc_dump(bucket, event):
+    """vpxenc produced frames."""
+    if ivf_frames(bucket, f"Func4_xc_dump/{event['size']}.ivf") == 0:
+        raise ValidationError("vpxenc produced no frames")
+
+
+@validator("Func5_xc_enc")
+def check_xc_enc(bucket, event):
+    """xc-enc produced frames."""
+    if ivf_frames(bucket, "Func5_xc_enc/output.ivf") == 0:
+        raise ValidationError("xc-enc produced no frames")
+
+
+def npy_values(bucket, key):
+    """Yield the values of a .npy object in chunks, streamed; raises if it holds fewer than its header says."""
+    import numpy as np
+
+    with bucket.open(key) as stream:
+        magic = _read_exact(stream, 8)
+        if magic[:6] != b"\x93NUMPY":
+            raise ValidationError(f"{key} is not a .npy file")
+        length_size = 2 if magic[6] == 1 else 4
+        header_length = int.from_bytes(_read_exact(stream, length_size), "little")
+        header = ast.literal_eval(_read_exact(stream, header_length).decode("latin1"))
+        dtype = np.dtype(header["descr"])
+        count = int(np.prod(header["shape"]))
+
+        seen = 0
+        remainder = b""
+        while True:
+            chunk = stream.read(READ_SIZE)
+            if not chunk:
+                break
+            chunk = remainder + chunk
+            usable = len(chunk) - len(chunk) % dtype.itemsize
+            values = np.frombuffer(chunk[:usable], dtype=dtype)
+            remainder = chunk[usable:]
+            if not len(values):
+                continue
+            seen += len(values)
+            yield values
+
+    if seen != count or remainder:
+        raise ValidationError(f"{key} holds {seen} of {count} values")
+
+
+@validator("Func6_partition")
+def check_partition(bucket, event):
+    """Every partition holds only values of its range (i * 50000, (i + 1) * 50000)."""
+    import numpy as np
+
+    for i in range(100):
+        key = f"Func6_partition/{event['size']}/{i}.npy"
+        low, high = i * 50000, min(50000 * (i + 1), 5000000)
+        for values in npy_values(bucket, key):
+            if np.any(values <= low) or np.any(values >= high):
+                raise ValidationError(f"{key} holds values outside ({low}, {high})")
+
+
+@validator("Func8_mergesort")
+def check_sorted(bucket, event):
+    """The output array is sorted and as long as the input partition."""
+    import numpy as np
+
+    key = f"Func8_mergesort/{event['size']}/{event['size']}_sorted.npy"
+    count = 0
+    last = None
+    for values in npy_values(bucket, key):
+        if (last is not None and values[0] < last) or np.any(values[1:] < values[:-1]):
+            raise ValidationError(f"{key} is not sorted")
+        last = values[-1]
+        count += len(values)
+    entry = _manifest_size(bucket, "Func8_mergesort", event["size"])
+    if entry:
+        expected = entry["artifacts"][0]["shape"][0]
+        if count != expected:
+            raise ValidationError(f"{key} has {count} values, the input has {expected}")
+
+
+def csv_column(bucket, key, column):
+    """Yield one column of a CSV object in chunks, streamed."""
+    import pandas as pd
+
+    with bucket.open(key) as stream:
+        for chunk in pd.read_csv(stream, usecols=[column], chunksize=1 << 22):
+            yield chunk[column].to_numpy()
+
+
+@validator("Func19_join")
+def check_join(bucket, event):
+    """Every id0 of the inputs appears exactly once in the join result."""
+    import numpy as np
+
+    key = f"Func19_join/{event['size']}_join_result.csv"
+    entry = _manifest_size(bucket, "Func19_join", event["size"])
+    if entry:
+        n = entry["params"]["N"]
+        covered = np.zeros(n, dtype=bool)
+        rows = 0
+        for ids in csv_column(bucket, key, "id0"):
+            if len(ids) and (ids.min() < 0 or ids.max() >= n):
+                raise ValidationError(f"{key} has keys outside [0, {n})")
+            covered[ids] = True
+            rows += len(ids)
+        if rows != n or not covered.all():
+            raise ValidationError(f"{key} has {rows} rows covering {int(covered.sum())} of {n} keys")
+    else:
+        ids = np.concatenate(list(csv_column(bucket, key, "id0")))
+        if len(np.unique(ids)) != len(ids):
+            raise ValidationError(f"{key} has duplicate keys")
+
+
+@validator("Func21_groupby")
+def check_groupby(bucket, event):
+    """One row per id1 group."""
+    import numpy as np
+
+    key = f"Func21_groupby/{event['size']}_groupby_result.csv"
+    groups = np.concatenate(list(csv_column(bucket, key, "id1")))
+    if len(np.unique(groups)) != len(groups):
+        raise ValidationError(f"{key} has duplicate groups")
+    entry = _manifest_size(bucket, "Func21_groupby", event["size"])
+    if entry:
+        # id1 is drawn from [0, N/K) with N/K much smaller than N, so every group is present
+        expected = int(entry["params"]["N"] / entry["params"]["K"])
+        if len(groups) != expected:
+            raise ValidationError(f"{key} has {len(groups)} groups, expected {expected}")
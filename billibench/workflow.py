@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+In-process DAG runner for the multi-stage apps.
+
+App1 (Func3_png2y4m -> Func4_xc_dump -> Func5_xc_enc) and App2 (Func6_partition -> Func8_mergesort
+for every partition, with Func7_sample as an independent branch) are declared as DAGs of stages.
+Every stage is a handler invocation whose event points it at the outputs of the stages it depends
+on (y4m_key, ivf_key/state_key, input_key) instead of its own prepared payload; Func4 and Func5 then
+fetch a tools-only archive instead of the payload that embeds the intermediates. All handlers run in
+this process, and stages whose dependencies have finished run concurrently on a thread pool.
+
+With --transfer local the intermediate objects are kept in a local directory (a scratch directory,
+so BENCH_SCRATCH=shm keeps them in shared memory) and hard-linked or copied between stages; only
+payloads and final outputs touch the bucket. With --transfer storage every stage uploads its outputs
+and the next one downloads them, as separately deployed functions would. --transfer both runs the
+workflow both ways and reports the difference:
+
+    python -m billibench.workflow App1_videoEncode --size medium --transfer both
+    python -m billibench.workflow App2_gensort --size small --partitions 16 --workers 8 --output workflow.jsonl
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import threading
+import concurrent.futures
+
+from billibench import runner, scratch, shaping, storage, trace
+
+TRANSFERS = ["local", "storage"]
+
+
+class Stage:
+    """One handler invocation of a workflow."""
+
+    def __init__(self, name, func_name, after=(), event=None, outputs=()):
+        self.name = name
+        self.func_name = func_name
+        self.after = list(after)
+        self.event = event or {}
+        # Bucket keys (or key prefixes ending in "/") of the intermediate objects the stage writes
+        self.outputs = list(outputs)
+
+
+def app1(size, partitions=None):
+    """Func3_png2y4m -> Func4_xc_dump -> Func5_xc_enc."""
+    y4m_key = f"Func3_png2y4m/{size}.y4m"
+    ivf_key, state_key = f"Func4_xc_dump/{size}.ivf", f"Func4_xc_dump/{size}.state"
+    return [
+        Stage("png2y4m", "Func3_png2y4m", outputs=[y4m_key]),
+        Stage("xc_dump", "Func4_xc_dump", after=["png2y4m"], event={"y4m_key": y4m_key},
+              outputs=[ivf_key, state_key]),
+        Stage("xc_enc", "Func5_xc_enc", after=["xc_dump"], event={"ivf_key": ivf_key, "state_key": state_key}),
+    ]
+
+
+def app2(size, partitions=None):
+    """Func6_partition -> Func8_mergesort per partition, with Func7_sample alongside."""
+    partitions = 100 if partitions is None else partitions
+    stages = [
+        Stage("partition", "Func6_partition", outputs=[f"Func6_partition/{size}/"]),
+        Stage("sample", "Func7_sample"),
+    ]
+    for i in range(partitions):
+        stages.append(Stage(f"mergesort_{i}", "Func8_mergesort", after=["partition"],
+                            event={"input_key": f"Func6_partition/{size}/{i}.npy",
+                                   "output_key": f"Func8_mergesort/{size}/{i}_sorted.npy"}))
+    return stages
+
+
+WORKFLOWS = {
+    "App1_videoEncode": app1,
+    "App2_gensort": app2,
+}
+
+
+class LocalOverlay:
+    """
+    Wraps a storage backend and keeps the objects under the given keys or key prefixes in a local
+    directory instead of the bucket. Objects that were not written locally are read from the backend.
+    """
+
+    def __init__(self, backend, root, keys):
+        self.backend = backend
+        self.root = root
+        self.keys = list(keys)
+        self._lock = threading.Lock()
+        self._stats = {"objects": 0, "bytes_kept": 0, "bytes_served": 0}
+
+    def __getattr__(self, attr):
+        return getattr(self.backend, attr)
+
+    def _local(self, key):
+        return any(key == prefix or prefix.endswith("/") and key.startswith(prefix) for prefix in self.keys)
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def _has(self, key):
+        return self._local(key) and os.path.exists(self._path(key))
+
+    def _count(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                self._stats[name] += value
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    @staticmethod
+    def _link(source, target):
+        """Hard-link source to target, or copy it across file systems."""
+        if os.path.exists(target):
+            os.unlink(target)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copyfile(source, target)
+
+    def get(self, key, path, chunk_size=None):
+        if not self._has(key):
+            return self.backend.get(key, path, chunk_size=chunk_size)
+        self._link(self._path(key), path)
+        self._count(bytes_served=os.path.getsize(path))
+
+    def get_bytes(self, key):
+        if not self._has(key):
+            return self.backend.get_bytes(key)
+        with open(self._path(key), "rb") as f:
+            data = f.read()
+        self._count(bytes_served=len(data))
+        return data
+
+    def put(self, key, path, chunk_size=None):
+        if not self._local(key):
+            return self.backend.put(key, path, chunk_size=chunk_size)
+        os.makedirs(os.path.dirname(self._path(key)), exist_ok=True)
+        self._link(path, self._path(key))
+        self._count(objects=1, bytes_kept=os.path.getsize(path))
+
+    def put_bytes(self, key, data):
+        if not self._local(key):
+            return self.backend.put_bytes(key, data)
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        os.makedirs(os.path.dirname(self._path(key)), exist_ok=True)
+        with open(self._path(key), "wb") as f:
+            f.write(data)
+        self._count(objects=1, bytes_kept=len(data))
+
+    def open(self, key):
+        return open(self._path(key), "rb") if self._has(key) else self.backend.open(key)
+
+    def read_range(self, key, start, end):
+        if not self._has(key):
+            return self.backend.read_range(key, start, end)
+        with open(self._path(key), "rb") as f:
+            f.seek(start)
+            return f.read(end - start)
+
+    def size(self, key):
+        return os.path.getsize(self._path(key)) if self._has(key) else self.backend.size(key)
+
+    def version(self, key):
+        if not self._has(key):
+            return self.backend.version(key)
+        st = os.stat(self._path(key))
+        return f"{st.st_size}-{st.st_mtime_ns}"
+
+
+def ready_stages(stages, done, started):
+    """Return the stages whose dependencies have all finished and that have not been started."""
+    return [stage for stage in stages if stage.name not in started and all(name in done for name in stage.after)]
+
+
+def run(app_name, size, transfer="local", partitions=None, workers=4, root=runner.BENCH_ROOT):
+    """Run one workflow and return its record: end-to-end latency, stages, phases and storage bytes."""
+    if app_name not in WORKFLOWS:
+        raise ValueError(f"Unknown workflow: {app_name}")
+    stages = WORKFLOWS[app_name](size, partitions)
+    functions = runner.discover(root)
+    modules = {}
+    for stage in stages:
+        if stage.func_name not in modules:
+            modules[stage.func_name] = runner.load_function(stage.func_name, functions[stage.func_name][1])
+
+    def invoke(stage):
+        threading.current_thread().name = stage.name
+        event = runner.build_event(stage.func_name, size, stage.event)
+        result = {"stage": stage.name, "function": stage.func_name, "start": time.perf_counter()}
+        try:
+            ret = modules[stage.func_name].handler(event)
+            result["exit_status"] = runner.exit_status(ret)
+            result["status"] = "ok" if result["exit_status"] == 0 else "failed"
+        except Exception as e:
+            result.update({"exit_status": 1, "status": "error", "error": f"{type(e).__name__}: {e}"})
+        result["end"] = time.perf_counter()
+        return result
+
+    record = {"workflow": app_name, "size": size, "transfer": transfer, "stages": [], "start": time.time()}
+    with scratch.directory() as overlay_dir:
+        overlay = None
+        if transfer == "local":
+            keys = [key for stage in stages for key in stage.outputs]
+            overlay = LocalOverlay(storage.initialize_storage(), overlay_dir, keys)
+            storage.set_backend(overlay)
+        shaping.reset_stats()
+        trace.reset()
+        start = time.perf_counter()
+        done, started, failed = set(), set(), False
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+                running = {}
+                while True:
+                    if not failed:
+                        for stage in ready_stages(stages, done, started):
+                            started.add(stage.name)
+                            running[pool.submit(invoke, stage)] = stage
+                    if not running:
+                        break
+                    finished, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in finished:
+                        stage = running.pop(future)
+                        result = future.result()
+                        result["start"] -= start
+                        result["end"] -= start
+                        record["stages"].append(result)
+                        if result["status"] == "ok":
+                            done.add(stage.name)
+                        else:
+                            # do not start the stages that depend on missing outputs
+                            failed = True
+        finally:
+            storage.set_backend(None)
+        record["latency"] = time.perf_counter() - start
+        record["phases"] = trace.collect(start)
+        if overlay:
+            record["local"] = overlay.stats()
+        if shaping.enabled():
+            record["shaping"] = dict(shaping.config(), **shaping.stats())
+
+    record["status"] = "ok" if len(done) == len(stages) else "failed"
+    record["stages"].sort(key=lambda result: result["start"])
+    record["storage_bytes"] = sum(span["bytes"] for span in record["phases"])
+    record["bytes_saved"] = record["local"]["bytes_kept"] + record["local"]["bytes_served"] if overlay else 0
+    return record
+
+
+def report(record):
+    """Print one workflow run."""
+    print(f"{record['workflow']} {record['size']} ({record['transfer']}): {record['status']} "
+          f"latency {record['latency']:.3f}s, {record['storage_bytes'] / (1 << 20):.1f} MB through storage, "
+          f"{record['bytes_saved'] / (1 << 20):.1f} MB kept local")
+    for result in record["stages"]:
+        print(f"    {result['stage']:<16} {result['start']:8.3f}s - {result['end']:8.3f}s  {result['status']}")
+
+
+def main(argv=None):
+    """Run a multi-stage app as a DAG and report its end-to-end latency and storage traffic."""
+    parser = argparse.ArgumentParser(description="Run a multi-stage app as an in-process DAG.")
+    parser.add_argument("workflow", choices=sorted(WORKFLOWS), help="app to run")
+    parser.add_argument("--size", default="small", help="payload size")
+    parser.add_argument("--transfer", choices=TRANSFERS + ["both"], default="local",
+                        help="pass intermediate objects through local files, the bucket, or compare both")
+    parser.add_argument("--partitions", type=int, help="App2_gensort: partitions to sort (default: all 100)")
+    parser.add_argument("--workers", type=int, default=4, help="stages running at once")
+    parser.add_argument("--repetitions", type=int, default=1, help="runs per transfer mode")
+    parser.add_argument("--output", help="append one JSON line per run")
+    args = parser.parse_args(argv)
+
+    transfers = TRANSFERS if args.transfer == "both" else [args.transfer]
+    records = []
+    for _ in range(args.repetitions):
+        for transfer in transfers:
+            record = run(args.workflow, args.size, transfer, args.partitions, args.workers)
+            report(record)
+            records.append(record)
+            if args.output:
+                with open(args.output, "a") as f:
+                    f.write(json.dumps(record, default=repr) + "\n")
+
+    if len(transfers) > 1:
+        latency = {transfer: min(record["latency"] for record in records if record["transfer"] == transfer)
+                   for transfer in transfers}
+        moved = {transfer: min(record["storage_bytes"] for record in records if record["transfer"] == transfer)
+                 for transfer in transfers}
+        print(f"local vs storage: latency {latency['local']:.3f}s vs {latency['storage']:.3f}s "
+              f"({latency['storage'] - latency['local']:+.3f}s saved), "
+              f"{(moved['storage'] - moved['local']) / (1 << 20):.1f} MB less through storage")
+    return 0 if all(record["status"] == "ok" for record in records) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+from billibench import archive, cache
+from billibench.storage import LocalBackend
+
+FILES = {
+    "src/main.c": b"int main(void) { return 0; }\n" * 1000,
+    "src/empty.h": b"",
+    "data/random.bin": os.urandom(300000),
+    "README": b"payload\n",
+}
+
+
+class Unseekable(io.RawIOBase):
+    """Write-only stream without seek(), so zipfile writes data descriptors."""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self.buffer.write(data)
+
+
+def make_zip(compression=zipfile.ZIP_DEFLATED, seekable=True, files=FILES):
+    out = io.BytesIO() if seekable else Unseekable()
+    with zipfile.ZipFile(out, "w", compression) as z:
+        z.writestr("src/", b"")
+        for name, data in files.items():
+            z.writestr(name, data)
+    return (out if seekable else out.buffer).getvalue()
+
+
+def read_tree(root):
+    tree = {}
+    for directory, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(directory, name)
+            with open(path, "rb") as f:
+                tree[os.path.relpath(path, root).replace(os.sep, "/")] = f.read()
+    return tree
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2])
+def test_extract_stream(tmp_path, compression):
+    data = make_zip(compression)
+    assert archive.extract_stream(io.BytesIO(data), str(tmp_path)) == len(data)
+    assert read_tree(tmp_path) == FILES
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2])
+def test_extract_stream_with_data_descriptors(tmp_path, compression):
+    archive.extract_stream(io.BytesIO(make_zip(compression, seekable=False)), str(tmp_path))
+    assert read_tree(tmp_path) == FILES
+
+
+def test_extract_stream_in_small_reads(tmp_path, monkeypatch):
+    # entries and headers span many prefetched chunks
+    monkeypatch.setattr(archive, "READ_SIZE", 1000)
+    monkeypatch.setattr(archive, "DESCRIPTOR_READ_SIZE", 100)
+    archive.extract_stream(io.BytesIO(make_zip(seekable=False)), str(tmp_path))
+    assert read_tree(tmp_path) == FILES
+
+
+def test_extract_stream_skips_unsafe_names(tmp_path):
+    dest = tmp_path / "dest"
+    dest.mkdir()
+    archive.extract_stream(io.BytesIO(make_zip(files={"../escape": b"x", "/abs": b"y", "ok": b"z"})), str(dest))
+    assert read_tree(tmp_path) == {"dest/ok": b"z"}
+
+
+def test_extract_stream_rejects_unsupported_archives(tmp_path):
+    with pytest.raises(archive.StreamingError):
+        archive.extract_stream(io.BytesIO(b"not a zip archive"), str(tmp_path))
+    with pytest.raises(archive.StreamingError):
+        archive.extract_stream(io.BytesIO(make_zip(zipfile.ZIP_STORED, seekable=False)), str(tmp_path))
+    with pytest.raises(archive.StreamingError):
+        archive.extract_stream(io.BytesIO(make_zip(zipfile.ZIP_LZMA)), str(tmp_path))
+
+
+def test_extract_stream_detects_corruption(tmp_path):
+    data = bytearray(make_zip(zipfile.ZIP_STORED, files={"a": b"0123456789"}))
+    data[data.index(b"0123456789")] ^= 0xFF
+    with pytest.raises(archive.StreamingError, match="CRC"):
+        archive.extract_stream(io.BytesIO(bytes(data)), str(tmp_path))
+
+
+def put(tmp_path, data):
+    bucket = LocalBackend(str(tmp_path / "bucket"))
+    bucket.put_bytes("Func0_compile/payload_small.zip", data)
+    dest = tmp_path / "dest"
+    dest.mkdir()
+    return bucket, dest
+
+
+def test_fetch_and_unpack_streams(tmp_path, monkeypatch):
+    monkeypatch.delenv("BENCH_STREAM_UNZIP", raising=False)
+    bucket, dest = put(tmp_path, make_zip())
+    archive.fetch_and_unpack(bucket, "Func0_compile/payload_small.zip", str(dest))
+    # the archive itself is never written to the destination
+    assert read_tree(dest) == FILES
+
+
+def test_fetch_and_unpack_falls_back_to_download(tmp_path, monkeypatch, capsys):
+    monkeypatch.delenv("BENCH_STREAM_UNZIP", raising=False)
+    data = make_zip(zipfile.ZIP_STORED, seekable=False)
+    bucket, dest = put(tmp_path, data)
+    archive.fetch_and_unpack(bucket, "Func0_compile/payload_small.zip", str(dest))
+    assert "downloading the archive instead" in capsys.readouterr().out
+    assert read_tree(dest) == dict(FILES, **{"payload_small.zip": data})
+
+
+def test_fetch_and_unpack_without_streaming(tmp_path, monkeypatch):
+    monkeypatch.setenv("BENCH_STREAM_UNZIP", "0")
+    data = make_zip()
+    bucket, dest = put(tmp_path, data)
+    archive.fetch_and_unpack(bucket, "Func0_compile/payload_small.zip", str(dest))
+    assert read_tree(dest) == dict(FILES, **{"payload_small.zip": data})
+
+
+def test_fetch_and_unpack_through_the_cache(tmp_path, monkeypatch):
+    monkeypatch.delenv("BENCH_STREAM_UNZIP", raising=False)
+    data = make_zip()
+    bucket, dest = put(tmp_path, data)
+    bucket = cache.CachingBackend(bucket, cache.PayloadCache(str(tmp_path / "cache")))
+    archive.fetch_and_unpack(bucket, "Func0_compile/payload_small.zip", str(dest))
+    assert read_tree(dest) == dict(FILES, **{"payload_small.zip": data})
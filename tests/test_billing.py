@@ -0,0 +1,94 @@
+import math
+
+import numpy as np
+import pytest
+
+from billibench import billing
+
+GB = billing.GB
+
+
+def record(function, size, t, cpu_time, rss, wall_time=None):
+    return {"function": function, "size": size, "wall_time": wall_time,
+            "resources": {"samples": {"t": t, "cpu_time": cpu_time, "rss": rss}}}
+
+
+def test_billed_duration_rounds_up_to_granularity():
+    billed = billing.billed_duration(np.array([0.0011, 0.1, 0.25, 0.0]), 0.1)
+    assert billed.tolist() == pytest.approx([0.1, 0.1, 0.3, 0.0])
+
+
+def test_billed_duration_exact_multiples_are_not_rounded_up():
+    # 1.001 / 0.001 is 1001.0000000000001 in floating point
+    assert billing.billed_duration(np.array([1.001]), 0.001).tolist() == pytest.approx([1.001])
+
+
+def test_billed_duration_without_granularity():
+    assert billing.billed_duration(np.array([0.0123]), 0.0).tolist() == [0.0123]
+
+
+def test_traces_skip_records_without_samples():
+    records = [record("Func0_compile", "small", [0, 1], [0, 1], [GB, GB]), {"function": "Func1", "size": "small"}]
+    assert len(billing.Traces(records)) == 1
+
+
+def test_traces_usage_per_invocation():
+    traces = billing.Traces([
+        record("Func0_compile", "small", [0.0, 1.0, 2.0], [0.0, 0.5, 1.5], [GB, GB, 3 * GB], wall_time=2.5),
+        record("Func0_compile", "small", [10.0, 11.0], [4.0, 4.25], [2 * GB, 4 * GB]),
+    ])
+    assert traces.wall_time().tolist() == pytest.approx([2.5, 1.0])
+    assert traces.cpu_used().tolist() == pytest.approx([1.5, 0.25])
+    # the area between the last sample of one trace and the first of the next is not counted
+    assert traces.memory_used().tolist() == pytest.approx([1.0 + 2.0, 3.0])
+    assert traces.peak_memory().tolist() == pytest.approx([3.0, 4.0])
+
+
+def test_cpu_used_ignores_dips_in_the_cumulative_series():
+    traces = billing.Traces([record("Func0_compile", "small", [0.0, 1.0, 2.0, 3.0], [0.0, 1.0, 0.1, 1.2], [GB] * 4)])
+    assert traces.cpu_used().tolist() == pytest.approx([1.2])
+    traces = billing.Traces([record("Func0_compile", "small", [0.0, 1.0, 2.0], [0.0, 1.0, 0.1], [GB] * 3)])
+    assert traces.cpu_used().tolist() == pytest.approx([1.0])
+
+
+def test_allocations_per_function_and_size():
+    records = [{"function": "Func0_compile", "size": "small"}, {"function": "Func0_compile", "size": "large"},
+               {"function": "Func1_build", "size": "small"}]
+    allocation = {"Func0_compile": {"memory_mb": 1024, "large": {"memory_mb": 4096, "vcpus": 2}}}
+    memory_gb, vcpus = billing.allocations(records, allocation, memory_mb=512, vcpus=1)
+    assert memory_gb.tolist() == [1.0, 4.0, 0.5]
+    assert vcpus.tolist() == [1, 2, 1]
+
+
+def test_price_fixed_and_usage_schemes():
+    schemes = {
+        "fixed": {"memory_price": 1.0, "cpu_price": 10.0, "granularity": 1.0, "usage": False},
+        "usage": {"memory_price": 1.0, "cpu_price": 10.0, "granularity": 0.0, "usage": True},
+    }
+    traces = billing.Traces([record("Func0_compile", "small", [0.0, 1.5], [0.0, 0.5], [GB, GB])])
+    priced = billing.price(traces, np.array([2.0]), np.array([1.0]), schemes)
+
+    # 1.5 s billed as 2 s of 2 GB and 1 vCPU
+    assert priced["fixed_billed_time"].tolist() == [2.0]
+    assert priced["fixed"].tolist() == pytest.approx([2.0 * (2.0 * 1.0 + 1.0 * 10.0)])
+    # 1.5 GB-s and 0.5 CPU seconds used
+    assert priced["usage"].tolist() == pytest.approx([1.5 * 1.0 + 0.5 * 10.0])
+    assert priced["fixed_overcharge"].tolist() == pytest.approx([24.0 / 6.5])
+    assert priced["cpu_overcharge"].tolist() == pytest.approx([1.0 * 1.5 / 0.5])
+    assert priced["memory_overcharge"].tolist() == pytest.approx([2.0 * 1.5 / 1.5])
+
+
+def test_price_idle_invocation_has_no_overcharge_ratio():
+    traces = billing.Traces([record("Func0_compile", "small", [0.0, 1.0], [2.0, 2.0], [GB, GB])])
+    priced = billing.price(traces, np.array([1.0]), np.array([1.0]))
+    assert math.isnan(priced["cpu_overcharge"][0])
+
+
+def test_group_averages_and_ignores_nan():
+    records = [{"function": "Func0_compile", "size": "small"}, {"function": "Func0_compile", "size": "small"},
+               {"function": "Func1_build", "size": "small"}]
+    groups = billing.group(records, {"cost": np.array([1.0, 3.0, np.nan])})
+    assert groups == [
+        {"function": "Func0_compile", "size": "small", "invocations": 2, "cost": 2.0},
+        {"function": "Func1_build", "size": "small", "invocations": 1, "cost": None},
+    ]
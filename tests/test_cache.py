@@ -0,0 +1,68 @@
+import os
+import threading
+
+from billibench import cache
+from billibench.storage import LocalBackend
+
+
+def backend(tmp_path, data=b"payload"):
+    bucket = LocalBackend(str(tmp_path / "bucket"))
+    bucket.put_bytes("Func0_compile/payload_small.zip", data)
+    return bucket
+
+
+def test_hit_after_miss(tmp_path, monkeypatch):
+    monkeypatch.delenv("BENCH_CACHE_TTL", raising=False)
+    cached = cache.CachingBackend(backend(tmp_path), cache.PayloadCache(str(tmp_path / "cache")))
+    cache.reset_stats()
+    assert cached.get_bytes("Func0_compile/payload_small.zip") == b"payload"
+    cached.get("Func0_compile/payload_small.zip", str(tmp_path / "copy"))
+    assert (tmp_path / "copy").read_bytes() == b"payload"
+    stats = cache.stats()
+    assert (stats["misses"], stats["hits"], stats["changed"]) == (1, 1, 0)
+
+
+def test_object_rewritten_during_download_is_not_cached(tmp_path, monkeypatch):
+    monkeypatch.delenv("BENCH_CACHE_TTL", raising=False)
+    bucket = backend(tmp_path)
+    get_bytes = bucket.get_bytes
+
+    def rewritten_while_downloading(key):
+        data = get_bytes(key)
+        bucket.put_bytes(key, b"rewritten payload")
+        return data
+
+    monkeypatch.setattr(bucket, "get_bytes", rewritten_while_downloading)
+    payloads = cache.PayloadCache(str(tmp_path / "cache"))
+    cached = cache.CachingBackend(bucket, payloads)
+    cache.reset_stats()
+    assert cached.get_bytes("Func0_compile/payload_small.zip") == b"payload"
+    assert cache.stats()["changed"] == 1
+    assert not payloads.entries
+
+    monkeypatch.setattr(bucket, "get_bytes", get_bytes)
+    assert cached.get_bytes("Func0_compile/payload_small.zip") == b"rewritten payload"
+    assert cached.get_bytes("Func0_compile/payload_small.zip") == b"rewritten payload"
+    assert cache.stats()["hits"] == 1
+
+
+def test_open_entry_survives_eviction(tmp_path):
+    payloads = cache.PayloadCache(str(tmp_path / "cache"), budget=10)
+    payloads.insert("a", data=b"0123456789")
+    entry = payloads.open("a")
+    # a concurrent insert evicts the entry while it is being read
+    thread = threading.Thread(target=payloads.insert, args=("b",), kwargs={"data": b"abcdefghij"})
+    thread.start()
+    thread.join()
+    assert not os.path.exists(os.path.join(payloads.root, "a"))
+    with entry:
+        assert entry.read() == b"0123456789"
+    assert payloads.open("a") is None
+
+
+def test_entry_removed_by_another_process_is_a_miss(tmp_path):
+    payloads = cache.PayloadCache(str(tmp_path / "cache"))
+    payloads.insert("a", data=b"x")
+    os.unlink(os.path.join(payloads.root, "a"))
+    assert payloads.open("a") is None
+    assert payloads.size == 0
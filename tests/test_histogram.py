@@ -0,0 +1,113 @@
+import math
+import random
+
+import pytest
+
+from billibench.histogram import Histogram
+
+
+def exact_percentile(values, p):
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(p / 100 * len(ordered))) - 1]
+
+
+def test_invalid_parameters():
+    with pytest.raises(ValueError):
+        Histogram(lowest=0)
+    with pytest.raises(ValueError):
+        Histogram(lowest=10, highest=15)
+    with pytest.raises(ValueError):
+        Histogram(significant_figures=6)
+
+
+def test_every_value_falls_in_its_bucket_range():
+    histogram = Histogram()
+    for value in list(range(0, 5000)) + [2 ** k + d for k in range(12, 31) for d in (-1, 0, 1)]:
+        low, high = histogram._value_range(histogram._index(value))
+        assert low <= value <= high
+
+
+def test_bucket_width_keeps_significant_figures():
+    histogram = Histogram(significant_figures=3)
+    for value in (1, 999, 2047, 2048, 123456, 10 ** 9):
+        low, high = histogram._value_range(histogram._index(value))
+        assert high - low + 1 <= max(1, value / 1000)
+
+
+def test_small_values_are_exact():
+    histogram = Histogram()
+    for value in range(1, 1001):
+        histogram.record(value)
+    assert histogram.percentile(50) == 500
+    assert histogram.percentile(99) == 990
+    assert histogram.percentile(100) == 1000
+    assert histogram.mean() == pytest.approx(500.5)
+
+
+def test_percentiles_within_relative_error():
+    rng = random.Random(0)
+    values = [int(rng.lognormvariate(10, 1.5)) + 1 for _ in range(20000)]
+    histogram = Histogram()
+    for value in values:
+        histogram.record(value)
+    for p in (1, 50, 90, 99, 99.9):
+        assert histogram.percentile(p) == pytest.approx(exact_percentile(values, p), rel=1e-3)
+    assert histogram.min == min(values)
+    assert histogram.max == max(values)
+    assert histogram.percentile(100) == max(values)
+
+
+def test_record_with_count():
+    histogram = Histogram()
+    histogram.record(10, count=9)
+    histogram.record(5000)
+    assert histogram.total == 10
+    assert histogram.percentile(90) == 10
+    assert histogram.percentile(91) == pytest.approx(5000, rel=1e-3)
+
+
+def test_overflows_are_clamped():
+    histogram = Histogram(highest=1000)
+    histogram.record(50)
+    histogram.record(10 ** 6)
+    assert histogram.overflows == 1
+    assert histogram.max == 1000
+    assert histogram.summary()["overflows"] == 1
+
+
+def test_merge_matches_recording_everything():
+    values = list(range(1, 100000, 37))
+    merged, a, b = Histogram(), Histogram(), Histogram()
+    for i, value in enumerate(values):
+        merged.record(value)
+        (a if i % 2 else b).record(value)
+    a.merge(b)
+    assert a.counts == merged.counts
+    assert (a.total, a.sum, a.min, a.max) == (merged.total, merged.sum, merged.min, merged.max)
+
+
+def test_merge_empty_keeps_extremes():
+    histogram = Histogram()
+    histogram.record(7)
+    histogram.merge(Histogram())
+    assert (histogram.min, histogram.max) == (7, 7)
+
+
+def test_merge_rejects_different_parameters():
+    with pytest.raises(ValueError):
+        Histogram().merge(Histogram(significant_figures=2))
+
+
+def test_empty_summary():
+    histogram = Histogram()
+    assert histogram.percentile(50) is None
+    assert histogram.mean() is None
+    assert histogram.summary() == {"count": 0}
+
+
+def test_summary_scale():
+    histogram = Histogram()
+    for value in (1000, 2000, 3000):
+        histogram.record(value)
+    summary = histogram.summary(percentiles=(50,), scale=1000)
+    assert summary == {"count": 3, "min": 1.0, "mean": 2.0, "max": 3.0, "p50": pytest.approx(2.0, rel=1e-3)}
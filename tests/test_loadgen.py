@@ -0,0 +1,70 @@
+import queue
+import threading
+
+from billibench import loadgen
+
+
+class Worker:
+    def __init__(self, alive=True):
+        self.alive = alive
+        self.pid = 100
+        self.exitcode = None if alive else -9
+
+    def is_alive(self):
+        return self.alive
+
+
+def result(request_id, arrival=0.0):
+    return {"id": request_id, "arrival": arrival, "start": 0.0, "end": 1.0, "pid": 100, "status": "ok",
+            "error": None}
+
+
+def test_request_lost_between_dequeue_and_slot_is_failed(monkeypatch):
+    monkeypatch.setattr(loadgen, "POLL_INTERVAL", 0.01)
+    results = queue.Queue()
+    # worker 0 died right after taking request 0; worker 1 took request 1 and is still serving it
+    pool = [Worker(alive=False), Worker()]
+    current = [loadgen.IDLE, 1]
+    outstanding = {0: 0.0, 1: 0.0, 2: 0.0}
+
+    collected = []
+    for record in loadgen.collect(results, pool, current, outstanding):
+        collected.append(record)
+        if record["id"] == 0:
+            # then worker 1 finishes both remaining requests
+            results.put(result(1))
+            results.put(result(2))
+    assert [(record["id"], record["status"]) for record in collected] == [(0, "error"), (1, "ok"), (2, "ok")]
+    assert collected[0]["error"] == "request taken by a worker that exited"
+
+
+def test_idle_worker_with_unserved_request(monkeypatch):
+    monkeypatch.setattr(loadgen, "POLL_INTERVAL", 0.01)
+    # the last request was taken by the dead worker, the live one has nothing to do
+    records = list(loadgen.collect(queue.Queue(), [Worker(alive=False), Worker()], [loadgen.IDLE] * 2, {5: 0.0}))
+    assert [(record["id"], record["status"]) for record in records] == [(5, "error")]
+
+
+def test_queued_requests_are_not_failed_while_workers_serve(monkeypatch):
+    monkeypatch.setattr(loadgen, "POLL_INTERVAL", 0.01)
+    results = queue.Queue()
+    # a dead worker and a live one serving request 0 while 1 is still queued
+    pool, current = [Worker(alive=False), Worker()], [loadgen.IDLE, 0]
+    timer = threading.Timer(0.2, lambda: (results.put(result(0)), results.put(result(1))))
+    timer.start()
+    records = list(loadgen.collect(results, pool, current, {0: 0.0, 1: 0.0}))
+    timer.join()
+    assert [(record["id"], record["status"]) for record in records] == [(0, "ok"), (1, "ok")]
+
+
+def test_late_result_of_a_failed_request_is_counted_once(monkeypatch):
+    monkeypatch.setattr(loadgen, "POLL_INTERVAL", 0.01)
+    results = queue.Queue()
+    pool, current = [Worker(alive=False), Worker()], [3, 4]
+    records = []
+    for record in loadgen.collect(results, pool, current, {3: 0.0, 4: 0.0}):
+        records.append(record)
+        if record["id"] == 3:
+            results.put(result(3))
+            results.put(result(4))
+    assert [(record["id"], record["status"]) for record in records] == [(3, "error"), (4, "ok")]
@@ -0,0 +1,9 @@
+from billibench import manifest
+
+
+def test_size_seeds_are_stable_and_distinct():
+    seeds = {size: manifest.size_seed(777, size) for size in ("small", "medium", "large")}
+    assert seeds == {size: manifest.size_seed(777, size) for size in seeds}
+    assert len(set(seeds.values())) == 3
+    assert all(0 <= seed < 2 ** 32 for seed in seeds.values())
+    assert manifest.size_seed(778, "small") != seeds["small"]
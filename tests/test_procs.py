@@ -0,0 +1,50 @@
+import os
+import time
+import subprocess
+
+import pytest
+
+from billibench import procs
+
+
+def test_run_records_the_child():
+    procs.reset_stats()
+    record = procs.run(["true"])
+    assert (record["command"], record["returncode"], record["timed_out"]) == ("true", 0, False)
+    assert procs.stats()["total"]["processes"] == 1
+
+
+def test_run_failure_and_timeout():
+    with pytest.raises(subprocess.CalledProcessError):
+        procs.run(["false"])
+    start = time.perf_counter()
+    with pytest.raises(subprocess.TimeoutExpired):
+        # the whole process group is killed, including the sleep started by the shell
+        procs.run(["sh", "-c", "sleep 30; true"], timeout=0.2)
+    assert time.perf_counter() - start < 10
+
+
+def test_timeout_after_exit_does_not_kill_or_fail(monkeypatch):
+    waitid = os.waitid
+    killed = []
+
+    def slow_waitid(idtype, pid, options):
+        result = waitid(idtype, pid, options)
+        if not options & os.WNOHANG:
+            # the timer fires after the child exited and before it is marked finished
+            time.sleep(0.3)
+        return result
+
+    monkeypatch.setattr(os, "waitid", slow_waitid)
+    monkeypatch.setattr(os, "killpg", lambda *args: killed.append(args))
+    monkeypatch.setattr(os, "kill", lambda *args: killed.append(args))
+    record = procs.run(["true"], timeout=0.05)
+    assert not record["timed_out"]
+    code, _, _, _, timed_out = procs.run_child(["true"], timeout=0.05)
+    assert (code, timed_out) == (0, False)
+    assert killed == []
+
+
+def test_run_child_timeout():
+    code, rusage, stdout, stderr, timed_out = procs.run_child(["sleep", "30"], timeout=0.2)
+    assert timed_out and code == -9
@@ -0,0 +1,32 @@
+from billibench import resultsdb
+
+ORIGIN = {"revision": "0" * 40, "dirty": 0, "fingerprint": "host", "host": {}}
+
+
+def add_run(db, label, wall_times):
+    run_id = db.start_run(label, origin=ORIGIN)
+    for workers, values in wall_times.items():
+        for i, value in enumerate(values):
+            db.add(run_id, {"function": "Func2_test", "size": "medium", "repetition": i, "status": "ok",
+                            "event": {"size": "medium", "workers_num": workers}, "wall_time": value})
+    return run_id
+
+
+def test_compare_keeps_sweep_points_apart(tmp_path):
+    db = resultsdb.ResultsDB(str(tmp_path / "results.db"))
+    # the same code at 1 and 16 workers; only the 16 worker point regressed
+    base = add_run(db, "base", {1: [10.0, 10.1, 10.2, 9.9, 10.0], 16: [1.0, 1.1, 1.0, 0.9, 1.0]})
+    head = add_run(db, "head", {1: [10.1, 10.0, 9.9, 10.2, 10.0], 16: [2.0, 2.1, 2.0, 1.9, 2.0], 4: [3.0] * 5})
+    rows = resultsdb.compare(db, [base], [head])
+    db.close()
+
+    by_workers = {row["event"]["workers_num"]: row for row in rows}
+    assert {workers: row["verdict"] for workers, row in by_workers.items()} == {
+        1: "same", 4: "unmatched", 16: "regression"}
+    assert (by_workers[16]["base_n"], by_workers[16]["head_n"]) == (5, 5)
+    assert by_workers[16]["change"] == 1.0
+    assert resultsdb.config(by_workers[4]["event"]) == "workers_num=4"
+
+
+def test_mann_whitney_identical_samples():
+    assert resultsdb.mann_whitney([1.0] * 5, [1.0] * 5)[1] == 1.0
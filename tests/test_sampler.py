@@ -0,0 +1,39 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+from billibench import sampler
+
+pytestmark = pytest.mark.skipif(not os.path.exists("/proc/self/stat"), reason="needs /proc")
+
+# a python grandchild burns about one CPU second; bash reaps it, says so, and keeps running
+BURN = "import time\nend = time.process_time() + 1\nwhile time.process_time() < end: pass"
+SCRIPT = f"{sys.executable} -c '{BURN}'; echo reaped; sleep 0.5"
+
+
+def run_shell():
+    return subprocess.Popen(["bash", "-c", SCRIPT], stdout=subprocess.PIPE, text=True)
+
+
+def test_read_usage_counts_grandchildren_reaped_inside_the_tree():
+    before = sampler.read_usage(os.getpid())[0]
+    shell = run_shell()
+    try:
+        assert shell.stdout.readline() == "reaped\n"
+        # bash has not been reaped yet, so the python time is only in its own cutime
+        during = sampler.read_usage(os.getpid())[0]
+    finally:
+        shell.communicate()
+    assert during - before >= 0.9
+
+
+def test_cpu_time_never_decreases():
+    with sampler.ResourceSampler(interval=0.002) as resources:
+        run_shell().communicate()
+    cpu_time = resources.result["samples"]["cpu_time"]
+    assert all(b >= a for a, b in zip(cpu_time, cpu_time[1:]))
+    assert min(resources.result["cpu_util"]) >= 0
+    assert resources.result["summary"]["cpu_time"] >= 0.9
+    assert resources.result["cpu_resolution"] == 1 / sampler.CLK_TCK
@@ -0,0 +1,33 @@
+import os
+import time
+
+from billibench import scratch
+
+
+def test_peak_counts_files_the_handler_deleted(tmp_path, monkeypatch):
+    monkeypatch.setenv("BENCH_SCRATCH", str(tmp_path))
+    monkeypatch.setenv("BENCH_SCRATCH_INTERVAL", "0.01")
+    scratch.reset_stats()
+    with scratch.directory() as path:
+        with open(os.path.join(path, "frames.y4m"), "wb") as f:
+            f.write(b"\0" * (1 << 20))
+        time.sleep(0.1)
+        os.unlink(os.path.join(path, "frames.y4m"))
+        with open(os.path.join(path, "out.csv"), "wb") as f:
+            f.write(b"\0" * 1000)
+    stats = scratch.stats()
+    assert stats["bytes_peak"] >= 1 << 20
+    assert (stats["bytes_left"], stats["files_left"], stats["directories"]) == (1000, 1, 1)
+    assert os.listdir(tmp_path) == []
+
+
+def test_peak_without_watcher_is_the_size_left(tmp_path, monkeypatch):
+    monkeypatch.setenv("BENCH_SCRATCH", str(tmp_path))
+    monkeypatch.setenv("BENCH_SCRATCH_INTERVAL", "0")
+    scratch.reset_stats()
+    with scratch.directory() as path:
+        os.makedirs(os.path.join(path, "a", "b"))
+        with open(os.path.join(path, "a", "b", "c"), "wb") as f:
+            f.write(b"x" * 10)
+    assert scratch.stats()["bytes_peak"] == 10
+    assert isinstance(scratch.stats()["cleanup_time"], float)
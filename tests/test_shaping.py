@@ -0,0 +1,22 @@
+from billibench import shaping
+from billibench.storage import LocalBackend
+
+
+def shaped(tmp_path, monkeypatch):
+    for name in ("LATENCY", "JITTER", "STREAM_BANDWIDTH", "BANDWIDTH", "SEED"):
+        monkeypatch.delenv(f"BENCH_SHAPE_{name}", raising=False)
+    return shaping.ShapedBackend(LocalBackend(str(tmp_path)), shaping.config())
+
+
+def test_put_bytes_counts_encoded_bytes(tmp_path, monkeypatch):
+    backend = shaped(tmp_path, monkeypatch)
+    shaping.reset_stats()
+    backend.put_bytes("Func0_compile/text.txt", "héllo ✓")
+    assert shaping.stats()["bytes"] == len("héllo ✓".encode("utf-8")) == 10
+    assert (tmp_path / "Func0_compile" / "text.txt").read_bytes() == "héllo ✓".encode("utf-8")
+
+
+def test_reset_stats_keeps_times_as_floats():
+    shaping.reset_stats()
+    assert shaping.stats() == {"requests": 0, "bytes": 0, "latency_time": 0.0, "throttle_time": 0.0}
+    assert all(isinstance(shaping.stats()[name], float) for name in ("latency_time", "throttle_time"))